@@ -1,4 +1,6 @@
+import importlib
 import os
+from functools import lru_cache
 
 import click
 
@@ -32,15 +34,26 @@ class CLI(click.MultiCommand):
         :param name: Command name
         :return: Module's cli function
         """
-        ns = {}
-
-        filename = os.path.join(cmd_folder, cmd_prefix + name + '.py')
-
-        with open(filename) as f:
-            code = compile(f.read(), filename, 'exec')
-            eval(code, ns, ns)
-
-        return ns['cli']
+        return load_command(name)
+
+
+@lru_cache(maxsize=None)
+def load_command(name):
+    """
+    Import a command's module, compiled once and cached like any module.
+
+    :param name: Command name
+    :return: Module's cli function, or None if there is no such command
+    """
+    module_name = f'{__package__}.commands.{cmd_prefix}{name}'
+    try:
+        module = importlib.import_module(module_name)
+    except ModuleNotFoundError as e:
+        if e.name != module_name:
+            raise
+        return None
+
+    return module.cli
 
 
 @click.command(cls=CLI)
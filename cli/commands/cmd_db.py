@@ -1,17 +1,27 @@
+import os
+from functools import wraps
+
 import click
 
-from sqlalchemy_utils import database_exists, create_database
+# The app, models and database libraries are only imported once a command
+# runs, so listing the commands and --help stay fast
 
-from utils.sql import ScopedSession
-from world_manager.app import create_app
-from world_manager.extensions import db
 
+def with_app(command):
+    """
+    Create the app for the database connection before running a command,
+    unless it exists already.
+    """
+    @wraps(command)
+    def run(*args, **kwargs):
+        from world_manager.app import create_app
+        from world_manager.extensions import db
 
-# Create an app context for the database connection.
-from world_manager.model import stat
+        if db.app is None:
+            db.app = create_app()
+        return command(*args, **kwargs)
 
-app = create_app()
-db.app = app
+    return run
 
 
 @click.group()
@@ -23,6 +33,7 @@ def cli():
 @cli.command()
 @click.option('--with-test-db/--no-with-test-db', default=False,
               help='Create a test db too?')
+@with_app
 def init(with_test_db):
     """
     Initialize the database.
@@ -30,11 +41,14 @@ def init(with_test_db):
     :param with_test_db: Create a test database
     :return: None
     """
+    from sqlalchemy_utils import database_exists, create_database
+    from world_manager.extensions import db
+
     db.drop_all()
     db.create_all()
 
     if with_test_db:
-        db_uri = '{0}_test'.format(app.config['SQLALCHEMY_DATABASE_URI'])
+        db_uri = '{0}_test'.format(db.app.config['SQLALCHEMY_DATABASE_URI'])
 
         if not database_exists(db_uri):
             create_database(db_uri)
@@ -42,12 +56,36 @@ def init(with_test_db):
     return None
 
 
+@cli.command()
+@with_app
+def index():
+    """
+    Add the search indexes missing from an existing database, and index
+    every row. ``init`` creates them along with the tables.
+
+    :return: None
+    """
+    from world_manager.extensions import db
+    from world_manager.model.search import SEARCH_INDEXES
+
+    with db.engine.begin() as connection:
+        for kind, search_index in SEARCH_INDEXES.items():
+            search_index.create(connection)
+            click.echo(f'Indexed {kind}')
+
+    return None
+
+
 # noinspection PyArgumentList
 @cli.command()
+@with_app
 def seed():
     """
     Seed the database with an initial user.
     """
+    from utils.sql import DeferredCommit
+    from world_manager.model.importer import BulkImporter
+
     schools_of_magic = ('Abjuration', 'Divination', 'Enchantment', 'Evocation',
                         'Illusion', 'Necromancy', 'Transmutation')
     damage_types = ('Acid', 'Bludgeoning', 'Cold', 'Fire', 'Force', 'Lightning',
@@ -88,24 +126,67 @@ def seed():
         ('Performance', 'CHA'),
         ('Persuasion', 'CHA')
     )
-    with ScopedSession() as session:
-        for school_name in schools_of_magic:
-            session.add(stat.SchoolOfMagic(name=school_name))
-        session.commit()
-        for damage_type_name in damage_types:
-            session.add(stat.DamageType(name=damage_type_name))
-        session.commit()
-        for name, abbreviation, value in coin_types:
-            session.add(stat.CoinType(name=name, abbreviation=abbreviation,
-                                      value=value))
-        session.commit()
-        for name, abbreviation in abilities:
-            session.add(stat.Ability(name=name, abbreviation=abbreviation))
-        session.commit()
-        for name, default_ability in skills:
-            ability = session.query(stat.Ability).filter_by(
-                abbreviation=default_ability).one()
-            session.add(stat.Skill(name=name, default_ability_id=ability.id))
+    reference_data = (
+        ('schools_of_magic', [{'name': n} for n in schools_of_magic]),
+        ('damage_types', [{'name': n} for n in damage_types]),
+        ('coin_types', [{'name': n, 'abbreviation': a, 'value': v}
+                        for n, a, v in coin_types]),
+        ('abilities', [{'name': n, 'abbreviation': a} for n, a in abilities]),
+        ('skills', [{'name': n, 'default_ability': a} for n, a in skills]),
+    )
+    with DeferredCommit() as session:
+        importer = BulkImporter(session)
+        for kind, rows in reference_data:
+            click.echo(str(importer.load(kind, rows)))
+
+
+@cli.command('import')
+@click.argument('paths', nargs=-1, required=True,
+                type=click.Path(exists=True))
+@click.option('--batch-size', type=int,
+              help='Rows sent to the database per statement')
+@with_app
+def import_data(paths, batch_size):
+    """
+    Import reference data from JSON, JSON lines or CSV files.
+
+    Each file is named after the kind of data it holds, e.g. spells.csv.
+    Directories are searched for such files. Rows that already exist are
+    updated, so the import can be re-run. Everything is imported in a single
+    transaction.
+
+    :param paths: files or directories to import
+    :param batch_size: rows sent to the database per statement
+    :return: None
+    """
+    from utils.sql import DeferredCommit
+    from world_manager.model.importer import BulkImporter, \
+        DEFAULT_BATCH_SIZE, sort_files
+
+    batch_size = batch_size or DEFAULT_BATCH_SIZE
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, f) for f in os.listdir(path)
+                         if f.endswith(('.csv', '.jsonl', '.json')))
+        else:
+            files.append(path)
+
+    total_rows = 0
+    total_seconds = 0.0
+    with DeferredCommit(batch_size=batch_size) as session:
+        importer = BulkImporter(session, batch_size=batch_size)
+        for path in sort_files(files):
+            result = importer.load_file(path)
+            total_rows += result.rows
+            total_seconds += result.seconds
+            click.echo(str(result))
+
+    rate = total_rows / total_seconds if total_seconds else 0
+    click.echo(f'Imported {total_rows} rows in {total_seconds:.3f}s '
+               f'({rate:,.0f} rows/s)')
+
+    return None
 
 
 @cli.command()
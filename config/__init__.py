@@ -0,0 +1,35 @@
+import logging
+from typing import Optional
+
+from flask import Flask
+
+
+def load_config(app: Flask, settings_override: Optional[dict]=None) -> None:
+    """
+    Load the settings of an app: the defaults in `config.settings`, then the
+    instance's ``settings.py`` if there is one, then the overrides.
+
+    :param app: the flask app
+    :param settings_override: any settings to override
+    """
+    app.config.from_object('config.settings')
+    app.config.from_pyfile('settings.py', silent=True)
+
+    if settings_override:
+        app.config.update(settings_override)
+
+
+def configure_logging(app: Flask) -> None:
+    """
+    Send the logs of the ``world_manager`` loggers, the app's own and those
+    of the SQL profiler among them, to stderr at ``LOG_LEVEL``.
+
+    :param app: the flask app
+    """
+    logger = logging.getLogger('world_manager')
+    logger.setLevel(app.config.get('LOG_LEVEL', logging.INFO))
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(
+            app.config.get('LOG_FORMAT', logging.BASIC_FORMAT)))
+        logger.addHandler(handler)
@@ -5,9 +5,41 @@ DEBUG = True
 SERVER_NAME = 'localhost:5000'
 SECRET_KEY = 'insecurekeyfordev'
 
+# Logging of the app, its workers and the SQL profiler
+LOG_LEVEL = 'INFO'
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
+
 # Database
 SQLALCHEMY_DATABASE_URI = 'sqlite+pysqlite:///world_manager.db'
 SQLALCHEMY_TRACK_MODIFICATIONS = False
+# SQLite pragmas, set on each new connection, or left to SQLite if None. In
+# WAL mode readers and the writer don't wait for each other, and NORMAL
+# syncs only at checkpoints. CACHE_SIZE is in KiB when negative, MMAP_SIZE
+# in bytes and BUSY_TIMEOUT in milliseconds. Connections to a file are kept
+# in a pool of POOL_SIZE, or opened per use if 0.
+SQLITE_JOURNAL_MODE = 'wal'
+SQLITE_SYNCHRONOUS = 'normal'
+SQLITE_CACHE_SIZE = -64000
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+SQLITE_BUSY_TIMEOUT = 5000
+SQLITE_POOL_SIZE = 5
+# Connection pool of server databases, like PostgreSQL. Connections are
+# replaced after RECYCLE seconds, and checked before use with PRE_PING.
+DATABASE_POOL_SIZE = 10
+DATABASE_MAX_OVERFLOW = 20
+DATABASE_POOL_RECYCLE = 1800
+DATABASE_POOL_PRE_PING = True
+DATABASE_POOL_TIMEOUT = 30
+# SQL statements of each request and Celery task, counted, timed and logged
+# at debug level. HEADERS sends the totals back in X-Query-Count and
+# X-Query-Time. A statement repeated N_PLUS_ONE times by one request is
+# logged as a warning. A summary of the last WINDOW requests and tasks is
+# logged every SUMMARY_EVERY of them, or never if None.
+SQL_PROFILER_ENABLED = True
+SQL_PROFILER_HEADERS = True
+SQL_PROFILER_N_PLUS_ONE = 5
+SQL_PROFILER_WINDOW = 1000
+SQL_PROFILER_SUMMARY_EVERY = 1000
 
 # Flask-Mail.
 MAIL_DEFAULT_SENDER = 'contact@local.host'
@@ -17,6 +49,8 @@ MAIL_USE_TLS = True
 MAIL_USE_SSL = False
 MAIL_USERNAME = 'you@gmail.com'
 MAIL_PASSWORD = 'awesomepassword'
+# Seconds a worker keeps an unused SMTP connection open for the next batch
+MAIL_POOL_MAX_IDLE = 30
 
 # Workers
 CELERY_USER_NAME = 'world-manager-celery-dev'
@@ -31,4 +65,43 @@ CELERY_RESULT_SERIALIZER = 'json'
 # User.
 SEED_ADMIN_EMAIL = 'dev@local.host'
 SEED_ADMIN_PASSWORD = 'devpassword'
-REMEMBER_COOKIE_DURATION = timedelta(days=90)
\ No newline at end of file
+REMEMBER_COOKIE_DURATION = timedelta(days=90)
+# Password hashing. Raising the iterations rehashes each password on its
+# next login. Hashing runs on WORKERS threads with at most MAX_PENDING
+# passwords waiting, for up to QUEUE_TIMEOUT seconds.
+PASSWORD_HASH_METHOD = 'pbkdf2:sha256'
+PASSWORD_HASH_ITERATIONS = 150000
+PASSWORD_HASH_WORKERS = 2
+PASSWORD_HASH_MAX_PENDING = 64
+PASSWORD_HASH_QUEUE_TIMEOUT = 5.0
+# Verified sign in tokens, remembered for TIMEOUT seconds. TYPE is one of
+# 'lru', 'filesystem', 'redis' or 'null'.
+TOKEN_CACHE_TYPE = 'lru'
+TOKEN_CACHE_TIMEOUT = 60
+TOKEN_CACHE_SIZE = 1024
+# Signed in users, remembered across requests for TIMEOUT seconds
+USER_CACHE_TYPE = 'lru'
+USER_CACHE_TIMEOUT = 30
+USER_CACHE_SIZE = 1024
+# Logins are written to the user table in batches of BATCH_SIZE, every
+# FLUSH_INTERVAL seconds or once MAX_PENDING are waiting. A FLUSH_INTERVAL
+# of None leaves flushing to whoever calls login_activity.flush(). While
+# they can't be written, the oldest logins past MAX_BUFFERED are dropped.
+LOGIN_ACTIVITY_FLUSH_INTERVAL = 1.0
+LOGIN_ACTIVITY_BATCH_SIZE = 500
+LOGIN_ACTIVITY_MAX_PENDING = 10000
+LOGIN_ACTIVITY_MAX_BUFFERED = 100000
+# Reference tables, like abilities and skills, are dropped from the cache
+# when this process writes to them, and otherwise after TIMEOUT seconds, so
+# the writes of other processes are seen too
+REFERENCE_DATA_TIMEOUT = 300
+# Rendered character sheets. TYPE is one of 'lru', 'filesystem', 'redis' or
+# 'null'; bump VERSION to drop every cached sheet, e.g. after a template
+# change.
+SHEET_CACHE_TYPE = 'lru'
+SHEET_CACHE_SIZE = 256
+SHEET_CACHE_DIR = None
+SHEET_CACHE_REDIS_URL = 'redis://localhost:6379/1'
+SHEET_CACHE_KEY_PREFIX = 'world-manager:'
+SHEET_CACHE_TIMEOUT = 24 * 60 * 60
+SHEET_CACHE_VERSION = 1
@@ -0,0 +1,44 @@
+"""
+Measure how long the ``world-manager`` command line takes to list its
+commands and show help, in fresh interpreters.
+
+Usage: python scripts/bench_cli_startup.py [number of runs]
+"""
+import statistics
+import subprocess
+import sys
+import time
+
+COMMANDS = (
+    ['--help'],
+    ['db', '--help'],
+    ['db', 'import', '--help'],
+)
+
+
+def cold_start(args) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c',
+                    'import sys; from cli.cli import cli; cli(sys.argv[1:])',
+                    *args], check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main(runs: int) -> None:
+    baseline = statistics.median(
+        cold_start_of('pass') for _ in range(runs))
+    print(f'{"python -c pass":<24} {baseline * 1000:>8.0f} ms')
+    for args in COMMANDS:
+        times = [cold_start(args) for _ in range(runs)]
+        print(f'{" ".join(args):<24} {statistics.median(times) * 1000:>8.0f} '
+              f'ms (median of {runs})')
+
+
+def cold_start_of(code: str) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], check=True)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -0,0 +1,59 @@
+"""
+Compare the throughput of `DiceRoller` with rolling the same dice one at a
+time with `random.randint`.
+
+Usage: python scripts/bench_dice.py [number of rolls]
+"""
+import random
+import sys
+import time
+
+from world_manager.model.stat import DieType
+from world_manager.rules.dice import DiceRoller
+
+
+def naive_roll(die, count, modifier=0, keep_highest=None):
+    rolls = [random.randint(1, die.value) for _ in range(count)]
+    if keep_highest is not None:
+        rolls = sorted(rolls)[count - keep_highest:]
+    return sum(rolls) + modifier
+
+
+def naive_d20(advantage=False):
+    if advantage:
+        return max(random.randint(1, 20), random.randint(1, 20))
+    return random.randint(1, 20)
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main(rolls: int) -> None:
+    random.seed(0)
+    roller = DiceRoller(0)
+    cases = [
+        ('2d6+3', lambda: [naive_roll(DieType.d6, 2, 3) for _ in range(rolls)],
+         lambda: roller.roll(DieType.d6, 2, rolls, modifier=3)),
+        ('4d6kh3', lambda: [naive_roll(DieType.d6, 4, keep_highest=3)
+                            for _ in range(rolls)],
+         lambda: roller.roll(DieType.d6, 4, rolls, keep_highest=3)),
+        ('d20 advantage', lambda: [naive_d20(True) for _ in range(rolls)],
+         lambda: roller.d20(rolls, advantage=True)),
+        ('8d6', lambda: [naive_roll(DieType.d6, 8) for _ in range(rolls)],
+         lambda: roller.roll(DieType.d6, 8, rolls)),
+    ]
+
+    print(f'{rolls:,} rolls each')
+    for name, naive, batch in cases:
+        naive_seconds = timed(naive)
+        batch_seconds = timed(batch)
+        print(f'{name:>14}: randint {rolls / naive_seconds:>14,.0f} rolls/s'
+              f'  batch {rolls / batch_seconds:>14,.0f} rolls/s'
+              f'  ({naive_seconds / batch_seconds:.0f}x)')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,77 @@
+"""
+Time 10,000 simulated encounters with a naive one-fight-at-a-time loop, the
+vectorized simulator in this process, and the simulator on a process pool.
+
+Usage: python scripts/bench_encounter.py [number of encounters] [workers]
+"""
+import os
+import random
+import sys
+import time
+
+from world_manager.rules.encounter import Combatant, simulate
+from world_manager.rules.expression import parse
+
+PARTY = [Combatant('Fighter', 44, 18, 7, '2d6+4', 1),
+         Combatant('Rogue', 33, 15, 7, '1d6+3d6+4', 4),
+         Combatant('Cleric', 38, 18, 5, '1d8+3', 0),
+         Combatant('Wizard', 22, 12, 6, '3d10', 2)]
+MONSTERS = [Combatant('Ogre', 59, 11, 6, '2d8+4', -1),
+            Combatant('Ogre', 59, 11, 6, '2d8+4', -1),
+            Combatant('Goblin', 7, 15, 4, '1d6+2', 2),
+            Combatant('Goblin', 7, 15, 4, '1d6+2', 2)]
+
+
+def naive_damage(expression) -> int:
+    total = expression.constant
+    for sign, term in expression.terms:
+        total += sign * sum(random.randint(1, term.sides)
+                            for _ in range(term.count))
+    return total
+
+
+def naive_encounter() -> bool:
+    sides = [[[c, c.hit_points, parse(c.damage)] for c in PARTY],
+             [[c, c.hit_points, parse(c.damage)] for c in MONSTERS]]
+    order = [0, 1] if random.randint(1, 20) >= random.randint(1, 20) \
+        else [1, 0]
+    for _ in range(100):
+        for side in order:
+            for attacker in sides[side]:
+                targets = [t for t in sides[1 - side] if t[1] > 0]
+                if attacker[1] <= 0 or not targets:
+                    continue
+                roll = random.randint(1, 20)
+                if roll == 20 or (roll > 1 and roll + attacker[0].attack_bonus
+                                  >= targets[0][0].armor_class):
+                    targets[0][1] -= max(naive_damage(attacker[2]), 0)
+        if not all(any(c[1] > 0 for c in side) for side in sides):
+            break
+    return all(c[1] <= 0 for c in sides[1])
+
+
+def main(encounters: int, workers: int) -> None:
+    random.seed(0)
+    start = time.perf_counter()
+    wins = sum(naive_encounter() for _ in range(encounters))
+    naive_seconds = time.perf_counter() - start
+    print(f'naive loop:  {naive_seconds:.3f}s  win rate '
+          f'{wins / encounters:.3f}')
+
+    start = time.perf_counter()
+    stats = simulate(PARTY, MONSTERS, encounters, seed=0, workers=1)
+    serial_seconds = time.perf_counter() - start
+    print(f'vectorized:  {serial_seconds:.3f}s  win rate '
+          f'{stats.win_rate:.3f} ({naive_seconds / serial_seconds:.0f}x)')
+
+    start = time.perf_counter()
+    pooled = simulate(PARTY, MONSTERS, encounters, seed=0, workers=workers)
+    pool_seconds = time.perf_counter() - start
+    print(f'{workers} workers:   {pool_seconds:.3f}s  win rate '
+          f'{pooled.win_rate:.3f} ({naive_seconds / pool_seconds:.0f}x)')
+    print(stats.as_dict())
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count() or 1)
@@ -0,0 +1,83 @@
+"""
+Compare walking the event hierarchy with lazy loads against the recursive
+CTE tree queries, on a deep and a wide synthetic tree.
+
+Usage: python scripts/bench_event_tree.py [depth] [fan out] [wide depth]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from world_manager.app import create_app
+from world_manager.extensions import db
+from world_manager.model.world import Event
+
+
+def deep_tree(depth: int):
+    yield {'id': 1, 'name': 'deep 1', 'parent_event_id': None}
+    for i in range(2, depth + 1):
+        yield {'id': i, 'name': f'deep {i}', 'parent_event_id': i - 1}
+
+
+def wide_tree(first_id: int, fan_out: int, depth: int):
+    level = [first_id]
+    yield {'id': first_id, 'name': f'wide {first_id}', 'parent_event_id': None}
+    next_id = first_id + 1
+    for _ in range(depth):
+        children = []
+        for parent_id in level:
+            for _ in range(fan_out):
+                yield {'id': next_id, 'name': f'wide {next_id}',
+                       'parent_event_id': parent_id}
+                children.append(next_id)
+                next_id += 1
+        level = children
+
+
+def walk(event: Event) -> int:
+    return 1 + sum(walk(child) for child in event.children)
+
+
+def timed(label: str, function) -> None:
+    db.session.remove()
+    start = time.perf_counter()
+    result = function()
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f'{label:<40} {elapsed:>10.1f} ms  ({result} events)')
+
+
+def main(depth: int, fan_out: int, wide_depth: int) -> None:
+    directory = tempfile.mkdtemp()
+    app = create_app({'SQLALCHEMY_DATABASE_URI':
+                      f'sqlite:///{os.path.join(directory, "bench.db")}'})
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), depth * 10))
+    with app.app_context():
+        db.create_all()
+        Event.save_all(deep_tree(depth), batch_size=5000)
+        wide_root = depth + 1
+        Event.save_all(wide_tree(wide_root, fan_out, wide_depth),
+                       batch_size=5000)
+
+        for label, root_id in (('deep', 1), ('wide', wide_root)):
+            timed(f'{label}: lazy walk',
+                  lambda: walk(Event.query.get(root_id)))
+            timed(f'{label}: load_subtree + walk',
+                  lambda: walk(Event.load_subtree(root_id)))
+            timed(f'{label}: descendants',
+                  lambda: len(Event.query.get(root_id).descendants()))
+
+        def lazy_ancestors():
+            event, count = Event.query.get(depth), 0
+            while event.parent is not None:
+                event, count = event.parent, count + 1
+            return count
+
+        timed('deep: lazy parent walk', lazy_ancestors)
+        timed('deep: ancestors',
+              lambda: len(Event.query.get(depth).ancestors()))
+
+
+if __name__ == '__main__':
+    args = [int(a) for a in sys.argv[1:]]
+    main(*(args + [500, 10, 4][len(args):]))
@@ -0,0 +1,110 @@
+"""
+Measure a burst of logins checked on the request threads, as
+`User.authenticate` did, against logins checked on the bounded password
+hashing pool, along with the latency of cheap requests served meanwhile,
+and the throughput of deserializing sign in tokens with and without the
+cache.
+
+Usage: python scripts/bench_login.py [number of logins] [request threads]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from itsdangerous import TimedJSONWebSignatureSerializer
+from werkzeug.security import check_password_hash
+
+from world_manager.app import create_app
+from world_manager.extensions import db
+from world_manager.model.account import User
+
+PASSWORD = 'correct horse battery staple'
+USERS = 20
+
+
+def login_burst(label: str, check, users, logins: int, threads: int) -> None:
+    """ Log in from `threads` threads while a probe runs cheap requests. """
+    done = threading.Event()
+    probe_latencies = []
+
+    def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            sum(range(2000))
+            probe_latencies.append(time.perf_counter() - start)
+            time.sleep(0.005)
+
+    def log_in(count):
+        for i in range(count):
+            assert check(users[i % len(users)], PASSWORD)
+
+    prober = threading.Thread(target=probe)
+    workers = [threading.Thread(target=log_in, args=(logins // threads,))
+               for _ in range(threads)]
+    start = time.perf_counter()
+    prober.start()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    done.set()
+    prober.join()
+
+    latencies = sorted(probe_latencies)
+    p99 = latencies[int(len(latencies) * 0.99)]
+    print(f'{label:<28} {logins / elapsed:>8.1f} logins/s   other requests '
+          f'p50 {statistics.median(latencies) * 1000:.2f} ms, '
+          f'p99 {p99 * 1000:.2f} ms')
+
+
+def tokens(label: str, deserialize, token: str, count: int) -> None:
+    start = time.perf_counter()
+    for _ in range(count):
+        assert deserialize(token) is not None
+        db.session.remove()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<28} {count / elapsed:>8,.0f} tokens/s')
+
+
+def uncached_deserialize(token: str):
+    """ `User.deserialize_token` before tokens were cached. """
+    private_key = TimedJSONWebSignatureSerializer(
+        db.get_app().config['SECRET_KEY'])
+    payload = private_key.loads(token)
+    return User.find_by_identity(payload.get('user_email'))
+
+
+def main(logins: int, threads: int) -> None:
+    directory = tempfile.mkdtemp()
+    app = create_app({'SQLALCHEMY_DATABASE_URI':
+                      f'sqlite:///{os.path.join(directory, "bench.db")}'})
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(User(username=f'user{i}',
+                                email_address=f'user{i}@local.host',
+                                password=PASSWORD) for i in range(USERS))
+        db.session.commit()
+        users = User.query.all()
+        print(f'{logins} logins from {threads} threads, '
+              f'{app.config["PASSWORD_HASH_WORKERS"]} hashing threads, '
+              f'{os.cpu_count()} CPUs')
+
+        login_burst('on request threads',
+                    lambda user, password: check_password_hash(user.password,
+                                                               password),
+                    users, logins, threads)
+        login_burst('on the hashing pool', User.authenticate, users, logins,
+                    threads)
+
+        token = users[0].serialize_token()
+        tokens('new serializer and query', uncached_deserialize, token, 5000)
+        tokens('cached', User.deserialize_token, token, 5000)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 16)
@@ -0,0 +1,99 @@
+"""
+Measure recording logins from several request threads by updating and
+committing the user's row on each login, as `User.register_login` did,
+against buffering them and writing them in batches.
+
+Usage: python scripts/bench_login_activity.py [number of logins] [threads]
+"""
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+import pytz
+
+from utils.sql import tz_aware_now
+from world_manager.app import create_app
+from world_manager.extensions import db
+from world_manager.model.account import User, login_activity
+
+USERS = 50
+
+
+def synchronous_login(user_id: int, ip_address: str) -> None:
+    """ `User.register_login` before logins were buffered. """
+    user = User.query.get(user_id)
+    user.login_count += 1
+    user.last_login_ip_address = user.current_login_ip_address
+    # SQLite returns naive datetimes, which AwareDateTime won't store back
+    last_login_time = user.current_login_time
+    if last_login_time is not None and last_login_time.tzinfo is None:
+        last_login_time = pytz.utc.localize(last_login_time)
+    user.last_login_time = last_login_time
+    user.current_login_ip_address = ip_address
+    user.current_login_time = tz_aware_now()
+    db.session.commit()
+
+
+def buffered_login(user_id: int, ip_address: str) -> None:
+    User.query.get(user_id).register_login(ip_address)
+    db.session.commit()
+
+
+def run(label: str, app, login, logins: int, threads: int) -> None:
+    latencies = []
+
+    def log_in(count, offset):
+        with app.app_context():
+            for i in range(count):
+                start = time.perf_counter()
+                login((offset + i) % USERS + 1, f'10.0.0.{i % 250}')
+                latencies.append(time.perf_counter() - start)
+                db.session.remove()
+
+    workers = [threading.Thread(target=log_in, args=(logins // threads, n))
+               for n in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    with app.app_context():
+        login_activity.flush()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)]
+    print(f'{label:<12} {len(latencies) / elapsed:>8,.0f} logins/s   '
+          f'p50 {statistics.median(latencies) * 1000:.2f} ms, '
+          f'p99 {p99 * 1000:.2f} ms')
+
+
+def main(logins: int, threads: int) -> None:
+    directory = tempfile.mkdtemp()
+    app = create_app({'SQLALCHEMY_DATABASE_URI':
+                      f'sqlite:///{os.path.join(directory, "bench.db")}',
+                      'PASSWORD_HASH_ITERATIONS': 1000})
+    with app.app_context():
+        db.create_all()
+        db.session.add_all(User(username=f'user{i}',
+                                email_address=f'user{i}@local.host',
+                                password='password') for i in range(USERS))
+        db.session.commit()
+    print(f'{logins} logins of {USERS} users from {threads} threads')
+
+    run('synchronous', app, synchronous_login, logins, threads)
+    run('buffered', app, buffered_login, logins, threads)
+    print('flush stats', login_activity.stats())
+
+    with app.app_context():
+        total = db.session.query(db.func.sum(User.login_count)).scalar()
+    # Concurrent read-modify-writes of the ORM lose some of the counts
+    print(f'{total} of {2 * (logins // threads) * threads} logins counted')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 8)
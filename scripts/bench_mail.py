@@ -0,0 +1,73 @@
+"""
+Compare sending contact e-mails to a local SMTP server one connection and
+one pair of template lookups per message, as `send_template_message` did,
+against a batch over a pooled connection with cached templates.
+
+The local server answers instantly, so the difference only grows with the
+round trips, STARTTLS and login of a real server.
+
+Usage: python scripts/bench_mail.py [number of messages]
+"""
+import socket
+import sys
+import time
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.handlers import Sink
+from flask import render_template
+
+from utils.flask_mailplus import connection_pool
+from world_manager.app import create_app
+from world_manager.blueprints.contact.tasks import deliver_contact_emails
+from world_manager.extensions import mail
+
+
+def render_or_none(template: str, **context):
+    try:
+        return render_template(template, **context)
+    except IOError:
+        pass
+
+
+def send_one_by_one(contacts) -> None:
+    for email, message in contacts:
+        context = {'email': email, 'message': message}
+        mail.send_message(
+            subject='[World Manager] Contact', sender=email,
+            recipients=['contact@local.host'], reply_to=email,
+            body=render_or_none('contact/mail/index.txt', **context),
+            html=render_or_none('contact/mail/index.html', **context))
+
+
+def timed(label: str, function, contacts) -> None:
+    start = time.perf_counter()
+    function(contacts)
+    elapsed = time.perf_counter() - start
+    print(f'{label:<36} {len(contacts) / elapsed:>10,.0f} messages/s')
+
+
+def main(count: int) -> None:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    controller = Controller(Sink(), hostname='127.0.0.1', port=port)
+    controller.start()
+
+    app = create_app()
+    app.config.update(MAIL_USERNAME='contact@local.host', DEBUG=False)
+    app.jinja_env.auto_reload = False
+    app.extensions['mail'] = mail.init_mail({
+        'MAIL_SERVER': '127.0.0.1', 'MAIL_PORT': port,
+        'MAIL_USE_TLS': False})
+
+    contacts = [(f'visitor{i}@local.host', f'Message {i}')
+                for i in range(count)]
+    with app.app_context():
+        timed('connection per message', send_one_by_one, contacts)
+        timed('pooled batch', deliver_contact_emails.run, contacts)
+        connection_pool.close()
+    controller.stop()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
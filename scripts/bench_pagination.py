@@ -0,0 +1,60 @@
+"""
+Compare the time to fetch pages at increasing depths of the item list by
+value with ``LIMIT``/``OFFSET`` against keyset pagination.
+
+Usage: python scripts/bench_pagination.py [number of items]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from utils.pagination import keyset_paginate
+from world_manager.app import create_app
+from world_manager.extensions import db
+from world_manager.model import stat
+
+PER_PAGE = 50
+REPEAT = 20
+ORDER = (stat.Item.value, stat.Item.id)
+
+
+def timed(function) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        function()
+        db.session.remove()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main(count: int) -> None:
+    directory = tempfile.mkdtemp()
+    app = create_app({'SQLALCHEMY_DATABASE_URI':
+                      f'sqlite:///{os.path.join(directory, "bench.db")}'})
+    with app.app_context():
+        db.create_all()
+        stat.Item.save_all(({'name': f'Item {i}', 'value': (i * 7919) % count}
+                            for i in range(count)), batch_size=5000)
+        db.session.commit()
+
+        # Walk the whole list with cursors, keeping one at each depth
+        pages = count // PER_PAGE
+        depths = [int(pages * d) for d in (0.0, 0.25, 0.5, 0.99)]
+        cursors, cursor = {}, None
+        for page in range(max(depths) + 1):
+            if page in depths:
+                cursors[page] = cursor
+            cursor = keyset_paginate(stat.Item.query, ORDER, PER_PAGE,
+                                     after=cursor).next_cursor
+            db.session.remove()
+
+        print(f'{"page":>8} {"offset ms":>10} {"keyset ms":>10}')
+        for page in depths:
+            by_offset = timed(lambda: stat.Item.query.order_by(*ORDER)
+                              .offset(page * PER_PAGE).limit(PER_PAGE).all())
+            by_keyset = timed(lambda: keyset_paginate(
+                stat.Item.query, ORDER, PER_PAGE, after=cursors[page]))
+            print(f'{page:>8} {by_offset:>10.2f} {by_keyset:>10.2f}')
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
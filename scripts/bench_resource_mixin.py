@@ -0,0 +1,86 @@
+"""
+Compare construction and update throughput of models using the previous
+`ResourceMixin.__setattr__` timestamp tracking with the current mapper-level
+`onupdate` tracking.
+
+Usage: python scripts/bench_resource_mixin.py [number of rows]
+"""
+import sys
+import time
+
+from sqlalchemy import Column, Integer, String, create_engine
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import Session
+
+from utils.sql import AwareDateTime, ResourceMixin, tz_aware_now
+
+Base = declarative_base()
+
+
+class SetattrResourceMixin:
+    """ The timestamp tracking `ResourceMixin` used before. """
+    db_created_on = Column(AwareDateTime(), default=tz_aware_now)
+    db_updated_on = Column(AwareDateTime(), default=tz_aware_now)
+
+    def __setattr__(self, key, value):
+        if hasattr(self, key):
+            if getattr(self, key) != value:
+                super().__setattr__(key, value)
+                super().__setattr__('db_updated_on', tz_aware_now())
+        else:
+            super().__setattr__(key, value)
+
+
+class Before(SetattrResourceMixin, Base):
+    __tablename__ = 'before'
+    id = Column(Integer, primary_key=True)
+    name = Column(String(64))
+    level = Column(Integer)
+    description = Column(String)
+
+
+class After(ResourceMixin, Base):
+    __tablename__ = 'after'
+    id = Column(Integer, primary_key=True)
+    name = Column(String(64))
+    level = Column(Integer)
+    description = Column(String)
+
+
+def bench(model, count: int) -> None:
+    engine = create_engine('sqlite://')
+    Base.metadata.create_all(engine)
+    session = Session(engine)
+
+    start = time.perf_counter()
+    rows = [model(name=f'Row {i}', level=i % 10, description='A row')
+            for i in range(count)]
+    construct = time.perf_counter() - start
+
+    session.add_all(rows)
+    session.commit()
+    for row in rows:
+        row.level
+    start = time.perf_counter()
+    for row in rows:
+        row.name = f'Renamed {row.id}'
+        row.level = row.level + 1
+        row.description = 'An updated row'
+    assign = time.perf_counter() - start
+
+    start = time.perf_counter()
+    session.commit()
+    flush = time.perf_counter() - start
+
+    print(f'{model.__name__:<8} construct {count / construct:>12,.0f} rows/s'
+          f'  assign {count / assign:>12,.0f} rows/s'
+          f'  flush updates {count / flush:>10,.0f} rows/s')
+
+
+def main(count: int) -> None:
+    for model in (Before, After):
+        bench(model, count)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
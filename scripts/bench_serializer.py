@@ -0,0 +1,82 @@
+"""
+Compare serializing items with the per-instance mapper inspection used by
+`as_dict` and `JsonSerializableBase.__json__` before, against the compiled
+per-model serializers, and the memory of encoding a whole list at once
+against streaming it.
+
+Usage: python scripts/bench_serializer.py [number of items]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from flask_jsontools import JsonSerializableBase
+
+from utils.streaming import iter_json
+from world_manager.app import create_app
+from world_manager.extensions import db
+from world_manager.model import stat
+
+
+def mapper_as_dict(instance) -> dict:
+    """ `ModelBase.as_dict` before the serializers were compiled. """
+    column_names = (c.name for c in instance.__mapper__.columns)
+    return {n: getattr(instance, n) for n in column_names}
+
+
+def timed(label: str, function, items) -> None:
+    start = time.perf_counter()
+    for item in items:
+        function(item)
+    elapsed = time.perf_counter() - start
+    print(f'{label:<34} {len(items) / elapsed:>12,.0f} items/s')
+
+
+def peak_memory(label: str, function) -> None:
+    tracemalloc.start()
+    size = function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f'{label:<34} {peak / 2**20:>9.1f} MiB peak  '
+          f'({size / 2**20:.1f} MiB of JSON)')
+
+
+def main(count: int) -> None:
+    directory = tempfile.mkdtemp()
+    app = create_app({'SQLALCHEMY_DATABASE_URI':
+                      f'sqlite:///{os.path.join(directory, "bench.db")}'})
+    with app.app_context():
+        db.create_all()
+        stat.Item.save_all(({'name': f'Item {i}', 'description': 'x' * 200,
+                             'weight': i % 20, 'value': i}
+                            for i in range(count)), batch_size=5000)
+        db.session.commit()
+
+        items = stat.Item.query.all()
+        timed('as_dict (mapper columns)', mapper_as_dict, items)
+        timed('as_dict (compiled)', stat.Item.as_dict, items)
+        timed('__json__ (JsonSerializableBase)',
+              lambda i: JsonSerializableBase.__json__(i), items)
+        timed('to_json (compiled)', stat.Item.to_json, items)
+        del items
+        db.session.remove()
+
+        def encode_all():
+            items = stat.Item.query.all()
+            return len(json.dumps(
+                {'results': [i.to_json() for i in items]}))
+
+        def stream():
+            query = stat.Item.query.order_by(stat.Item.id).yield_per(500)
+            return sum(len(p) for p in iter_json(query, stat.Item.to_json))
+
+        peak_memory('query.all() + json.dumps', encode_all)
+        db.session.remove()
+        peak_memory('yield_per + iter_json', stream)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,100 @@
+"""
+Compare the time and memory it takes to load every stat block as ORM
+instances with `StatBlock.load_sheet` and as `StatBlockSnapshot`s built
+from SQL rows.
+
+Usage: python scripts/bench_snapshot.py [number of stat blocks]
+"""
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from world_manager.app import create_app
+from world_manager.extensions import db
+from world_manager.model import stat
+from world_manager.model.snapshot import load_snapshots
+
+ABILITIES = ('STR', 'DEX', 'CON', 'INT', 'WIS', 'CHA')
+
+
+def populate(count: int) -> None:
+    def insert(model, rows):
+        db.session.execute(model.__table__.insert(), list(rows))
+
+    insert(stat.Ability, ({'id': i, 'name': a, 'abbreviation': a}
+                          for i, a in enumerate(ABILITIES, 1)))
+    insert(stat.Skill, [{'id': 1, 'name': 'Athletics',
+                         'default_ability_id': 1},
+                        {'id': 2, 'name': 'Stealth',
+                         'default_ability_id': 2}])
+    insert(stat.SpeedType, [{'id': 1, 'name': 'Walk'}])
+    insert(stat.Race, [{'id': 1, 'name': 'Human'}])
+    insert(stat.CreatureClass, [{'id': 1, 'name': 'Fighter'}])
+
+    ids = range(1, count + 1)
+    insert(stat.StatBlock, ({'id': i, 'name': f'Stat block {i}',
+                             'race_id': 1, 'base_hit_point_max': 10 + i % 50}
+                            for i in ids))
+    insert(stat.StatBlockClass, ({'stat_block_id': i, 'creature_class_id': 1,
+                                  'level': 1 + i % 20, 'current_hit_dice': 1}
+                                 for i in ids))
+    insert(stat.AbilityScore, ({'id': (i - 1) * 6 + a, 'stat_block_id': i,
+                                'ability_id': a, 'base_value': 8 + (i + a) % 10}
+                               for i in ids for a in range(1, 7)))
+    insert(stat.SavingThrowProficiency, ({'ability_score_id': (i - 1) * 6 + 1,
+                                          'proficiency_multiplier': 1}
+                                         for i in ids))
+    insert(stat.SpeedScore, ({'stat_block_id': i, 'speed_type_id': 1,
+                              'base_value': 30} for i in ids))
+    insert(stat.SkillProficiency, ({'stat_block_id': i, 'skill_id': s,
+                                    'proficiency_multiplier': 1}
+                                   for i in ids for s in (1, 2)))
+    db.session.commit()
+
+
+def load_orm():
+    ids = [i for i, in db.session.query(stat.StatBlock.id)]
+    return stat.StatBlock.load_sheet(ids)
+
+
+def measure(label: str, function) -> None:
+    db.session.remove()
+    gc.collect()
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    del result
+
+    db.session.remove()
+    gc.collect()
+    tracemalloc.start()
+    result = function()
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f'{label:<28} {seconds:>8.2f} s  retained {retained / 2**20:>8.1f} '
+          f'MiB  peak {peak / 2**20:>8.1f} MiB  ({len(result)} stat blocks)')
+    del result
+    db.session.remove()
+
+
+def main(count: int) -> None:
+    directory = tempfile.mkdtemp()
+    app = create_app({'SQLALCHEMY_DATABASE_URI':
+                      f'sqlite:///{os.path.join(directory, "bench.db")}'})
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        populate(count)
+        print(f'created {count} stat blocks in '
+              f'{time.perf_counter() - start:.1f} s')
+
+        measure('ORM load_sheet', load_orm)
+        measure('load_snapshots', load_snapshots)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
@@ -0,0 +1,73 @@
+"""
+Compare ranked full-text spell search with LIKE scans over a synthetic
+10,000 spell corpus.
+
+Usage: python scripts/bench_spell_search.py [number of spells]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+from world_manager.app import create_app
+from world_manager.extensions import db
+from world_manager.model import stat
+from world_manager.model.importer import BulkImporter
+from world_manager.model.search import SEARCH_INDEXES
+
+KEYWORDS = ('push', 'frightened', 'cone', 'radiant', 'teleport', 'shadow',
+            'light', 'heal')
+FILLER = tuple(f'word{i}' for i in range(5000))
+KEYWORD_RATE = 0.01
+QUERIES = ('push', 'frightened cone', 'radiant', 'tele', 'shadow light')
+REPEAT = 20
+
+
+def sentence(rng: random.Random, length: int) -> str:
+    return ' '.join(rng.choice(KEYWORDS) if rng.random() < KEYWORD_RATE
+                    else rng.choice(FILLER) for _ in range(length))
+
+
+def spells(count: int):
+    rng = random.Random(0)
+    for i in range(count):
+        yield {'name': f'Spell {i} {sentence(rng, 2)}', 'level': i % 10,
+               'ritual': False, 'school': 'Evocation', 'casting_time': 1,
+               'range': 'Self', 'description': sentence(rng, 60),
+               'higher_levels': sentence(rng, 10)}
+
+
+def timed(function) -> float:
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        function()
+    return (time.perf_counter() - start) / REPEAT * 1000
+
+
+def main(count: int) -> None:
+    directory = tempfile.mkdtemp()
+    app = create_app({'SQLALCHEMY_DATABASE_URI':
+                      f'sqlite:///{os.path.join(directory, "bench.db")}'})
+    with app.app_context():
+        db.create_all()
+        importer = BulkImporter(db.session)
+        importer.load('schools_of_magic', [{'name': 'Evocation'}])
+        print(importer.load('spells', spells(count)))
+        db.session.commit()
+
+        index = SEARCH_INDEXES['spells']
+        print(f'{"query":<20} {"matches":>8} {"fts ms":>8} {"like ms":>8}')
+        for query in QUERIES:
+            conditions = [stat.Spell.description.like(f'%{t}%')
+                          for t in query.split()]
+            total = index.search(query).total
+            fts = timed(lambda: index.search(query))
+            like_query = stat.Spell.query.filter(*conditions)
+            like = timed(lambda: (like_query.order_by(stat.Spell.name)
+                                  .limit(20).all(), like_query.count()))
+            print(f'{query:<20} {total:>8} {fts:>8.2f} {like:>8.2f}')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,45 @@
+"""
+Measure the cost of the SQL profiler: requests to the item list served with
+and without it.
+
+Usage: python scripts/bench_sql_profiler.py [number of requests]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from world_manager.app import create_app
+from world_manager.extensions import db
+from world_manager.model import stat
+
+
+def run(label: str, enabled: bool, count: int) -> None:
+    directory = tempfile.mkdtemp()
+    app = create_app({'SQLALCHEMY_DATABASE_URI':
+                      f'sqlite:///{os.path.join(directory, "bench.db")}',
+                      'SQL_PROFILER_ENABLED': enabled,
+                      'DEBUG': False})
+    with app.app_context():
+        db.create_all()
+        stat.Item.save_all({'name': f'Item {i}', 'value': i}
+                           for i in range(200))
+        db.session.commit()
+
+    client = app.test_client()
+    client.get('/api/items')
+    start = time.perf_counter()
+    for _ in range(count):
+        client.get('/api/items?per_page=20')
+    elapsed = time.perf_counter() - start
+    print(f'{label:<10} {count / elapsed:>8,.0f} requests/s '
+          f'{elapsed / count * 1e6:>8,.0f} us/request')
+
+
+def main(count: int) -> None:
+    run('disabled', False, count)
+    run('enabled', True, count)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
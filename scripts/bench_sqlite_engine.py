@@ -0,0 +1,103 @@
+"""
+Measure reads and writes made together from several threads on a SQLite
+database in rollback journal mode with a connection per use, as the engine
+was configured before, against WAL mode with pooled connections and the
+default pragmas.
+
+Usage: python scripts/bench_sqlite_engine.py [seconds] [reader threads]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from utils.engine import pragma
+from world_manager.app import create_app
+from world_manager.extensions import db
+from world_manager.model import stat
+
+ITEMS = 5000
+
+CONFIGURATIONS = {
+    'rollback journal': {'SQLITE_JOURNAL_MODE': 'delete',
+                         'SQLITE_SYNCHRONOUS': 'full',
+                         'SQLITE_CACHE_SIZE': None,
+                         'SQLITE_MMAP_SIZE': None,
+                         'SQLITE_POOL_SIZE': 0},
+    'wal, pooled': {},
+}
+
+
+def run(label: str, settings: dict, seconds: float, readers: int) -> None:
+    directory = tempfile.mkdtemp()
+    app = create_app(dict(settings, SQLALCHEMY_DATABASE_URI=(
+        f'sqlite:///{os.path.join(directory, "bench.db")}')))
+    with app.app_context():
+        db.create_all()
+        stat.Item.save_all(({'name': f'Item {i}', 'value': i}
+                            for i in range(ITEMS)), batch_size=5000)
+        db.session.commit()
+        journal_mode = pragma(db.engine, 'journal_mode')
+
+    done = threading.Event()
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def count(kind: str) -> None:
+        with lock:
+            counts[kind] += 1
+
+    def read() -> None:
+        with app.app_context():
+            while not done.is_set():
+                try:
+                    stat.Item.query.filter(
+                        stat.Item.value >= ITEMS // 2).order_by(
+                        stat.Item.value).limit(50).all()
+                    count('reads')
+                except OperationalError:
+                    count('errors')
+                db.session.remove()
+
+    def write() -> None:
+        with app.app_context():
+            i = 0
+            while not done.is_set():
+                try:
+                    item = stat.Item.query.get(i % ITEMS + 1)
+                    item.value = item.value + 1
+                    db.session.commit()
+                    count('writes')
+                except OperationalError:
+                    db.session.rollback()
+                    count('errors')
+                db.session.remove()
+                i += 1
+
+    threads = [threading.Thread(target=read) for _ in range(readers)]
+    threads.append(threading.Thread(target=write))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    done.set()
+    for thread in threads:
+        thread.join()
+
+    print(f'{label:<18} ({journal_mode:<6}) '
+          f'{counts["reads"] / seconds:>8,.0f} reads/s '
+          f'{counts["writes"] / seconds:>8,.0f} writes/s '
+          f'{counts["errors"]:>5} errors')
+
+
+def main(seconds: float, readers: int) -> None:
+    print(f'{readers} reader threads and 1 writer thread for {seconds} s')
+    for label, settings in CONFIGURATIONS.items():
+        run(label, settings, seconds, readers)
+
+
+if __name__ == '__main__':
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 5.0,
+         int(sys.argv[2]) if len(sys.argv) > 2 else 4)
@@ -0,0 +1,51 @@
+"""
+Measure the cold start of a Celery worker up to the point it would connect
+to the broker, in fresh interpreters: with the full web app, as
+`create_celery_app` used before, against the worker app profile.
+
+Usage: python scripts/bench_worker_startup.py [number of runs]
+"""
+import statistics
+import subprocess
+import sys
+
+FULL_APP = '''
+from world_manager.app import create_app
+from world_manager.worker import create_celery_app
+celery = create_celery_app(create_app())
+'''
+
+WORKER_APP = '''
+from world_manager.worker import celery
+'''
+
+# What `celery worker` does before connecting. Reading the config creates
+# the Flask app if it doesn't exist yet.
+STARTUP = '''
+import time
+start = time.perf_counter()
+{create}
+celery.loader.import_default_modules()
+celery.finalize()
+celery.conf.broker_url
+print(time.perf_counter() - start)
+'''
+
+
+def cold_start(create: str) -> float:
+    output = subprocess.run(
+        [sys.executable, '-c', STARTUP.format(create=create)],
+        check=True, capture_output=True, text=True).stdout
+    return float(output.split()[-1])
+
+
+def main(runs: int) -> None:
+    for label, create in (('full web app', FULL_APP),
+                          ('worker app', WORKER_APP)):
+        times = [cold_start(create) for _ in range(runs)]
+        print(f'{label:<14} {statistics.median(times) * 1000:>8.0f} ms '
+              f'(median of {runs})')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
@@ -1,5 +1,3 @@
-from world_manager.app import create_celery_app
+from world_manager.worker import celery
 
-app = create_celery_app()
-
-app.start(['', 'worker', '-B', '-l', 'info'])
+celery.start(['worker', '-B', '-l', 'info'])
@@ -0,0 +1,78 @@
+import json
+
+from world_manager.model import stat
+
+
+def test_to_json(db):
+    weapon = stat.Weapon(item=stat.Item(name='Serialized Whip', value=2),
+                         category=stat.WeaponCategory.Simple,
+                         properties=[stat.WeaponProperty(name='Reach')])
+    db.session.add(weapon)
+    db.session.commit()
+
+    data = weapon.to_json(include=('item', 'properties'))
+
+    assert data['category'] == 'Simple'
+    assert data['db_created_on'] == weapon.db_created_on.isoformat()
+    assert data['item']['name'] == 'Serialized Whip'
+    assert [p['name'] for p in data['properties']] == ['Reach']
+    assert weapon.as_dict()['category'] is stat.WeaponCategory.Simple
+    assert repr(weapon).startswith('Weapon(')
+    assert f'id={weapon.id}, ' in repr(weapon)
+    assert 'properties' in weapon.__json__()
+    assert json.dumps(weapon.to_json(exclude=('db_created_on',
+                                              'db_updated_on')))
+
+
+def test_export_streams_every_row(app, db):
+    db.session.add_all(
+        stat.Feature(name=f'Exported Feature {i}', description='Exported',
+                     category=stat.FeatureCategory.RacialTrait)
+        for i in range(450))
+    db.session.commit()
+
+    response = app.test_client().get('/api/features/export')
+    chunks = list(response.response)
+    data = json.loads(b''.join(chunks))
+
+    assert response.mimetype == 'application/json'
+    assert data['kind'] == 'features'
+    names = [f['name'] for f in data['results']]
+    assert names[-450:] == [f'Exported Feature {i}' for i in range(450)]
+    assert len(chunks) > 3
+    assert app.test_client().get('/api/nope/export').status_code == 404
+
+
+def test_list_pages_by_cursor(app, db):
+    client = app.test_client()
+    names, cursor = [], None
+    while True:
+        url = '/api/features?per_page=100'
+        if cursor:
+            url += f'&after={cursor}'
+        data = client.get(url).get_json()
+        names += [f['name'] for f in data['results']]
+        cursor = data['next']
+        if cursor is None:
+            break
+
+    assert names == sorted(names)
+    assert len(names) == stat.Feature.query.count()
+    assert client.get('/api/events').status_code == 200
+    assert client.get('/api/features?after=bogus').status_code == 400
+    wrong_list = f'/api/items?after={data["previous"]}'
+    assert client.get(wrong_list).status_code == 400
+    assert client.get('/api/nope').status_code == 404
+
+
+def test_list_stays_within_query_budget(app, db, query_budget):
+    db.session.add_all(stat.Item(name=f'Budget Item {i}', value=i)
+                       for i in range(30))
+    db.session.commit()
+    client = app.test_client()
+
+    with query_budget(1) as counter:
+        response = client.get('/api/items?per_page=25')
+    assert len(response.get_json()['results']) == 25
+    assert response.headers['X-Query-Count'] == str(counter.count)
+    assert float(response.headers['X-Query-Time']) >= 0
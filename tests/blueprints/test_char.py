@@ -0,0 +1,133 @@
+import fnmatch
+from unittest import mock
+
+import pytest
+
+from utils.cache import FileSystemCache, LRUCache, RedisCache, create_cache
+from world_manager.blueprints.char import views
+from world_manager.model import stat
+
+
+def _create_stat_block(db):
+    stat_block = stat.StatBlock(name='Cached Bard',
+                                race=stat.Race(name='Cached Gnome'))
+    stat_block.classes.append(stat.StatBlockClass(
+        creature_class=stat.CreatureClass(name='Cached Bard Class'),
+        level=3))
+    db.session.add(stat_block)
+    db.session.commit()
+    stat_block_id = stat_block.id
+    db.session.remove()
+    return stat_block_id
+
+
+def test_sheet_is_cached_and_revalidated(app, db):
+    stat_block_id = _create_stat_block(db)
+    client = app.test_client()
+    app.extensions['sheet_cache'].clear()
+
+    with mock.patch.object(views, 'render_template',
+                           wraps=views.render_template) as render:
+        first = client.get(f'/char/{stat_block_id}')
+        second = client.get(f'/char/{stat_block_id}')
+        not_modified = client.get(f'/char/{stat_block_id}', headers={
+            'If-None-Match': first.headers['ETag']})
+        since = client.get(f'/char/{stat_block_id}', headers={
+            'If-Modified-Since': first.headers['Last-Modified']})
+        assert render.call_count == 1
+
+    assert first.status_code == second.status_code == 200
+    assert b'Cached Bard' in first.data and second.data == first.data
+    assert not first.headers['ETag'].startswith('W/')
+    assert (not_modified.status_code, since.status_code) == (304, 304)
+    assert not_modified.data == b''
+
+    stat_block = stat.StatBlock.query.get(stat_block_id)
+    stat_block.name = 'Cached Skald'
+    db.session.commit()
+    db.session.remove()
+
+    changed = client.get(f'/char/{stat_block_id}', headers={
+        'If-None-Match': first.headers['ETag']})
+    assert changed.status_code == 200
+    assert b'Cached Skald' in changed.data
+
+    race = stat.Race.query.filter_by(name='Cached Gnome').one()
+    race.name = 'Cached Halfling'
+    db.session.commit()
+    db.session.remove()
+
+    renamed = client.get(f'/char/{stat_block_id}', headers={
+        'If-None-Match': changed.headers['ETag']})
+    assert renamed.status_code == 200
+    assert b'Cached Halfling' in renamed.data
+
+    creature_class = stat.CreatureClass.query.filter_by(
+        name='Cached Bard Class').one()
+    creature_class.name = 'Cached Skald Class'
+    db.session.commit()
+    db.session.remove()
+
+    reclassed = client.get(f'/char/{stat_block_id}', headers={
+        'If-None-Match': renamed.headers['ETag']})
+    assert reclassed.status_code == 200
+    assert b'Cached Skald Class' in reclassed.data
+    assert changed.headers['ETag'] != first.headers['ETag']
+    assert client.get('/char/0').status_code == 404
+
+
+def test_flinty_is_cached(app):
+    client = app.test_client()
+
+    first = client.get('/char/flinty')
+    second = client.get('/char/flinty', headers={
+        'If-None-Match': first.headers['ETag']})
+
+    assert (first.status_code, second.status_code) == (200, 304)
+
+
+def test_backends(tmpdir):
+    for cache in (LRUCache(size=2), FileSystemCache(str(tmpdir))):
+        cache.set('a', b'1')
+        cache.set('b', b'2')
+        assert cache.get('a') == b'1'
+        cache.delete('a')
+        assert cache.get('a') is None
+        cache.clear()
+        assert cache.get('b') is None
+
+    lru = LRUCache(size=2)
+    for key in 'abc':
+        lru.set(key, key.encode())
+    assert lru.get('a') is None and lru.get('c') == b'c'
+
+
+class _Redis(dict):
+    """ Just enough of a Redis client for `RedisCache`. """
+
+    def set(self, key, value, ex=None):
+        self[key] = value
+
+    def delete(self, key):
+        self.pop(key, None)
+
+    def scan_iter(self, match):
+        return [key for key in list(self) if fnmatch.fnmatch(key, match)]
+
+
+def test_redis_caches_share_a_database_apart():
+    client = _Redis()
+    with mock.patch.object(RedisCache, 'from_url',
+                           lambda url, **kwargs: RedisCache(client, **kwargs)):
+        tokens = create_cache({'TOKEN_CACHE_TYPE': 'redis'}, 'TOKEN_CACHE_')
+        users = create_cache({'USER_CACHE_TYPE': 'redis'}, 'USER_CACHE_')
+    tokens.set('1', b'token')
+    users.set('1', b'user')
+    assert set(client) == {'token_cache_1', 'user_cache_1'}
+
+    tokens.clear()
+    assert tokens.get('1') is None
+    assert users.get('1') == b'user'
+    with pytest.raises(ValueError):
+        RedisCache(client).clear()
+    assert users.get('1') == b'user'
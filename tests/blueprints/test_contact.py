@@ -0,0 +1,81 @@
+import smtplib
+import socket
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from utils.flask_mailplus import connection_pool, get_template
+from world_manager.blueprints.contact.tasks import deliver_contact_email, \
+    deliver_contact_emails
+from world_manager.extensions import mail
+
+
+class Recorder:
+    """ An SMTP handler keeping what it receives and refusing one address. """
+
+    def __init__(self):
+        self.sessions = set()
+        self.envelopes = []
+
+    async def handle_RCPT(self, server, session, envelope, address,
+                          rcpt_options):
+        if address.startswith('refused@'):
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        self.envelopes.append(envelope)
+        return '250 OK'
+
+
+@pytest.fixture
+def smtp_server(app):
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+    recorder = Recorder()
+    controller = Controller(recorder, hostname='127.0.0.1', port=port)
+    controller.start()
+    state = app.extensions['mail']
+    app.extensions['mail'] = mail.init_mail({
+        'MAIL_SERVER': '127.0.0.1',
+        'MAIL_PORT': port,
+        'MAIL_USE_TLS': False,
+        'MAIL_DEFAULT_SENDER': 'contact@local.host',
+    })
+    yield recorder
+    connection_pool.close()
+    app.extensions['mail'] = state
+    controller.stop()
+
+
+def test_contact_emails_share_a_connection(app, smtp_server):
+    contacts = [(f'visitor{i}@local.host', f'Message {i}') for i in range(5)]
+
+    assert deliver_contact_emails.run(contacts) == 5
+    assert deliver_contact_emails.run(contacts[:2]) == 2
+
+    assert len(smtp_server.envelopes) == 7
+    assert len(smtp_server.sessions) == 1
+    assert smtp_server.envelopes[0].mail_from == 'visitor0@local.host'
+    assert b'Message 0' in smtp_server.envelopes[0].content
+    assert get_template('contact/mail/index.html') is None
+
+
+def test_refused_and_lost_messages(app, smtp_server, caplog):
+    username = app.config['MAIL_USERNAME']
+    app.config['MAIL_USERNAME'] = 'refused@local.host'
+    try:
+        assert deliver_contact_emails.run([('a@local.host', 'Hi')]) == 0
+        assert 'from a@local.host was refused' in caplog.text
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            deliver_contact_email.run('c@local.host', 'Hey')
+    finally:
+        app.config['MAIL_USERNAME'] = username
+
+    # A connection the server dropped is replaced
+    connection_pool._connection().host.close()
+    assert deliver_contact_emails.run([('b@local.host', 'Hello')]) == 1
+    assert len(smtp_server.sessions) == 1
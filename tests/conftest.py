@@ -1,6 +1,9 @@
+from contextlib import contextmanager
+
 import pytest
 
 from config import settings
+from utils.profiler import QueryCounter
 from world_manager.app import create_app
 from world_manager.extensions import db as _db
 
@@ -33,3 +36,24 @@ def db(app):
     _db.create_all(app=app)
 
     return _db
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Fail a test when a block runs more queries than it should, e.g.
+    ``with query_budget(2): client.get('/api/items')``, listing the queries
+    by shape.
+    """
+
+    @contextmanager
+    def budget(queries: int):
+        with QueryCounter() as counter:
+            yield counter
+        if counter.count > queries:
+            shapes = '\n'.join(f'{count:>4} x {shape}' for shape, (count, _)
+                               in counter.shapes.items())
+            pytest.fail(f'{counter.count} queries run, the budget is '
+                        f'{queries}:\n{shapes}', pytrace=False)
+
+    return budget
@@ -0,0 +1,239 @@
+import datetime
+import json
+from unittest import mock
+
+import pytest
+from sqlalchemy import event, func, text
+
+from utils.profiler import QueryCounter
+from world_manager.extensions import password_hasher
+from world_manager.model import account
+from world_manager.model.account import User
+
+
+def _create_user(db, name):
+    user = User(username=name, email_address=f'{name}@local.host',
+                password='correct horse')
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def test_authenticate_rehashes_old_passwords(app, db):
+    user = _create_user(db, 'hasher')
+    assert user.password.startswith('pbkdf2:sha256:150000$')
+    assert user.authenticate('correct horse')
+    assert not user.authenticate('wrong horse')
+
+    password_hasher.configure('pbkdf2:sha256', 1000, 1, 4, 1)
+    try:
+        old_hash = user.password
+        assert user.authenticate('correct horse')
+        assert user.password.startswith('pbkdf2:sha256:1000$')
+        assert user.password != old_hash
+        assert user.authenticate('correct horse')
+    finally:
+        password_hasher.init_app(app)
+
+
+def test_rehashed_password_is_stored(app, db):
+    user = _create_user(db, 'rehashed')
+    user_id = user.id
+
+    password_hasher.configure('pbkdf2:sha256', 1000, 1, 4, 1)
+    try:
+        assert user.authenticate('correct horse')
+        user.register_login('10.0.0.9')
+        new_hash = user.password
+        db.session.remove()
+
+        stored = User.query.get(user_id).password
+        assert stored == new_hash
+        assert stored.startswith('pbkdf2:sha256:1000$')
+        assert not password_hasher.needs_rehash(stored)
+    finally:
+        password_hasher.init_app(app)
+        account.login_activity.flush()
+
+
+def test_verified_tokens_are_cached(app, db):
+    user = _create_user(db, 'tokenized')
+    token = user.serialize_token()
+
+    assert User.deserialize_token(token) is user
+    with mock.patch.object(account, '_token_serializer') as serializer:
+        assert User.deserialize_token(token) is user
+        assert not serializer.called
+    assert User.deserialize_token(token + 'x') is None
+
+    short_lived = user.serialize_token(expiration=1)
+    assert User.deserialize_token(short_lived) is user
+    with mock.patch.object(account, '_token_serializer') as serializer:
+        serializer.return_value.loads.side_effect = ValueError
+        assert User.deserialize_token(short_lived) is None
+
+
+def test_find_by_identity_ignores_case(db):
+    user = _create_user(db, 'Identity')
+
+    assert User.find_by_identity('identity') is user
+    assert User.find_by_identity('IDENTITY@local.host ') is user
+    assert User.find_by_identity('identity@elsewhere') is None
+
+    query = User.query.filter(func.lower(User.username) == 'identity')
+    plan = db.session.execute(
+        text('EXPLAIN QUERY PLAN ' + str(query.statement.compile(
+            compile_kwargs={'literal_binds': True})))).fetchall()
+    assert 'ix_user_username_lower' in str(plan)
+
+
+def test_signed_in_users_are_cached(app, db):
+    user_id = _create_user(db, 'cached').id
+    db.session.remove()
+
+    def request():
+        # A request of its own app context, as outside of tests
+        return app.app_context(), app.test_request_context()
+
+    counts = []
+    for _ in range(2):
+        app_context, request_context = request()
+        with app_context, request_context, \
+                QueryCounter(db.engine) as counter:
+            user = User.get_cached(user_id)
+            assert User.get_cached(user_id) is user
+            assert user.username == 'cached'
+        counts.append(counter.count)
+        db.session.remove()
+    assert counts == [1, 0]
+
+    cached = json.loads(account._user_cache().get(str(user_id)))
+    assert cached['username'] == 'cached'
+    assert 'password' not in cached
+    app_context, request_context = request()
+    with app_context, request_context:
+        user = User.get_cached(user_id)
+        assert user.role is account.UserRole.member
+        assert isinstance(user.db_created_on, datetime.datetime)
+        with QueryCounter(db.engine) as counter:
+            assert user.authenticate('correct horse')
+        assert counter.count == 1
+    db.session.remove()
+
+    user = User.query.get(user_id)
+    user.username = 'renamed'
+    db.session.commit()
+    db.session.remove()
+    app_context, request_context = request()
+    with app_context, request_context:
+        assert User.get_cached(user_id).username == 'renamed'
+
+
+def test_only_changed_users_are_forgotten(app, db):
+    changed_id = _create_user(db, 'forgotten').id
+    kept = _create_user(db, 'kept')
+    kept_id = kept.id
+    db.session.remove()
+    with app.app_context(), app.test_request_context():
+        User.get_cached(changed_id)
+        User.get_cached(kept_id)
+    db.session.remove()
+    cache = account._user_cache()
+
+    user = User.query.get(changed_id)
+    user.username = 'changed'
+    db.session.commit()
+    assert cache.get(str(changed_id)) is None
+    assert cache.get(str(kept_id)) is not None
+
+    buffer = account.login_activity
+    buffer.flush_interval = None
+    try:
+        kept.register_login('10.0.2.1')
+        buffer.flush()
+    finally:
+        buffer.init_app(app)
+    assert cache.get(str(kept_id)) is None
+
+def test_logins_are_written_in_batches(app, db):
+    first = _create_user(db, 'first_login')
+    second = _create_user(db, 'second_login')
+    first_id, second_id = first.id, second.id
+    buffer = account.login_activity
+    buffer.flush_interval = None
+    try:
+        first.register_login('10.0.0.1')
+        first.register_login('10.0.0.2')
+        second.register_login('10.0.0.3')
+        assert buffer.stats()['pending'] == 3
+
+        with mock.patch.object(account, '_write_logins',
+                               side_effect=RuntimeError), \
+                pytest.raises(RuntimeError):
+            buffer.flush()
+        assert buffer.stats()['pending'] == 3
+        assert buffer.stats()['failed_flushes'] == 1
+
+        executions = []
+
+        def execute(conn, cursor, statement, parameters, context,
+                    executemany):
+            executions.append(executemany)
+
+        event.listen(db.engine, 'before_cursor_execute', execute)
+        try:
+            with QueryCounter(db.engine) as counter:
+                assert buffer.flush() == 3
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', execute)
+        assert counter.count == 1
+        # One statement for the batch, not one per user
+        assert executions == [False]
+        stats = buffer.stats()
+        assert stats['pending'] == 0
+        assert stats['oldest_pending_seconds'] is None
+        assert stats['last_flush_lag_seconds'] >= 0
+
+        second.register_login('10.0.0.4')
+        buffer.flush()
+    finally:
+        buffer.init_app(app)
+
+    db.session.remove()
+    first = User.query.get(first_id)
+    assert first.login_count == 2
+    assert first.last_login_ip_address == '10.0.0.1'
+    assert first.current_login_ip_address == '10.0.0.2'
+    assert first.last_login_time < first.current_login_time
+    second = User.query.get(second_id)
+    assert second.login_count == 2
+    assert second.last_login_ip_address == '10.0.0.3'
+    assert second.current_login_ip_address == '10.0.0.4'
+
+
+def test_failed_inline_flush_keeps_logins_and_caps_buffer(app, db):
+    user = _create_user(db, 'overflowing')
+    user_id = user.id
+    buffer = account.login_activity
+    buffer.flush_interval = None
+    buffer.max_pending = 2
+    buffer.max_buffered = 3
+    dropped = buffer.dropped
+    try:
+        with mock.patch.object(account, '_write_logins',
+                               side_effect=RuntimeError):
+            for i in range(5):
+                user.register_login(f'10.0.1.{i}')
+        stats = buffer.stats()
+        assert stats['pending'] == 3
+        assert stats['dropped'] == dropped + 2
+
+        buffer._flush_at_exit()
+        assert buffer.stats()['pending'] == 0
+    finally:
+        buffer.init_app(app)
+
+    db.session.remove()
+    user = User.query.get(user_id)
+    assert user.login_count == 3
+    assert user.current_login_ip_address == '10.0.1.4'
@@ -0,0 +1,93 @@
+from world_manager.model import stat
+from world_manager.model.facets import facet_counts, facet_search
+
+
+def _add_spells(db, prefix):
+    school = stat.SchoolOfMagic(name=f'{prefix} Evocation')
+    wizard = stat.CreatureClass(name=f'{prefix} Wizard')
+    cleric = stat.CreatureClass(name=f'{prefix} Cleric')
+    fire = stat.DamageType(name=f'{prefix} Fire')
+
+    def spell(name, level, ritual, classes, damage_types):
+        name = f'{prefix} {name}'
+        return stat.Spell(unique_name=name, name=name, level=level,
+                          ritual=ritual, school=school, casting_time=1,
+                          range='Self', classes=classes,
+                          damage_types=damage_types)
+
+    db.session.add_all([
+        spell('Fire Bolt', 0, False, [wizard], [fire]),
+        spell('Fireball', 3, False, [wizard], [fire]),
+        spell('Alarm', 1, True, [wizard], []),
+        spell('Sacred Flame', 0, False, [cleric], []),
+        spell('Bless', 1, False, [cleric, wizard], []),
+    ])
+    db.session.commit()
+    return school.id, wizard.id, cleric.id, fire.id
+
+
+def test_facet_search(db):
+    school_id, wizard_id, cleric_id, fire_id = _add_spells(db, 'Facet')
+
+    results = facet_search({'school': [school_id],
+                            'creature_class': [wizard_id],
+                            'level': [0, 1]})
+
+    assert [s.name for s in results.items] == [
+        'Facet Fire Bolt', 'Facet Alarm', 'Facet Bless']
+    assert results.total == 3
+    assert results.counts['level'] == {0: 1, 1: 2, 3: 1}
+    assert results.counts['creature_class'] == {wizard_id: 3, cleric_id: 2}
+    assert results.counts['damage_type'] == {fire_id: 1}
+    assert results.counts['ritual'] == {False: 2, True: 1}
+    assert results.counts['school'][school_id] == 3
+
+
+def _add_shield(db, prefix, school_id):
+    name = f'{prefix} Shield'
+    db.session.add(stat.Spell(unique_name=name, name=name, level=1,
+                              ritual=False, school_id=school_id,
+                              casting_time=1, range='Self'))
+    db.session.commit()
+
+
+def test_facet_counts_are_cached_until_spells_change(db):
+    school_id = _add_spells(db, 'Cached')[0]
+    filters = {'school': [school_id]}
+
+    first = facet_search(filters)
+    hits = facet_counts.hits
+    assert facet_search(filters).counts is first.counts
+    assert facet_counts.hits == hits + 1
+
+    _add_shield(db, 'Cached', school_id)
+
+    assert facet_search(filters).counts['level'][1] == 3
+
+
+def test_spells_endpoint(app, db):
+    school_id = _add_spells(db, 'Listed')[0]
+
+    response = app.test_client().get(
+        f'/api/spells?school={school_id}&ritual=true')
+
+    data = response.get_json()
+    assert data['total'] == 1
+    assert data['results'][0]['name'] == 'Listed Alarm'
+    assert data['facets']['ritual'] == {'false': 4, 'true': 1}
+    assert data['next'] is None and data['previous'] is None
+
+
+def test_facet_search_pages(db):
+    school_id = _add_spells(db, 'Paged')[0]
+    _add_shield(db, 'Paged', school_id)
+    filters = {'school': [school_id]}
+
+    first = facet_search(filters, per_page=4)
+    second = facet_search(filters, per_page=4, after=first.page.next_cursor)
+
+    assert [s.name for s in second.items] == ['Paged Shield', 'Paged Fireball']
+    assert second.total == 6
+    back = facet_search(filters, per_page=4,
+                        before=second.page.previous_cursor)
+    assert [s.id for s in back.items] == [s.id for s in first.items]
@@ -0,0 +1,116 @@
+import pytest
+
+from utils.sql import DeferredCommit, ScopedSession
+from world_manager.model import stat
+from world_manager.model.importer import BulkImporter, read_rows
+
+
+def _import_spells(db, path):
+    importer = BulkImporter(db.session, batch_size=2)
+    importer.load('schools_of_magic', [{'name': 'Import Evocation'}])
+    importer.load('damage_types', [{'name': 'Import Fire'}])
+    importer.load('creature_classes', [{'name': 'Import Wizard'},
+                                       {'name': 'Import Sorcerer'}])
+    result = importer.load_file(str(path))
+    db.session.commit()
+    return result
+
+
+def test_import_is_idempotent(db, tmpdir):
+    path = tmpdir.join('spells.csv')
+    path.write('name,level,ritual,school,casting_time,range,classes,'
+               'damage_types,components,description\n'
+               'Import Fire Bolt,0,false,Import Evocation,1,120 feet,'
+               'Import Wizard;Import Sorcerer,Import Fire,"V,S",Hurl fire\n'
+               'Import Fireball,3,false,Import Evocation,1,150 feet,'
+               'Import Wizard,Import Fire,"V,S,M",Boom\n'
+               'Import Alarm,1,true,Import Evocation,1,30 feet,'
+               'Import Wizard,,"V,S,M",\n')
+
+    assert _import_spells(db, path).rows == 3
+    assert _import_spells(db, path).rows == 3
+
+    spells = stat.Spell.query.filter(stat.Spell.name.like('Import %')).all()
+    assert len(spells) == 3
+    fire_bolt = next(s for s in spells if s.name == 'Import Fire Bolt')
+    assert fire_bolt.unique_name == 'Import Fire Bolt'
+    assert fire_bolt.ritual is False
+    assert fire_bolt.school.name == 'Import Evocation'
+    assert sorted(c.name for c in fire_bolt.classes) == [
+        'Import Sorcerer', 'Import Wizard']
+    assert [d.name for d in fire_bolt.damage_types] == ['Import Fire']
+    assert sorted(c.type_ for c in fire_bolt.components) == ['S', 'V']
+
+
+def test_import_item_subtypes(db):
+    importer = BulkImporter(db.session)
+    rows = [{'name': 'Import Copper', 'abbreviation': 'icp', 'value': 1}]
+    importer.load('coin_types', rows)
+    importer.load('coin_types', rows)
+    db.session.commit()
+
+    coin = stat.CoinType.query.filter_by(abbreviation='icp').one()
+    assert coin.item.name == 'Import Copper'
+    assert coin.item.value == 1
+
+
+def test_read_rows_jsonl(tmpdir):
+    path = tmpdir.join('conditions.jsonl')
+    path.write('{"name": "Prone"}\n\n{"name": "Blinded"}\n')
+
+    assert list(read_rows(str(path))) == [{'name': 'Prone'},
+                                          {'name': 'Blinded'}]
+
+
+@pytest.mark.parametrize('kind, rows, message', [
+    ('conditions', [{'name': 'Import Prone'}, {'description': 'Unnamed'}],
+     'Row 2 of conditions has no name'),
+    ('languages', [{'name': ''}], 'Row 1 of languages has no name'),
+    ('spells', [{'level': 1}], 'Row 1 of spells has no name'),
+    ('coin_types', [{'abbreviation': 'inp', 'value': 1}],
+     'Row 1 of coin_types has no name'),
+])
+def test_rows_without_a_key_are_rejected(db, kind, rows, message):
+    importer = BulkImporter(db.session, batch_size=1)
+
+    with pytest.raises(ValueError, match=message):
+        importer.load(kind, rows)
+    db.session.rollback()
+
+
+def test_import_joins_a_deferred_commit(db):
+    def imported(session):
+        return session.query(stat.Condition).filter(
+            stat.Condition.name.like('Deferred Import %')).count()
+
+    with DeferredCommit(batch_size=2) as session:
+        importer = BulkImporter(session, batch_size=2)
+        rows = [{'name': f'Deferred Import {i}'} for i in range(5)]
+        assert importer.load('conditions', rows).rows == 5
+        assert importer.load('conditions', rows).rows == 5
+        with ScopedSession() as other:
+            assert imported(other) == 0
+    assert imported(db.session) == 5
+
+
+def test_reimport_skips_unchanged_rows(db):
+    importer = BulkImporter(db.session)
+    rows = [{'name': 'Import Dazed', 'description': 'Reels'},
+            {'name': 'Import Dizzy', 'description': 'Spins'}]
+    importer.load('conditions', rows)
+    db.session.commit()
+
+    def updated_on():
+        conditions = stat.Condition.query.filter(
+            stat.Condition.name.like('Import %'))
+        return {c.name: c.db_updated_on for c in conditions}
+
+    before = updated_on()
+    importer.load('conditions', [rows[0], dict(rows[1], description='Sways')])
+    db.session.commit()
+    after = updated_on()
+
+    assert after['Import Dazed'] == before['Import Dazed']
+    assert after['Import Dizzy'] > before['Import Dizzy']
+    assert stat.Condition.query.filter_by(
+        name='Import Dizzy').one().description == 'Sways'
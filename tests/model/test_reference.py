@@ -0,0 +1,59 @@
+from world_manager.model import stat
+from world_manager.model.reference import reference_data
+
+
+def test_lookups_are_cached_until_written(db):
+    db.session.add(stat.Ability(name='Reference Might', abbreviation='RMI'))
+    db.session.commit()
+    db.session.remove()
+
+    might = reference_data.by_abbreviation(stat.Ability, 'RMI')
+    misses = reference_data.misses
+    assert might.name == 'Reference Might'
+    assert reference_data.by_name(stat.Ability, 'Reference Might') is might
+    assert reference_data.get(stat.Ability, might.id) is might
+    assert reference_data.misses == misses
+
+    db.session.execute(stat.Ability.__table__.update()
+                       .where(stat.Ability.id == might.id)
+                       .values(name='Reference Brawn'))
+    db.session.commit()
+
+    brawn = reference_data.get(stat.Ability, might.id)
+    assert brawn.name == 'Reference Brawn'
+    assert reference_data.by_name(stat.Ability, 'Reference Might') is None
+    assert reference_data.misses == misses + 1
+
+
+def test_coin_types_include_item_fields(db):
+    item = stat.Item(name='Reference Crown', value=100)
+    db.session.add(item)
+    db.session.flush()
+    db.session.add(stat.CoinType(id=item.id, abbreviation='rc'))
+    db.session.commit()
+
+    crown = reference_data.by_abbreviation(stat.CoinType, 'rc')
+
+    assert (crown.name, crown.value) == ('Reference Crown', 100)
+    assert reference_data.by_name(stat.CoinType, 'Reference Crown') is crown
+
+
+def test_rolled_back_writes_are_forgotten(db):
+    db.session.add(stat.Language(name='Ghost'))
+    db.session.flush()
+    assert reference_data.by_name(stat.Language, 'Ghost') is not None
+    db.session.rollback()
+
+    assert reference_data.by_name(stat.Language, 'Ghost') is None
+    assert stat.Language.query.filter_by(name='Ghost').count() == 0
+
+
+def test_tables_expire(db, monkeypatch):
+    db.session.add(stat.Condition(name='Reference Dazed'))
+    db.session.commit()
+    reference_data.table(stat.Condition)
+    misses = reference_data.misses
+
+    monkeypatch.setattr(reference_data, 'timeout', 0)
+    reference_data.table(stat.Condition)
+    assert reference_data.misses == misses + 1
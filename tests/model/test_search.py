@@ -0,0 +1,89 @@
+from sqlalchemy import text
+
+from world_manager.model import stat
+from world_manager.model.search import SEARCH_INDEXES
+
+
+def _add_spells(db):
+    school = stat.SchoolOfMagic(name='Search Evocation')
+    spells = [
+        stat.Spell(unique_name='Search Thunderwave', name='Thunderwave',
+                   ritual=False, level=1, school=school, casting_time=1,
+                   range='Self', description='Each creature in a cube is '
+                                             'pushed 10 feet away from you, '
+                                             'fear or no fear.'),
+        stat.Spell(unique_name='Search Cause Fear', name='Cause Fear',
+                   ritual=False, level=1, school=school, casting_time=1,
+                   range='60 feet',
+                   description='The target becomes frightened of you.'),
+        stat.Spell(unique_name='Search Fear', name='Fear', ritual=False,
+                   level=3, school=school, casting_time=1, range='Self',
+                   description='Creatures in a 30-foot cone become '
+                               'frightened.'),
+    ]
+    db.session.add_all(spells)
+    db.session.commit()
+    return spells
+
+
+def test_spell_search(db):
+    spells = _add_spells(db)
+    index = SEARCH_INDEXES['spells']
+
+    results = index.search('frightened')
+    assert results.total == 2
+    assert {s.name for s in results.items} == {'Cause Fear', 'Fear'}
+
+    results = index.search('fear')
+    assert results.items[-1].name == 'Thunderwave'
+    assert results.ranks == sorted(results.ranks, reverse=True)
+    assert [s.name for s in index.search('push').items] == ['Thunderwave']
+    assert index.search('   ').total == 0
+
+    spells[0].description = 'A wave of thunderous force.'
+    db.session.commit()
+    assert index.search('push').total == 0
+
+    db.session.delete(spells[1])
+    db.session.commit()
+    assert index.search('frightened').total == 1
+
+
+def test_search_endpoint(app, db):
+    db.session.add(stat.Spell(
+        unique_name='Endpoint Cone of Cold', name='Cone of Cold',
+        ritual=False, level=5, casting_time=1, range='Self',
+        school=stat.SchoolOfMagic(name='Endpoint Evocation'),
+        description='A blast of wintry air erupts in a conical shape.'))
+    db.session.commit()
+
+    response = app.test_client().get(
+        '/api/spells/search?q=wintry&per_page=1')
+
+    data = response.get_json()
+    assert data['total'] == 1
+    assert data['results'][0]['name'] == 'Cone of Cold'
+    assert app.test_client().get('/api/nope/search').status_code == 404
+
+
+def test_index_added_to_existing_table(db):
+    index = SEARCH_INDEXES['features']
+    with db.engine.begin() as connection:
+        connection.execute(text(f'DROP TABLE {index.name}'))
+        for suffix in ('ai', 'ad', 'au'):
+            connection.execute(text(f'DROP TRIGGER {index.name}_{suffix}'))
+    db.session.add(stat.Feature(name='Indexed Darkvision',
+                                description='Sees in the gloom.',
+                                category=stat.FeatureCategory.RacialTrait))
+    db.session.commit()
+
+    with db.engine.begin() as connection:
+        index.create(connection)
+    assert [f.name for f in index.search('gloom').items] == [
+        'Indexed Darkvision']
+
+    # Rebuilding an index that is complete leaves it as it was
+    index.rebuild()
+    db.session.commit()
+    assert [f.name for f in index.search('gloom').items] == [
+        'Indexed Darkvision']
@@ -0,0 +1,66 @@
+import pickle
+
+import pytest
+
+from utils.profiler import QueryCounter
+from world_manager.model import stat
+from world_manager.model.snapshot import StatBlockSnapshot, load_snapshots
+
+
+def _create_ranger(db, name):
+    strength = stat.Ability.query.filter_by(abbreviation='SNAP').first() \
+        or stat.Ability(name='Snapshot Strength', abbreviation='SNAP')
+    walk = stat.SpeedType.query.filter_by(name='Snapshot Walk').first() \
+        or stat.SpeedType(name='Snapshot Walk')
+    stat_block = stat.StatBlock(name=name,
+                                race=stat.Race(name=f'{name} Race'),
+                                base_hit_point_max=31)
+    stat_block.classes.append(stat.StatBlockClass(
+        creature_class=stat.CreatureClass(name=f'{name} Ranger'), level=5))
+    score = stat.AbilityScore(ability=strength, base_value=15)
+    score.saving_throw_proficiency = stat.SavingThrowProficiency(
+        proficiency_multiplier=1)
+    stat_block.ability_scores.append(score)
+    stat_block.speed_scores.append(stat.SpeedScore(speed_type=walk,
+                                                   base_value=35))
+    db.session.add(stat_block)
+    db.session.commit()
+    stat_block_id = stat_block.id
+    db.session.remove()
+    return stat_block_id
+
+
+def test_snapshot_from_rows_matches_orm(db):
+    ids = [_create_ranger(db, f'Snapshot {i}') for i in range(3)]
+
+    snapshots = load_snapshots(reversed(ids))
+    from_orm = [StatBlockSnapshot.from_stat_block(s)
+                for s in stat.StatBlock.load_sheet(list(reversed(ids)))]
+
+    assert snapshots == from_orm
+    snapshot = snapshots[-1]
+    assert snapshot.id == ids[0]
+    assert (snapshot.level, snapshot.proficiency_bonus) == (5, 3)
+    assert snapshot.hit_point_max == 31
+    assert snapshot.save_proficiencies == (1,)
+    assert snapshot.score('SNAP') == 15
+    assert snapshot.modifier('SNAP') == 2
+    assert snapshot.speed('Snapshot Walk') == 35
+    assert pickle.loads(pickle.dumps(snapshot)) == snapshot
+    with pytest.raises(AttributeError):
+        snapshot.level = 6
+    assert ids[0] in [s.id for s in load_snapshots()]
+
+
+def test_every_snapshot_is_loaded_in_batches(db):
+    ids = [_create_ranger(db, f'Batched {i}') for i in range(3)]
+    count = stat.StatBlock.query.count()
+
+    with QueryCounter() as queries:
+        snapshots = load_snapshots(batch_size=2)
+
+    assert [s.id for s in snapshots] == sorted(s.id for s in snapshots)
+    assert len(snapshots) == count
+    assert set(ids) <= {s.id for s in snapshots}
+    batches = -(-count // 2)
+    assert queries.count <= batches * 6 + 1
@@ -0,0 +1,77 @@
+from utils.profiler import QueryCounter
+from world_manager.model import stat
+
+
+def _create_stat_blocks(db, prefix, count):
+    race = stat.Race(name=f'{prefix} Race')
+    background = stat.Background(name=f'{prefix} Background')
+    creature_class = stat.CreatureClass(name=f'{prefix} Class')
+    ability = stat.Ability(name=f'{prefix} Ability',
+                           abbreviation=f'{prefix[:4]}A')
+    speed_type = stat.SpeedType(name=f'{prefix} Walk')
+    skill = stat.Skill(name=f'{prefix} Skill')
+    db.session.add_all([race, background, creature_class, ability,
+                        speed_type])
+    db.session.flush()
+    skill.default_ability_id = ability.id
+    db.session.add(skill)
+
+    stat_blocks = []
+    for i in range(count):
+        stat_block = stat.StatBlock(name=f'{prefix} {i}', race=race,
+                                    background=background)
+        stat_block.classes.append(stat.StatBlockClass(
+            creature_class=creature_class, level=i + 1))
+        score = stat.AbilityScore(ability=ability, base_value=10 + i)
+        score.saving_throw_proficiency = stat.SavingThrowProficiency(
+            proficiency_multiplier=1)
+        stat_block.ability_scores.append(score)
+        stat_block.speed_scores.append(stat.SpeedScore(speed_type=speed_type,
+                                                       base_value=30))
+        stat_block.skill_proficiencies.append(stat.SkillProficiency(
+            skill=skill, proficiency_multiplier=1))
+        stat_blocks.append(stat_block)
+    db.session.add_all(stat_blocks)
+    db.session.commit()
+    ids = [stat_block.id for stat_block in stat_blocks]
+    db.session.remove()
+    return ids
+
+
+def _render_sheets(stat_blocks):
+    for stat_block in stat_blocks:
+        _ = stat_block.race.name, stat_block.background.name, stat_block.user
+        for stat_block_class in stat_block.classes:
+            _ = stat_block_class.creature_class.name
+        for score in stat_block.ability_scores:
+            _ = (score.ability.abbreviation,
+                 score.saving_throw_proficiency.proficiency_multiplier)
+        for speed in stat_block.speed_scores:
+            _ = speed.speed_type.name
+        for proficiency in stat_block.skill_proficiencies:
+            _ = proficiency.skill.name
+
+
+def test_load_sheet_query_count_is_constant(db):
+    one = _create_stat_blocks(db, 'Solo', 1)
+    many = _create_stat_blocks(db, 'Party', 12)
+
+    counts = []
+    for ids in (one, many):
+        with QueryCounter(db.engine) as counter:
+            _render_sheets(stat.StatBlock.load_sheet(ids))
+        counts.append(counter.count)
+        db.session.remove()
+
+    assert counts[0] == counts[1]
+    assert counts[1] <= 5
+
+
+def test_load_sheet_preserves_order(db):
+    ids = _create_stat_blocks(db, 'Ordered', 3)
+
+    stat_blocks = stat.StatBlock.load_sheet(list(reversed(ids)))
+
+    assert [s.id for s in stat_blocks] == list(reversed(ids))
+    assert stat.StatBlock.load_sheet(ids[0])[0].id == ids[0]
+    assert stat.StatBlock.load_sheet([]) == []
@@ -1,5 +1,16 @@
-from utils.sql import ScopedSession
-from world_manager.model.stat import SchoolOfMagic
+import base64
+import json
+
+import pytest
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+from utils.engine import pragma
+from utils.pagination import InvalidCursor, keyset_paginate
+from utils.profiler import QueryProfile, query_shape
+from utils.sql import DeferredCommit, ScopedSession
+from world_manager.extensions import sql_profiler
+from world_manager.model.stat import Item, SchoolOfMagic
 
 
 def test_resource(db):
@@ -15,3 +26,157 @@ def test_resource(db):
         assert school.name == school_name
         assert school.db_updated_on
         assert school.db_created_on
+
+
+def test_resource_updated_on_flush(db):
+    with ScopedSession() as session:
+        school = SchoolOfMagic(name='Conjuration')
+        session.add(school)
+        session.commit()
+        created_on = school.db_updated_on
+
+        school.name = 'Conjuration'
+        session.commit()
+        assert school.db_updated_on == created_on
+
+        school.name = 'Summoning'
+        session.commit()
+        assert school.db_updated_on > created_on
+
+
+def test_deferred_commit(db):
+    def committed():
+        with ScopedSession() as other:
+            return other.query(SchoolOfMagic).filter(
+                SchoolOfMagic.name.like('Deferred %')).count()
+
+    with DeferredCommit(batch_size=2):
+        SchoolOfMagic(name='Deferred Abjuration').save()
+        SchoolOfMagic(name='Deferred Divination').save()
+        SchoolOfMagic(name='Deferred Illusion').save()
+        assert committed() == 0
+    assert committed() == 3
+
+    try:
+        with DeferredCommit():
+            SchoolOfMagic(name='Deferred Necromancy').save()
+            raise RuntimeError()
+    except RuntimeError:
+        pass
+    assert committed() == 3
+
+
+def test_save_all_and_delete_all(db):
+    rows = [SchoolOfMagic(name=f'Batch {i}') for i in range(5)]
+    rows += [{'name': f'Batch {i}'} for i in range(5, 8)]
+
+    assert SchoolOfMagic.save_all(rows, batch_size=3) == 8
+
+    schools = SchoolOfMagic.query.filter(
+        SchoolOfMagic.name.like('Batch %')).all()
+    assert len(schools) == 8
+    assert all(s.db_created_on for s in schools)
+
+    assert SchoolOfMagic.delete_all(schools) == 8
+    assert SchoolOfMagic.query.filter(
+        SchoolOfMagic.name.like('Batch %')).count() == 0
+
+
+def test_keyset_paginate(db):
+    db.session.add_all([Item(name=f'Keyset Item {i}', value=value)
+                        for i, value in enumerate([5, None, 1, 5, None, 3])])
+    db.session.commit()
+    query = Item.query.filter(Item.name.startswith('Keyset Item'))
+    expected = [i.name for i in query.order_by(Item.value.is_(None).desc(),
+                                               Item.value, Item.id)]
+
+    pages, page = [], keyset_paginate(query, (Item.value,), per_page=4)
+    assert not page.has_previous
+    while True:
+        pages.append([i.name for i in page.items])
+        if not page.has_next:
+            break
+        page = keyset_paginate(query, (Item.value,), 4,
+                               after=page.next_cursor)
+    assert sum(pages, []) == expected
+    assert pages == [expected[:4], expected[4:]]
+
+    back = keyset_paginate(query, (Item.value,), 4,
+                           before=page.previous_cursor)
+    assert [i.name for i in back.items] == expected[:4]
+    assert not back.has_previous and back.has_next
+
+    descending = keyset_paginate(query, (Item.value.desc(),), per_page=3)
+    descending = keyset_paginate(query, (Item.value.desc(),), 3,
+                                 after=descending.next_cursor)
+    # NULLs first, then the largest values
+    assert [i.name for i in descending.items] == expected[4:1:-1]
+
+    with pytest.raises(InvalidCursor):
+        keyset_paginate(query, (Item.name,), after=page.previous_cursor)
+    with pytest.raises(InvalidCursor):
+        keyset_paginate(query, (Item.value,), after='not a cursor')
+    for values in ([[5], 1], [{'x': 1}, 1], ['5', 1], [5, None], [True, 1]):
+        with pytest.raises(InvalidCursor):
+            keyset_paginate(query, (Item.value,),
+                            after=_with_values(page.previous_cursor, values))
+    assert keyset_paginate(query, (Item.value,), after=_with_values(
+        page.previous_cursor, [None, 1])).items
+
+
+def _with_values(cursor, values):
+    signature, _ = json.loads(base64.urlsafe_b64decode(
+        cursor + '=' * (-len(cursor) % 4)))
+    return base64.urlsafe_b64encode(json.dumps(
+        [signature, values]).encode('utf-8')).decode('ascii')
+
+
+def test_engine_configuration(app, db):
+    engine = db.engine
+    assert isinstance(engine.pool, QueuePool)
+    assert pragma(engine, 'journal_mode') == 'wal'
+    assert pragma(engine, 'synchronous') == '1'
+    assert pragma(engine, 'busy_timeout') == '5000'
+    assert pragma(engine, 'cache_size') == '-64000'
+
+    url, options = db.apply_driver_hacks(
+        app, make_url('postgresql://world@localhost/world'), {'pool_size': 3})
+    assert options['pool_size'] == 3
+    assert options['max_overflow'] == app.config['DATABASE_MAX_OVERFLOW']
+    assert options['pool_pre_ping'] is True
+
+    url, options = db.apply_driver_hacks(app, make_url('sqlite://'), {})
+    assert 'poolclass' not in options or options['poolclass'] is not QueuePool
+    assert 'journal_mode' not in db._pragmas.pop(url)
+
+
+def test_sql_profiler_finds_n_plus_one(app, db, caplog):
+    db.session.add_all(Item(name=f'Profiled Item {i}', value=i)
+                       for i in range(6))
+    db.session.commit()
+    ids = [item.id for item in Item.query.filter(
+        Item.name.startswith('Profiled Item'))]
+    db.session.remove()
+
+    with caplog.at_level('DEBUG', 'world_manager.sql'), \
+            QueryProfile('outer') as outer, \
+            sql_profiler.profile('task:load items') as profile:
+        Item.query.filter(Item.id.in_(ids[:2])).all()
+        Item.query.filter(Item.id.in_(ids)).all()
+        for item_id in ids:
+            db.session.query(Item).filter_by(id=item_id).one()
+    db.session.remove()
+
+    assert profile.count == outer.count == 8
+    shapes = profile.repeated(5)
+    assert [count for _, count in shapes] == [6]
+    assert len(profile.shapes) == 2
+    assert query_shape('SELECT  a\n FROM t WHERE id IN (?, ?)') == \
+        'SELECT a FROM t WHERE id IN (...)'
+    assert 'task:load items: 8 queries' in caplog.text
+    assert 'possible N+1, 6 queries' in caplog.text
+
+    summary = sql_profiler.summary()['task:load items']
+    assert summary['runs'] >= 1
+    assert summary['max_queries'] == 8
+    assert summary['n_plus_one'] >= 1
@@ -0,0 +1,192 @@
+import datetime
+
+import pytest
+import pytz
+from sqlalchemy import bindparam, event
+
+from world_manager.model.world import Event, MAX_SPAN_CLASS, span_class
+
+
+def _create_tree(db):
+    """
+    Age
+    ├── War
+    │   ├── Siege
+    │   │   └── Sally
+    │   └── Treaty
+    └── Plague
+    """
+    age = Event(name='Tree Age')
+    war = Event(name='Tree War', parent=age)
+    siege = Event(name='Tree Siege', parent=war)
+    Event(name='Tree Sally', parent=siege)
+    Event(name='Tree Treaty', parent=war)
+    Event(name='Tree Plague', parent=age)
+    db.session.add(age)
+    db.session.commit()
+    ids = {e.name: e.id for e in Event.query}
+    db.session.remove()
+    return ids
+
+
+def test_descendants_and_ancestors(db):
+    ids = _create_tree(db)
+    age = Event.query.get(ids['Tree Age'])
+
+    assert [e.name for e in age.descendants()] == [
+        'Tree War', 'Tree Plague', 'Tree Siege', 'Tree Treaty', 'Tree Sally']
+    assert [e.name for e in age.descendants(max_depth=1)] == [
+        'Tree War', 'Tree Plague']
+
+    sally = Event.query.get(ids['Tree Sally'])
+    assert [e.name for e in sally.breadcrumbs()] == [
+        'Tree Age', 'Tree War', 'Tree Siege', 'Tree Sally']
+    assert age.ancestors() == []
+
+
+def test_load_subtree(db):
+    ids = {e.name: e.id for e in Event.query}
+    db.session.remove()
+
+    age = Event.load_subtree(ids['Tree Age'], max_depth=2)
+    war = age.children[0]
+
+    queries = []
+
+    def count(*args):
+        queries.append(args)
+
+    event.listen(db.engine, 'before_cursor_execute', count)
+    try:
+        names = [[c.name for c in child.children] for child in age.children]
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', count)
+    assert names == [['Tree Siege', 'Tree Treaty'], []]
+    assert queries == []
+    assert war.name == 'Tree War'
+    assert Event.load_subtree(0) is None
+
+
+def _date(year, month=1, day=1):
+    return datetime.datetime(year, month, day, tzinfo=pytz.utc)
+
+
+def _create_timeline(db):
+    Event.save_all([
+        Event(name='Timeline Long War', start_date=_date(1000),
+              end_date=_date(1100)),
+        Event(name='Timeline Battle', start_date=_date(1050, 5),
+              end_date=_date(1050, 6)),
+        Event(name='Timeline Coronation', start_date=_date(1050, 5, 20)),
+        {'name': 'Timeline Famine', 'start_date': _date(1049),
+         'end_date': _date(1051)},
+        Event(name='Timeline Later', start_date=_date(1200),
+              end_date=_date(1201)),
+    ])
+
+
+def _names(query):
+    return [e.name for e in query if e.name.startswith('Timeline')]
+
+
+def test_span_class():
+    assert span_class(_date(1000), None) == 0
+    assert span_class(_date(1000), _date(1000, 1, 2)) == 5
+    assert span_class(_date(1), _date(9999)) == MAX_SPAN_CLASS
+
+
+def test_timeline_windows(db):
+    _create_timeline(db)
+    famine = Event.query.filter_by(name='Timeline Famine').one()
+    assert famine.span_class == span_class(_date(1049), _date(1051))
+
+    assert _names(Event.overlapping(_date(1050, 5, 15),
+                                    _date(1050, 5, 25))) == [
+        'Timeline Long War', 'Timeline Famine', 'Timeline Battle',
+        'Timeline Coronation']
+    assert _names(Event.overlapping(_date(1101), _date(1199))) == []
+    assert _names(Event.within(_date(1050), _date(1051))) == [
+        'Timeline Battle', 'Timeline Coronation']
+    assert _names(Event.containing(_date(1050, 1), _date(1050, 12))) == [
+        'Timeline Long War', 'Timeline Famine']
+
+
+def test_timeline_pagination(db):
+    query = Event.overlapping(_date(1), _date(9999))
+    names, pages, cursor = [], [], None
+    while True:
+        page = Event.paginate(query, per_page=2, after=cursor)
+        pages.append([e.name for e in page.items])
+        names += pages[-1]
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+    assert names == [e.name for e in query]
+    assert not Event.paginate(query, per_page=2).has_previous
+    previous = Event.paginate(query, per_page=2,
+                              before=page.previous_cursor)
+    assert [e.name for e in previous.items] == pages[-2]
+    assert previous.next_cursor is not None
+    assert [e.name for e in Event.stream(query, batch_size=2)] == names
+
+
+def test_span_class_of_bulk_updates(db):
+    db.session.add(Event(name='Bulk Feast', start_date=_date(1200),
+                         end_date=_date(1200, 1, 2)))
+    db.session.commit()
+    event_id = Event.query.filter_by(name='Bulk Feast').one().id
+    table = Event.__table__
+
+    db.session.execute(table.update().where(table.c.id == event_id).values(
+        start_date=_date(1200), end_date=_date(1210)))
+    Event.query.filter_by(id=event_id).update(
+        {'end_date': _date(1220), 'start_date': _date(1200)},
+        synchronize_session=False)
+    db.session.commit()
+    assert Event.query.get(event_id).span_class == span_class(
+        _date(1200), _date(1220))
+    assert [e.name for e in Event.overlapping(_date(1215), _date(1216))] == [
+        'Bulk Feast']
+
+    with pytest.raises(ValueError):
+        db.session.execute(table.update().where(
+            table.c.id == event_id).values(end_date=_date(1300)))
+    db.session.rollback()
+
+
+def test_span_class_of_executemany_and_bulk_updates(db):
+    db.session.add_all([Event(name=f'Many Feast {i}', start_date=_date(1200))
+                        for i in range(2)])
+    db.session.commit()
+    ids = [e.id for e in Event.query.filter(
+        Event.name.startswith('Many Feast')).order_by(Event.id)]
+    table = Event.__table__
+
+    db.session.execute(
+        table.update().where(table.c.id == bindparam('event_id')),
+        [{'event_id': ids[0], 'start_date': _date(1200),
+          'end_date': _date(1201)},
+         {'event_id': ids[1], 'start_date': _date(1200),
+          'end_date': _date(1300)}])
+    db.session.commit()
+    assert [Event.query.get(i).span_class for i in ids] == [
+        span_class(_date(1200), _date(1201)),
+        span_class(_date(1200), _date(1300))]
+
+    db.session.bulk_update_mappings(Event, [
+        {'id': ids[0], 'start_date': _date(1200), 'end_date': _date(1400)}])
+    db.session.commit()
+    db.session.expire_all()
+    assert Event.query.get(ids[0]).span_class == span_class(_date(1200),
+                                                            _date(1400))
+
+    with pytest.raises(ValueError):
+        db.session.bulk_update_mappings(Event, [
+            {'id': ids[1], 'end_date': _date(1500)}])
+    db.session.rollback()
+    with pytest.raises(ValueError):
+        db.session.execute(
+            table.update().where(table.c.id == bindparam('event_id')),
+            [{'event_id': i, 'end_date': _date(1500)} for i in ids])
+    db.session.rollback()
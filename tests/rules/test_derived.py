@@ -0,0 +1,102 @@
+from world_manager.model import stat
+from world_manager.rules.derived import derived_stats, get_derived_stats
+
+
+def _create_monk(db, prefix, abbreviation):
+    dexterity = stat.Ability(name=f'{prefix} Dexterity',
+                             abbreviation=f'{abbreviation}DEX')
+    wisdom = stat.Ability(name=f'{prefix} Wisdom',
+                          abbreviation=f'{abbreviation}WIS')
+    db.session.add_all([dexterity, wisdom])
+    db.session.flush()
+    stealth = stat.Skill(name=f'{prefix} Stealth',
+                         default_ability_id=dexterity.id)
+    insight = stat.Skill(name=f'{prefix} Insight',
+                         default_ability_id=wisdom.id)
+
+    stat_block = stat.StatBlock(name=f'{prefix} Monk',
+                                race=stat.Race(name=f'{prefix} Dwarf'))
+    stat_block.classes.append(stat.StatBlockClass(
+        creature_class=stat.CreatureClass(name=f'{prefix} Monk'), level=5))
+    dexterity_score = stat.AbilityScore(ability=dexterity, base_value=17)
+    dexterity_score.saving_throw_proficiency = stat.SavingThrowProficiency(
+        proficiency_multiplier=1)
+    stat_block.ability_scores += [
+        dexterity_score, stat.AbilityScore(ability=wisdom, base_value=12)]
+    stat_block.skill_proficiencies.append(stat.SkillProficiency(
+        skill=stealth, proficiency_multiplier=2))
+    db.session.add_all([stat_block, insight])
+    db.session.commit()
+    stat_block_id = stat_block.id
+    db.session.remove()
+    return stat_block_id
+
+
+def test_derived_stats(db):
+    stat_block_id = _create_monk(db, 'Derived', 'd')
+
+    stats = get_derived_stats(stat_block_id)
+
+    assert stats.proficiency_bonus == 3
+    assert stats.abilities['dDEX'].modifier == 3
+    assert stats.abilities['dDEX'].save == 6
+    assert stats.abilities['dWIS'].save == 1
+    assert stats.skills['Derived Stealth'].modifier == 9
+    assert stats.skills['Derived Insight'].modifier == 1
+    assert stats.armor_class == 10
+    assert get_derived_stats(stat_block_id) is stats
+
+
+def test_derived_stats_recomputed_when_sheet_changes(db):
+    stat_block_id = _create_monk(db, 'Changed', 'c')
+    stat_block = stat.StatBlock.load_sheet(stat_block_id)[0]
+    stats = derived_stats(stat_block)
+    assert stats.abilities['cDEX'].score == 17
+
+    stat_block.ability_scores[0].base_value += 2
+    db.session.commit()
+    db.session.remove()
+
+    stat_block = stat.StatBlock.load_sheet(stat_block_id)[0]
+    assert derived_stats(stat_block) is not stats
+    assert derived_stats(stat_block).abilities['cDEX'].score == 19
+
+
+def test_derived_stats_recomputed_after_flush(db):
+    stat_block_id = _create_monk(db, 'Flushed', 'f')
+    stat_block = stat.StatBlock.load_sheet(stat_block_id)[0]
+    assert derived_stats(stat_block).abilities['fDEX'].score == 17
+
+    stat_block.ability_scores[0].base_value += 2
+    db.session.flush()
+
+    assert derived_stats(stat_block).abilities['fDEX'].score == 19
+    db.session.rollback()
+    db.session.remove()
+
+
+def test_derived_stats_recomputed_when_skills_change(db):
+    stat_block_id = _create_monk(db, 'Renamed', 'r')
+    stats = get_derived_stats(stat_block_id)
+    assert 'Renamed Stealth' in stats.skills
+
+    skill = stat.Skill.query.filter_by(name='Renamed Stealth').one()
+    skill.name = 'Renamed Hide'
+    db.session.commit()
+    db.session.remove()
+
+    stats = get_derived_stats(stat_block_id)
+    assert 'Renamed Hide' in stats.skills
+    assert 'Renamed Stealth' not in stats.skills
+
+def test_sheet_views(app, db):
+    stat_block_id = _create_monk(db, 'Viewed', 'v')
+    client = app.test_client()
+
+    response = client.get(f'/char/{stat_block_id}')
+    assert response.status_code == 200
+    assert b'Viewed Monk' in response.data
+
+    response = client.get(f'/char/{stat_block_id}/stats')
+    assert response.get_json()['abilities']['vDEX']['score'] == 17
+    assert client.get('/char/0/stats').status_code == 404
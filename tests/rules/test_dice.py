@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from world_manager.model.stat import DieType
+from world_manager.rules.dice import DiceRoller
+
+
+def test_same_seed_same_rolls():
+    first = DiceRoller(7).roll(DieType.d8, 3, size=100, modifier=2)
+    second = DiceRoller(7).roll(DieType.d8, 3, size=100, modifier=2)
+    other = DiceRoller(7).spawn(2)
+
+    assert np.array_equal(first, second)
+    assert not np.array_equal(other[0].roll(DieType.d8, 3, size=100),
+                              other[1].roll(DieType.d8, 3, size=100))
+
+
+def test_roll_bounds():
+    roller = DiceRoller(1)
+
+    damage = roller.roll(DieType.d6, 2, size=10000, modifier=3)
+    scores = roller.roll(DieType.d6, 4, size=10000, keep_highest=3)
+    rerolled = roller.roll(DieType.d6, 1, size=10000, reroll_below=2)
+
+    assert (damage.min(), damage.max()) == (5, 15)
+    assert (scores.min(), scores.max()) == (3, 18)
+    assert abs(scores.mean() - 12.24) < 0.1
+    assert abs(rerolled.mean() - 4.17) < 0.1
+
+
+def test_advantage():
+    roller = DiceRoller(2)
+
+    plain = roller.d20(20000).mean()
+    advantage = roller.d20(20000, advantage=True).mean()
+    disadvantage = roller.d20(20000, disadvantage=True).mean()
+
+    assert abs(plain - 10.5) < 0.1
+    assert abs(advantage - 13.82) < 0.1
+    assert abs(disadvantage - 7.18) < 0.1
+
+
+def test_large_dice_and_invalid_keeps():
+    roller = DiceRoller(4)
+
+    rolls = roller.roll(40000, 2, size=1000)
+    assert rolls.min() >= 2 and rolls.max() <= 80000
+    assert rolls.max() > 2 * 32767
+    for keep in ({'keep_highest': 0}, {'keep_lowest': 0},
+                 {'keep_highest': 3}):
+        with pytest.raises(ValueError):
+            roller.roll(DieType.d6, 2, size=10, **keep)
@@ -0,0 +1,95 @@
+from world_manager.model import stat
+from world_manager.rules.encounter import Combatant, simulate
+
+
+def _party():
+    return [Combatant('Fighter', 44, 18, 7, '2d6+4', 1),
+            Combatant('Rogue', 33, 15, 7, '1d6+3d6+4', 4)]
+
+
+def _monsters():
+    return [Combatant('Ogre', 59, 11, 6, '2d8+4', -1),
+            Combatant('Goblin', 7, 15, 4, '1d6+2', 2)]
+
+
+def test_simulation_is_deterministic():
+    first = simulate(_party(), _monsters(), 3000, seed=5, workers=1,
+                     batch_size=1000)
+    second = simulate(_party(), _monsters(), 3000, seed=5, workers=2,
+                      batch_size=1000)
+
+    assert first.as_dict() == second.as_dict()
+    assert first.encounters == 3000
+    assert 0.9 < first.win_rate <= 1
+    assert first.mean_hit_points_lost > 0
+
+
+def test_hopeless_fight():
+    rat = Combatant('Rat', 1, 10, 0, '1d1', 0)
+    dragon = Combatant('Dragon', 500, 30, 20, '10d10', 0)
+
+    stats = simulate([rat], [dragon], 100, seed=1, workers=1)
+
+    assert stats.win_rate == 0
+    assert stats.rounds_percentiles[50] == 1
+    assert stats.mean_deaths == 1
+    assert stats.mean_rounds_to_win is None
+
+
+def test_combatant_from_stat_block(db):
+    strength = stat.Ability(name='Encounter Strength', abbreviation='STR')
+    dexterity = stat.Ability(name='Encounter Dexterity', abbreviation='DEX')
+    rapier = stat.Attack(name='Encounter Rapier', display_name='Rapier',
+                         required_number_of_hands=1, ability=strength,
+                         damage_dice='1d8')
+    weapon = stat.Weapon(item=stat.Item(name='Encounter Rapier'),
+                         category=stat.WeaponCategory.Martial,
+                         properties=[stat.WeaponProperty(name='Finesse')])
+    armor = stat.Armor(item=stat.Item(name='Encounter Breastplate'),
+                       category=stat.ArmorCategories.MediumArmor,
+                       base_armor_class=14)
+    stat_block = stat.StatBlock(name='Encounter Duelist',
+                                race=stat.Race(name='Encounter Elf'),
+                                base_hit_point_max=27)
+    stat_block.classes.append(stat.StatBlockClass(
+        creature_class=stat.CreatureClass(name='Encounter Fighter'),
+        level=3))
+    stat_block.ability_scores += [
+        stat.AbilityScore(ability=strength, base_value=10),
+        stat.AbilityScore(ability=dexterity, base_value=18)]
+    db.session.add_all([stat_block, rapier, weapon, armor])
+    db.session.commit()
+
+    combatant = Combatant.from_stat_block(
+        stat.StatBlock.load_sheet(stat_block.id)[0], rapier, weapon, armor,
+        shield=True)
+
+    assert combatant.hit_points == 27
+    assert combatant.armor_class == 18
+    assert combatant.attack_bonus == 6
+    assert combatant.damage == '1d8+4'
+    assert combatant.initiative == 4
+
+
+def test_heavy_armor_ignores_low_dexterity(db):
+    dexterity = (stat.Ability.query.filter_by(abbreviation='DEX').first()
+                 or stat.Ability(name='Clumsy Dexterity', abbreviation='DEX'))
+    slam = stat.Attack(name='Clumsy Slam', display_name='Slam',
+                       required_number_of_hands=0, ability=dexterity,
+                       damage_dice='1d4')
+    armor = stat.Armor(item=stat.Item(name='Clumsy Plate'),
+                       category=stat.ArmorCategories.HeavyArmor,
+                       base_armor_class=18)
+    stat_block = stat.StatBlock(name='Clumsy Knight',
+                                race=stat.Race(name='Clumsy Human'),
+                                base_hit_point_max=12)
+    stat_block.ability_scores.append(
+        stat.AbilityScore(ability=dexterity, base_value=6))
+    db.session.add_all([stat_block, slam, armor])
+    db.session.commit()
+
+    combatant = Combatant.from_stat_block(
+        stat.StatBlock.load_sheet(stat_block.id)[0], slam, armor=armor)
+
+    assert combatant.armor_class == 18
+    assert combatant.initiative == -2
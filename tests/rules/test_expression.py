@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from world_manager.rules.dice import DiceRoller
+from world_manager.rules.expression import damage_preview, parse
+
+
+def test_parse():
+    expression = parse('2d6 + 1d8 - 1d4 + 3')
+
+    assert str(expression) == '2d6+1d8-1d4+3'
+    assert parse('2d6 + 1d8 - 1d4 + 3') is expression
+    assert str(parse('4D6K3')) == '4d6kh3'
+    assert str(parse('d%')) == '1d100'
+    for invalid in ('', '2d', '2d6 3', 'fireball', '1d6+', '4d6kh0',
+                    '2d20kl0', '1001d6', '2d6kh3'):
+        with pytest.raises(ValueError):
+            parse(invalid)
+
+
+def test_exact_distribution():
+    damage = parse('2d6+3')
+    scores = parse('4d6kh3')
+    great_weapon = parse('2d6r2')
+
+    assert (damage.minimum, damage.maximum, damage.mean) == (5, 15, 10.0)
+    assert damage.distribution().probability(10) == pytest.approx(6 / 36)
+    assert damage.percentile(50) == 10
+    assert scores.distribution().probability(18) == pytest.approx(21 / 1296)
+    assert scores.mean == pytest.approx(12.2446, abs=1e-4)
+    assert great_weapon.mean == pytest.approx(2 * 25 / 6)
+    assert parse('1d20').distribution().at_least(15) == pytest.approx(0.3)
+    assert sum(parse('1d8-1d4').distribution().probabilities) == \
+        pytest.approx(1)
+
+
+def test_distribution_of_many_dice():
+    many = parse('1000d100r2').distribution()
+    few = parse('7d6r2').distribution()
+
+    assert many.mean == pytest.approx(1000 * (0.02 * 50.5 + 5047 / 100))
+    assert many.probabilities.sum() == pytest.approx(1)
+    assert (many.probabilities >= 0).all()
+    assert few.probability(42) == pytest.approx((8 / 36) ** 7)
+    with pytest.raises(ValueError):
+        parse('1000d1000').distribution()
+
+
+def test_samples_match_distribution():
+    expression = parse('3d6kl2+1d4+1')
+
+    samples = expression.sample(50000, DiceRoller(3))
+
+    assert samples.min() >= expression.minimum
+    assert samples.max() <= expression.maximum
+    assert np.mean(samples) == pytest.approx(expression.mean, abs=0.05)
+
+
+def test_damage_preview():
+    preview = damage_preview('1d8', 3)
+
+    assert (preview.minimum, preview.maximum, preview.mean) == (4, 11, 7.5)
+    assert str(preview) == '8 (1d8+3)'
+    assert damage_preview(None) is None
+    assert damage_preview('fireball') is None
+    assert damage_preview('100d20kh50') is None
+    assert damage_preview('20000d6') is None
+    assert damage_preview('300d1000') is None
@@ -0,0 +1,31 @@
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+from cli.cli import cli
+
+
+def test_help_lists_commands():
+    runner = CliRunner()
+
+    result = runner.invoke(cli, ['--help'])
+    assert result.exit_code == 0
+    assert 'Run PostgreSQL related tasks.' in result.output
+
+    result = runner.invoke(cli, ['db', '--help'])
+    assert result.exit_code == 0
+    assert 'import' in result.output and 'seed' in result.output
+    assert 'index' in result.output
+
+    assert runner.invoke(cli, ['nope']).exit_code != 0
+
+
+def test_help_does_not_create_an_app():
+    code = ('import sys\n'
+            'from cli.cli import cli\n'
+            "cli(['db', 'import', '--help'], standalone_mode=False)\n"
+            "assert 'world_manager.app' not in sys.modules\n"
+            "assert 'sqlalchemy' not in sys.modules\n")
+    subprocess.run([sys.executable, '-c', code], check=True,
+                   stdout=subprocess.DEVNULL)
@@ -0,0 +1,54 @@
+import subprocess
+import sys
+
+from flask import Flask, current_app, render_template
+
+from world_manager.worker import create_celery_app, create_worker_app
+
+
+def test_worker_app_only_has_what_tasks_need():
+    app = create_worker_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})
+
+    assert set(app.extensions) == {'sqlalchemy', 'sql_profiler', 'mail'}
+    assert not app.blueprints
+    with app.app_context():
+        assert 'visitor wrote' in render_template(
+            'contact/mail/index.txt', email='visitor', message='Hi')
+
+
+def test_importing_tasks_does_not_create_an_app():
+    code = ('import sys\n'
+            'from world_manager.blueprints.contact import tasks\n'
+            "assert 'world_manager.app' not in sys.modules\n"
+            "assert 'world_manager.model.stat' not in sys.modules\n"
+            'assert tasks.celery.tasks\n')
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_worker_app_loads_every_model():
+    code = ('import sys\n'
+            'from sqlalchemy.orm import configure_mappers\n'
+            'from world_manager.worker import create_worker_app\n'
+            "create_worker_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://'})\n"
+            "assert 'world_manager.model.world' in sys.modules\n"
+            'configure_mappers()\n')
+    subprocess.run([sys.executable, '-c', code], check=True)
+
+
+def test_tasks_run_in_the_current_app():
+    worker_apps = []
+
+    def worker_app():
+        worker_apps.append(Flask('worker'))
+        return worker_apps[-1]
+
+    celery = create_celery_app(app_factory=worker_app)
+
+    @celery.task
+    def app_name():
+        return current_app.name
+
+    for name in ('first', 'second'):
+        with Flask(name).app_context():
+            assert app_name() == name
+    assert not worker_apps
@@ -0,0 +1,226 @@
+import hashlib
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Mapping, Optional, Tuple
+
+
+class CacheBackend:
+    """
+    A store of byte strings by string key.
+
+    :param timeout: the number of seconds values are kept, or None to keep
+           them until they are evicted
+    """
+
+    def __init__(self, timeout: Optional[float]=None):
+        self.timeout = timeout
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def _expires(self) -> Optional[float]:
+        return time.time() + self.timeout if self.timeout else None
+
+
+class NullCache(CacheBackend):
+    """ A cache that never holds anything, for turning caching off. """
+
+    def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    def set(self, key: str, value: bytes) -> None:
+        pass
+
+    def delete(self, key: str) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class LRUCache(CacheBackend):
+    """
+    An in-process cache that evicts the least recently used values.
+
+    :param size: the most values kept
+    :param timeout: the number of seconds values are kept
+    """
+
+    def __init__(self, size: int=256, timeout: Optional[float]=None):
+        super().__init__(timeout)
+        self.size = size
+        self._values: 'OrderedDict[str, Tuple[Optional[float], bytes]]' = \
+            OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires is not None and expires < time.time():
+                del self._values[key]
+                return None
+            self._values.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock:
+            self._values[key] = (self._expires(), value)
+            self._values.move_to_end(key)
+            while len(self._values) > self.size:
+                self._values.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._values.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+
+class FileSystemCache(CacheBackend):
+    """
+    A cache of one file per value, which can be shared by the processes of a
+    host. Files are replaced atomically, so readers never see partial values.
+
+    :param directory: the directory to store the files in
+    :param timeout: the number of seconds values are kept
+    """
+    suffix = '.cache'
+
+    def __init__(self, directory: str, timeout: Optional[float]=None):
+        super().__init__(timeout)
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        name = hashlib.sha1(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name + self.suffix)
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            if self.timeout and os.path.getmtime(path) + self.timeout \
+                    < time.time():
+                return None
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def set(self, key: str, value: bytes) -> None:
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory)
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(value)
+            os.replace(temporary, self._path(key))
+        except OSError:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+
+    def delete(self, key: str) -> None:
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def clear(self) -> None:
+        for name in os.listdir(self.directory):
+            if name.endswith(self.suffix):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+
+
+class RedisCache(CacheBackend):
+    """
+    A cache in Redis, or any server that speaks its protocol, shared by every
+    process using the same server.
+
+    :param client: a client with the ``get``, ``set``, ``delete`` and
+           ``scan_iter`` methods of ``redis.Redis``
+    :param prefix: prepended to every key, so the cache can share a database
+           with other caches, and required to `clear` it
+    :param timeout: the number of seconds values are kept
+    """
+
+    def __init__(self, client, prefix: str='', timeout: Optional[float]=None):
+        super().__init__(timeout)
+        self.client = client
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> 'RedisCache':
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes) -> None:
+        timeout = int(self.timeout) if self.timeout else None
+        self.client.set(self.prefix + key, value, ex=timeout)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def clear(self) -> None:
+        if not self.prefix:
+            raise ValueError('A Redis cache without a key prefix cannot be '
+                             'cleared, it would empty the whole database')
+        for key in self.client.scan_iter(match=self.prefix + '*'):
+            self.client.delete(key)
+
+
+def create_cache(config: Mapping, prefix: str) -> CacheBackend:
+    """
+    Create a cache from the settings that start with `prefix`:
+
+    - ``TYPE``: ``lru``, ``filesystem``, ``redis`` or ``null``
+    - ``TIMEOUT``: the number of seconds values are kept
+    - ``SIZE``: the most values an ``lru`` cache keeps
+    - ``DIR``: the directory of a ``filesystem`` cache
+    - ``REDIS_URL``: the server of a ``redis`` cache
+    - ``KEY_PREFIX``: prepended to the keys of a ``redis`` cache, `prefix`
+      in lower case by default so caches sharing a database stay apart
+
+    :param config: the settings, e.g. ``app.config``
+    :param prefix: the prefix of the settings, e.g. ``SHEET_CACHE_``
+    :return: the cache
+    """
+    def setting(name, default=None):
+        return config.get(prefix + name, default)
+
+    kind = (setting('TYPE') or 'null').lower()
+    timeout = setting('TIMEOUT')
+    if kind == 'null':
+        return NullCache()
+    if kind == 'lru':
+        return LRUCache(setting('SIZE', 256), timeout)
+    if kind == 'filesystem':
+        directory = setting('DIR') or os.path.join(
+            tempfile.gettempdir(), prefix.lower().rstrip('_'))
+        return FileSystemCache(directory, timeout)
+    if kind == 'redis':
+        return RedisCache.from_url(setting('REDIS_URL'),
+                                   prefix=setting('KEY_PREFIX',
+                                                  prefix.lower()),
+                                   timeout=timeout)
+    raise ValueError(f'Unknown cache type {kind!r} for {prefix}TYPE')
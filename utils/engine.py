@@ -0,0 +1,127 @@
+from typing import Dict, Optional, Tuple
+
+import flask_sqlalchemy
+from flask import Flask
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, URL
+from sqlalchemy.pool import QueuePool
+
+# SQLite
+JOURNAL_MODE = 'wal'
+SYNCHRONOUS = 'normal'
+# Negative sizes are in KiB rather than pages
+CACHE_SIZE = -64000
+MMAP_SIZE = 256 * 1024 * 1024
+BUSY_TIMEOUT = 5000
+SQLITE_POOL_SIZE = 5
+
+# Server databases
+POOL_SIZE = 10
+MAX_OVERFLOW = 20
+POOL_RECYCLE = 1800
+POOL_PRE_PING = True
+POOL_TIMEOUT = 30
+
+SERVER_POOL_OPTIONS = {
+    'pool_size': ('DATABASE_POOL_SIZE', POOL_SIZE),
+    'max_overflow': ('DATABASE_MAX_OVERFLOW', MAX_OVERFLOW),
+    'pool_recycle': ('DATABASE_POOL_RECYCLE', POOL_RECYCLE),
+    'pool_pre_ping': ('DATABASE_POOL_PRE_PING', POOL_PRE_PING),
+    'pool_timeout': ('DATABASE_POOL_TIMEOUT', POOL_TIMEOUT),
+}
+
+
+class SQLAlchemy(flask_sqlalchemy.SQLAlchemy):
+    """
+    Configures the engine from the app's settings.
+
+    SQLite databases in a file run in WAL mode by default, where readers
+    don't wait for a writer and a writer doesn't wait for readers, and keep
+    their connections in a pool, so the ``SQLITE_*`` pragmas are only set
+    when a connection is opened. Other databases get a pool sized by the
+    ``DATABASE_POOL_*`` settings and checked with a ping before use.
+
+    ``SQLALCHEMY_ENGINE_OPTIONS`` still has the last word on the options.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The pragmas of each SQLite engine about to be created, since
+        # create_engine isn't given the app
+        self._pragmas: Dict[URL, Dict[str, str]] = {}
+
+    def apply_driver_hacks(self, app: Flask, sa_url: URL,
+                           options: dict) -> Tuple[URL, dict]:
+        sa_url, options = super().apply_driver_hacks(app, sa_url, options)
+        config = app.config
+        if sa_url.get_backend_name() != 'sqlite':
+            for option, (setting, default) in SERVER_POOL_OPTIONS.items():
+                options.setdefault(option, config.get(setting, default))
+            return sa_url, options
+
+        in_memory = _in_memory(sa_url)
+        self._pragmas[sa_url] = sqlite_pragmas(config, in_memory)
+        if in_memory:
+            return sa_url, options
+        pool_size = config.get('SQLITE_POOL_SIZE', SQLITE_POOL_SIZE)
+        if pool_size:
+            options['poolclass'] = QueuePool
+            options['pool_size'] = pool_size
+            # Pooled connections are handed from thread to thread, one at a
+            # time
+            connect_args = options.setdefault('connect_args', {})
+            connect_args.setdefault('check_same_thread', False)
+        return sa_url, options
+
+    def create_engine(self, sa_url: URL, engine_opts: dict) -> Engine:
+        engine = super().create_engine(sa_url, engine_opts)
+        pragmas = self._pragmas.pop(sa_url, None)
+        if pragmas:
+            event.listen(engine, 'connect', _set_pragmas(pragmas))
+        return engine
+
+
+def sqlite_pragmas(config, in_memory: bool=False) -> Dict[str, str]:
+    """
+    The pragmas to set on each new SQLite connection.
+
+    :param config: the app's config, whose ``SQLITE_JOURNAL_MODE``,
+           ``SQLITE_SYNCHRONOUS``, ``SQLITE_CACHE_SIZE``, ``SQLITE_MMAP_SIZE``
+           and ``SQLITE_BUSY_TIMEOUT`` are used, or left to SQLite if None
+    :param in_memory: whether the database is in memory, which has no
+           journal to configure
+    :return: the values of the pragmas by name
+    """
+    settings = {
+        'journal_mode': config.get('SQLITE_JOURNAL_MODE', JOURNAL_MODE),
+        'synchronous': config.get('SQLITE_SYNCHRONOUS', SYNCHRONOUS),
+        'cache_size': config.get('SQLITE_CACHE_SIZE', CACHE_SIZE),
+        'mmap_size': config.get('SQLITE_MMAP_SIZE', MMAP_SIZE),
+        'busy_timeout': config.get('SQLITE_BUSY_TIMEOUT', BUSY_TIMEOUT),
+    }
+    if in_memory:
+        del settings['journal_mode']
+    return {name: str(value) for name, value in settings.items()
+            if value is not None}
+
+
+def pragma(engine: Engine, name: str) -> Optional[str]:
+    """ Read a pragma of a connection of the engine, e.g. ``journal_mode``. """
+    with engine.connect() as connection:
+        value = connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+    return None if value is None else str(value)
+
+
+def _set_pragmas(pragmas: Dict[str, str]):
+    def set_pragmas(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f'PRAGMA {name} = {value}')
+        finally:
+            cursor.close()
+    return set_pragmas
+
+
+def _in_memory(sa_url: URL) -> bool:
+    return sa_url.database in (None, '', ':memory:')
@@ -1,13 +1,46 @@
-from typing import Optional
+import smtplib
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from weakref import WeakKeyDictionary
 
-from flask import render_template
+from flask import current_app
+from flask_mail import BadHeaderError, Connection, Message
+from jinja2 import Environment, Template, TemplateNotFound
 
 from world_manager.extensions import mail
 
+MAX_IDLE = 30
+
+# Errors after which the connection can't be trusted, as opposed to errors
+# about one message, like a refused recipient
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError,
+                     TimeoutError)
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                  smtplib.SMTPDataError, BadHeaderError)
+
+_templates: 'WeakKeyDictionary[Environment, Dict[str, Optional[Template]]]' = \
+    WeakKeyDictionary()
+
 
 def send_template_message(template,
                           context: Optional[dict]=None, *args, **kwargs):
 
+    send_messages([render_template_message(template, context,
+                                           *args, **kwargs)])
+
+
+def render_template_message(template, context: Optional[dict]=None,
+                            *args, **kwargs) -> Message:
+    """
+    Create a message whose plain text and HTML bodies are rendered from the
+    ``.txt`` and ``.html`` versions of a template, whichever exist.
+
+    :param template: the path of the templates without the extension, or
+           None to give ``body`` or ``html`` directly
+    :param context: the variables of the templates
+    :return: the message
+    """
     if context is None:
         context = {}
 
@@ -19,11 +52,119 @@ def send_template_message(template,
                                               extension='html',
                                               **context)
 
-    mail.send_message(*args, **kwargs)
+    return Message(*args, **kwargs)
 
 
-def _try_render_template(template_path: str, extension='txt', **kwargs):
+def send_messages(messages: Iterable[Message]
+                  ) -> List[Tuple[Message, Exception]]:
+    """
+    Send messages over this thread's pooled SMTP connection.
+
+    :param messages: the messages
+    :return: the messages the server refused, with the errors
+    """
+    return connection_pool.send(messages)
+
+
+class ConnectionPool:
+    """
+    Keeps one SMTP connection per thread open between batches of messages,
+    so a worker pays for connecting, STARTTLS and logging in once rather than
+    for every message.
+
+    Servers drop idle clients, so a connection unused for longer than
+    ``MAIL_POOL_MAX_IDLE`` seconds is replaced, and a connection lost while
+    sending is reopened once before giving up.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def send(self, messages: Iterable[Message]
+             ) -> List[Tuple[Message, Exception]]:
+        """
+        Send messages, carrying on past the ones the server refuses.
+
+        :param messages: the messages
+        :return: the refused messages, with the errors
+        :raises: the connection errors of ``smtplib``, if the server can't be
+                 reached
+        """
+        failures = []
+        for message in messages:
+            try:
+                self._send(message)
+            except MESSAGE_ERRORS as e:
+                failures.append((message, e))
+        self._local.last_used = time.monotonic()
+        return failures
+
+    def close(self) -> None:
+        connection = getattr(self._local, 'connection', None)
+        self._local.connection = None
+        if connection is not None and connection.host is not None:
+            try:
+                connection.host.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+
+    def _send(self, message: Message) -> None:
+        try:
+            self._connection().send(message)
+        except CONNECTION_ERRORS:
+            self.close()
+            self._connection().send(message)
+
+    def _connection(self) -> Connection:
+        state = current_app.extensions['mail']
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None:
+            idle = time.monotonic() - self._local.last_used
+            max_idle = current_app.config.get('MAIL_POOL_MAX_IDLE', MAX_IDLE)
+            if connection.mail is state and idle < max_idle:
+                return connection
+            self.close()
+        connection = mail.connect().__enter__()
+        self._local.connection = connection
+        self._local.last_used = time.monotonic()
+        return connection
+
+
+connection_pool = ConnectionPool()
+
+
+def get_template(name: str) -> Optional[Template]:
+    """
+    Return a compiled template, or None if it doesn't exist.
+
+    Lookups are cached, including those of missing templates, unless the app
+    reloads templates when they change.
+
+    :param name: the name of the template
+    :return: the template
+    """
+    environment = current_app.jinja_env
+    if environment.auto_reload:
+        return _load_template(environment, name)
+    templates = _templates.setdefault(environment, {})
+    try:
+        return templates[name]
+    except KeyError:
+        template = templates[name] = _load_template(environment, name)
+        return template
+
+
+def _load_template(environment: Environment,
+                   name: str) -> Optional[Template]:
     try:
-        return render_template(f'{template_path}.{extension}', **kwargs)
-    except IOError:
-        pass
+        return environment.get_template(name)
+    except TemplateNotFound:
+        return None
+
+
+def _try_render_template(template_path: str, extension='txt', **kwargs):
+    template = get_template(f'{template_path}.{extension}')
+    if template is None:
+        return None
+    current_app.update_template_context(kwargs)
+    return template.render(kwargs)
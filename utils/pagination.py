@@ -0,0 +1,312 @@
+import base64
+import binascii
+import datetime
+import decimal
+import hashlib
+import json
+from typing import List, Optional, Sequence
+
+import pytz
+from sqlalchemy import and_, false, or_, true
+from sqlalchemy.orm import Query
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import UnaryExpression
+from sqlalchemy.types import TypeDecorator
+
+_NUMBERS = (int, float, decimal.Decimal)
+
+
+class InvalidCursor(ValueError):
+    """ A cursor which is malformed or belongs to another ordering. """
+
+
+class SortKey:
+    """
+    One column of a keyset ordering.
+
+    NULLs come first in either direction, so paging forward always seeks
+    with a plain range on the key.
+
+    :param expression: the column, or any SQL expression, to sort by
+    :param descending: sort from the largest value to the smallest
+    :param nullable: whether the expression can be NULL, taken from the
+           column by default
+    """
+
+    def __init__(self, expression, descending: bool=False,
+                 nullable: Optional[bool]=None):
+        self.expression = expression
+        self.descending = descending
+        if nullable is None:
+            nullable = getattr(getattr(expression, 'expression', expression),
+                               'nullable', True)
+        self.nullable = nullable
+
+    @classmethod
+    def coerce(cls, key) -> 'SortKey':
+        """ Accept a `SortKey`, a column or ``column.desc()``. """
+        if isinstance(key, SortKey):
+            return key
+        if isinstance(key, UnaryExpression) and key.modifier in (
+                operators.asc_op, operators.desc_op):
+            return cls(key.element, key.modifier is operators.desc_op)
+        return cls(key)
+
+    def accepts(self, value) -> bool:
+        """ Whether a value from a cursor can be compared to the key. """
+        if value is None:
+            return self.nullable
+        if isinstance(value, (list, dict)):
+            return False
+        python_type = _python_type(self.expression)
+        if python_type is None:
+            return True
+        if issubclass(python_type, bool):
+            return isinstance(value, bool)
+        if issubclass(python_type, _NUMBERS):
+            return isinstance(value, _NUMBERS) and not isinstance(value, bool)
+        if issubclass(python_type, datetime.datetime):
+            return isinstance(value, datetime.datetime)
+        if issubclass(python_type, datetime.date):
+            return (isinstance(value, datetime.date)
+                    and not isinstance(value, datetime.datetime))
+        if issubclass(python_type, str):
+            return isinstance(value, str)
+        return True
+
+    def order_by(self, reverse: bool=False):
+        descending = self.descending != reverse
+        clause = (self.expression.desc() if descending
+                  else self.expression.asc())
+        if not self.nullable:
+            return clause
+        return clause.nullslast() if reverse else clause.nullsfirst()
+
+    def equal(self, value):
+        if value is None:
+            return self.expression.is_(None)
+        return self.expression == value
+
+    def beyond(self, value, reverse: bool=False):
+        """ The rows strictly past `value` in the direction of travel. """
+        if value is None:
+            return false() if reverse else self.expression.isnot(None)
+        if self.descending == reverse:
+            condition = self.expression > value
+        else:
+            condition = self.expression < value
+        return self._with_nulls(condition, reverse)
+
+    def reach(self, value, reverse: bool=False):
+        """ The rows at or past `value` in the direction of travel. """
+        if value is None:
+            return self.expression.is_(None) if reverse else true()
+        if self.descending == reverse:
+            condition = self.expression >= value
+        else:
+            condition = self.expression <= value
+        return self._with_nulls(condition, reverse)
+
+    def _with_nulls(self, condition, reverse: bool):
+        # NULLs are first going forward, so they are past any value going
+        # backward
+        if reverse and self.nullable:
+            return or_(condition, self.expression.is_(None))
+        return condition
+
+
+class KeysetPage:
+    """
+    A page of a keyset paginated query.
+
+    :param items: the rows of the page
+    :param per_page: the most rows of a page
+    :param next_cursor: the cursor of the following page, None on the last
+    :param previous_cursor: the cursor of the preceding page, None on the
+           first
+    """
+
+    def __init__(self, items: List, per_page: int,
+                 next_cursor: Optional[str],
+                 previous_cursor: Optional[str]):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def as_dict(self) -> dict:
+        return {
+            'per_page': self.per_page,
+            'next': self.next_cursor,
+            'previous': self.previous_cursor,
+        }
+
+
+def keyset_paginate(query: Query, keys: Sequence, per_page: int=20,
+                    after: Optional[str]=None,
+                    before: Optional[str]=None) -> KeysetPage:
+    """
+    Return one page of a query by seeking past the rows of the previous
+    pages with a ``WHERE`` condition on the sort keys, rather than skipping
+    them with ``OFFSET``. Every page costs the same however deep it is, as
+    long as an index covers the sort keys, and rows written while paging
+    neither repeat nor go missing.
+
+    The primary key of the query's entity is added to the keys when they
+    don't already end with it, so the ordering is total. Any ordering the
+    query already has is replaced.
+
+    :param query: the query, e.g. ``Spell.query.filter(...)``
+    :param keys: the columns to sort by, optionally as ``column.desc()`` or
+           `SortKey`
+    :param per_page: the most rows of the page
+    :param after: a `next_cursor` of an earlier page, to get the page after it
+    :param before: a `previous_cursor` of an earlier page, to get the page
+           before it
+    :return: the page
+    :raises InvalidCursor: if a cursor was not made for these keys
+    """
+    if after is not None and before is not None:
+        raise ValueError('Give either after or before, not both')
+    keys = _total_order(query, [SortKey.coerce(k) for k in keys])
+    signature = _signature(keys)
+    reverse = before is not None
+    cursor = before if reverse else after
+
+    query = query.order_by(None).order_by(
+        *(k.order_by(reverse) for k in keys))
+    if cursor is not None:
+        query = query.filter(
+            _seek(keys, decode_cursor(cursor, signature), reverse))
+    query = query.add_columns(*(k.expression for k in keys))
+
+    rows = query.limit(per_page + 1).all()
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if reverse:
+        rows.reverse()
+    items = [row[0] for row in rows]
+
+    def cursor_of(row) -> str:
+        return encode_cursor(row[1:], signature)
+
+    first = cursor_of(rows[0]) if rows else None
+    last = cursor_of(rows[-1]) if rows else None
+    if reverse:
+        # Rows past the `before` cursor were seen on the page it came from
+        return KeysetPage(items, per_page, last or cursor,
+                          first if more else None)
+    return KeysetPage(items, per_page, last if more else None,
+                      None if cursor is None else first or cursor)
+
+
+def encode_cursor(values: Sequence, signature: str='') -> str:
+    """
+    Encode the sort key values of a row into an opaque, URL safe token.
+
+    :param values: the values of the row's sort keys
+    :param signature: identifies the ordering the values belong to
+    :return: the cursor
+    """
+    data = json.dumps([signature, [_encode_value(v) for v in values]],
+                      separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode('utf-8')).decode(
+        'ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, signature: str='') -> list:
+    """
+    Decode a cursor made by `encode_cursor`.
+
+    :param cursor: the cursor
+    :param signature: the signature the cursor must have been made with
+    :return: the values of the sort keys
+    :raises InvalidCursor: if the cursor is malformed or was made for another
+            ordering
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        found, values = json.loads(base64.urlsafe_b64decode(padded))
+        values = [_decode_value(v) for v in values]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError,
+            KeyError) as e:
+        raise InvalidCursor(f'Malformed cursor: {cursor!r}') from e
+    if found != signature:
+        raise InvalidCursor('The cursor belongs to another ordering')
+    return values
+
+
+def _total_order(query: Query, keys: List[SortKey]) -> List[SortKey]:
+    entity = query.column_descriptions[0]['entity']
+    mapper = getattr(entity, '__mapper__', None)
+    if mapper is None:
+        return keys
+    primary_key = [getattr(entity, mapper.get_property_by_column(c).key)
+                   for c in mapper.primary_key]
+    tail = keys[-len(primary_key):]
+    if len(tail) == len(primary_key) and all(
+            k.expression.compare(c.expression)
+            for k, c in zip(tail, primary_key)):
+        return keys
+    descending = keys[-1].descending if keys else False
+    return keys + [SortKey(c, descending, nullable=False)
+                   for c in primary_key]
+
+
+def _signature(keys: Sequence[SortKey]) -> str:
+    description = ';'.join(f'{k.expression}:{k.descending:d}' for k in keys)
+    return hashlib.sha1(description.encode('utf-8')).hexdigest()[:8]
+
+
+def _seek(keys: Sequence[SortKey], values: list, reverse: bool):
+    if len(values) != len(keys):
+        raise InvalidCursor('The cursor belongs to another ordering')
+    for key, value in zip(keys, values):
+        if not key.accepts(value):
+            raise InvalidCursor(f'The cursor has an invalid value {value!r} '
+                                f'for {key.expression}')
+    # (a, b, c) past (x, y, z) is a past x, or a = x and b past y, or ...
+    # written out so each key can have its own direction and NULL handling
+    conditions = []
+    for i, (key, value) in enumerate(zip(keys, values)):
+        equal = [k.equal(v) for k, v in zip(keys[:i], values[:i])]
+        conditions.append(and_(*equal, key.beyond(value, reverse)))
+    # The redundant bound on the first key is what lets the database seek
+    # into its index, planners don't derive a range from the disjunction
+    return and_(keys[0].reach(values[0], reverse), or_(*conditions))
+
+
+def _python_type(expression) -> Optional[type]:
+    type_ = getattr(expression, 'type', None)
+    while isinstance(type_, TypeDecorator):
+        type_ = type_.impl
+    try:
+        return type_.python_type
+    except (AttributeError, NotImplementedError):
+        return None
+
+
+def _encode_value(value):
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = pytz.utc.localize(value)
+        return {'t': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'d': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if 't' in value:
+            return datetime.datetime.fromisoformat(value['t'])
+        return datetime.date.fromisoformat(value['d'])
+    return value
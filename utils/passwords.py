@@ -0,0 +1,118 @@
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from flask import Flask
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, \
+    check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'pbkdf2:sha256'
+DEFAULT_WORKERS = 2
+DEFAULT_MAX_PENDING = 64
+DEFAULT_QUEUE_TIMEOUT = 5.0
+
+
+class PasswordHasherBusy(RuntimeError):
+    """ Too many passwords are waiting to be hashed or checked. """
+
+
+class PasswordHasher:
+    """
+    Hashes and checks passwords on a small pool of threads.
+
+    Hashing is meant to be slow, so it is kept off the threads serving
+    requests: at most ``PASSWORD_HASH_WORKERS`` passwords are hashed at once,
+    however many requests log in together, and at most
+    ``PASSWORD_HASH_MAX_PENDING`` wait their turn. ``hashlib`` releases the
+    GIL while it hashes, so threads are enough for the pool to use other
+    cores.
+
+    The work factor is ``PASSWORD_HASH_METHOD`` and, for PBKDF2,
+    ``PASSWORD_HASH_ITERATIONS``. Hashes made with another work factor
+    still check, and `needs_rehash` tells when to replace them.
+    """
+
+    def __init__(self, method: str=DEFAULT_METHOD,
+                 iterations: int=DEFAULT_PBKDF2_ITERATIONS,
+                 workers: int=DEFAULT_WORKERS,
+                 max_pending: int=DEFAULT_MAX_PENDING,
+                 queue_timeout: Optional[float]=DEFAULT_QUEUE_TIMEOUT):
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.configure(method, iterations, workers, max_pending,
+                       queue_timeout)
+        if hasattr(os, 'register_at_fork'):
+            # The threads of a pool don't survive a fork
+            os.register_at_fork(after_in_child=self._forget_executor)
+
+    def init_app(self, app: Flask) -> None:
+        config = app.config
+        self.configure(
+            config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD),
+            config.get('PASSWORD_HASH_ITERATIONS', DEFAULT_PBKDF2_ITERATIONS),
+            config.get('PASSWORD_HASH_WORKERS', DEFAULT_WORKERS),
+            config.get('PASSWORD_HASH_MAX_PENDING', DEFAULT_MAX_PENDING),
+            config.get('PASSWORD_HASH_QUEUE_TIMEOUT', DEFAULT_QUEUE_TIMEOUT))
+        app.extensions['password_hasher'] = self
+
+    def configure(self, method: str, iterations: int, workers: int,
+                  max_pending: int, queue_timeout: Optional[float]) -> None:
+        if method.startswith('pbkdf2:'):
+            method = ':'.join(method.split(':')[:2] + [str(iterations)])
+        with self._lock:
+            self.method = method
+            self.queue_timeout = queue_timeout
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._executor = None
+            self._workers = workers
+            self._pending = threading.BoundedSemaphore(max_pending)
+
+    def hash(self, password: str) -> str:
+        """
+        Hash a password with the configured work factor.
+
+        :param password: the password in plain text
+        :return: the hash, including its method and salt
+        """
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash: str, password: str) -> bool:
+        """
+        Check a password against a hash made with any work factor.
+
+        :param password_hash: the hash
+        :param password: the password in plain text
+        :return: whether the password matches
+        """
+        if not password_hash:
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash: str) -> bool:
+        """ Whether a hash was made with another work factor. """
+        return password_hash.split('$', 1)[0] != self.method
+
+    def _run(self, function: Callable, *args):
+        pending = self._pending
+        if not pending.acquire(timeout=self.queue_timeout):
+            raise PasswordHasherBusy('Too many passwords waiting to be hashed')
+        try:
+            future: Future = self._get_executor().submit(function, *args)
+        except BaseException:
+            pending.release()
+            raise
+        future.add_done_callback(lambda _: pending.release())
+        return future.result()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    self._workers, thread_name_prefix='password-hasher')
+            return self._executor
+
+    def _forget_executor(self) -> None:
+        self._lock = threading.Lock()
+        self._executor = None
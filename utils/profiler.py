@@ -0,0 +1,275 @@
+import logging
+import re
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from flask import Flask, Response, current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+N_PLUS_ONE_THRESHOLD = 5
+WINDOW = 1000
+SUMMARY_EVERY = 1000
+
+logger = logging.getLogger('world_manager.sql')
+
+_WHITESPACE = re.compile(r'\s+')
+# IN lists of any length have the same shape
+_PARAMETER_LIST = re.compile(r'\(\s*(?:\?|%\(\w+\)s|:\w+)'
+                             r'(?:\s*,\s*(?:\?|%\(\w+\)s|:\w+))*\s*\)')
+
+_current: ContextVar[Optional['QueryProfile']] = ContextVar(
+    'query_profile', default=None)
+
+
+def query_shape(statement: str) -> str:
+    """
+    The statement with its whitespace collapsed and lists of parameters
+    shortened, so the queries of an N+1 have the same shape.
+
+    :param statement: SQL as sent to the database, with placeholders
+    :return: the shape
+    """
+    statement = _WHITESPACE.sub(' ', statement).strip()
+    return _PARAMETER_LIST.sub('(...)', statement)
+
+
+class QueryProfile:
+    """
+    The SQL statements executed while the profile is active, in this thread
+    or context, counted and timed by shape.
+
+    Profiles nest: a statement is recorded by the active profile and every
+    profile enclosing it.
+
+    :param name: what is profiled, e.g. the endpoint of a request
+    :param engine: only record the statements of this engine, if given
+    """
+
+    def __init__(self, name: str='', engine: Optional[Engine]=None):
+        self.name = name
+        self.engine = engine
+        self.count = 0
+        self.duration = 0.0
+        self.shapes: Dict[str, List] = defaultdict(lambda: [0, 0.0])
+        self._parent: Optional[QueryProfile] = None
+        self._token = None
+
+    def record(self, engine: Engine, statement: str, duration: float) -> None:
+        if self.engine is not None and engine is not self.engine:
+            return
+        self.count += 1
+        self.duration += duration
+        shape = self.shapes[query_shape(statement)]
+        shape[0] += 1
+        shape[1] += duration
+
+    def repeated(self, threshold: int=N_PLUS_ONE_THRESHOLD
+                 ) -> List[Tuple[str, int]]:
+        """
+        The shapes executed at least `threshold` times, most frequent first,
+        which are likely N+1 queries.
+
+        :param threshold: the least number of executions
+        :return: the shapes with their counts
+        """
+        return sorted(((shape, count) for shape, (count, _)
+                       in self.shapes.items() if count >= threshold),
+                      key=lambda item: -item[1])
+
+    def start(self) -> 'QueryProfile':
+        _listen()
+        self._parent = _current.get()
+        self._token = _current.set(self)
+        return self
+
+    def stop(self) -> None:
+        if self._token is not None:
+            _current.reset(self._token)
+            self._token = None
+
+    def __enter__(self) -> 'QueryProfile':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+
+class QueryCounter(QueryProfile):
+    """
+    Counts the statements executed on an engine within a ``with`` block.
+
+    :param engine: the engine, or None to count those of any engine
+    """
+
+    def __init__(self, engine: Optional[Engine]=None):
+        super().__init__('query counter', engine)
+
+
+class SQLProfiler:
+    """
+    Counts and times the SQL statements of each request and Celery task.
+
+    Each request's totals are sent back in the ``X-Query-Count`` and
+    ``X-Query-Time`` (milliseconds) headers if ``SQL_PROFILER_HEADERS`` is
+    set, and logged to ``world_manager.sql`` at debug level. A shape of
+    statement executed ``SQL_PROFILER_N_PLUS_ONE`` times or more by one
+    request or task is logged as a warning, as a likely N+1 query.
+
+    The totals of the last ``SQL_PROFILER_WINDOW`` requests and tasks make up
+    the rolling `summary`, which is logged every
+    ``SQL_PROFILER_SUMMARY_EVERY`` of them.
+    """
+
+    def __init__(self):
+        self._profiles: Deque[Tuple[str, int, float, bool]] = deque(
+            maxlen=WINDOW)
+        self._finished = 0
+
+    def init_app(self, app: Flask) -> None:
+        config = app.config
+        config.setdefault('SQL_PROFILER_ENABLED', True)
+        config.setdefault('SQL_PROFILER_HEADERS', False)
+        config.setdefault('SQL_PROFILER_N_PLUS_ONE', N_PLUS_ONE_THRESHOLD)
+        config.setdefault('SQL_PROFILER_WINDOW', WINDOW)
+        config.setdefault('SQL_PROFILER_SUMMARY_EVERY', SUMMARY_EVERY)
+        window = config['SQL_PROFILER_WINDOW']
+        if window != self._profiles.maxlen:
+            self._profiles = deque(self._profiles, maxlen=window)
+        app.extensions['sql_profiler'] = self
+
+        if config['SQL_PROFILER_ENABLED']:
+            app.before_request(self._before_request)
+            app.after_request(self._after_request)
+            app.teardown_request(self._teardown_request)
+
+    @contextmanager
+    def profile(self, name: str) -> Iterator[Optional[QueryProfile]]:
+        """
+        Profile the statements executed within a ``with`` block, e.g. of a
+        task, and log and summarize them at its end.
+
+        :param name: what is profiled
+        :return: the profile, or None when the profiler is disabled
+        """
+        if not current_app.config.get('SQL_PROFILER_ENABLED'):
+            yield None
+            return
+        profile = QueryProfile(name).start()
+        try:
+            yield profile
+        finally:
+            profile.stop()
+            self._finish(profile)
+
+    def summary(self) -> Dict[str, dict]:
+        """
+        The totals of the recent requests and tasks, by endpoint or task.
+
+        :return: for each name, the number of ``runs``, the ``mean_queries``
+                 and ``max_queries``, the ``mean_ms`` and ``max_ms`` spent in
+                 SQL, and the number of runs with ``n_plus_one`` queries
+        """
+        totals: Dict[str, dict] = {}
+        for name, count, duration, n_plus_one in list(self._profiles):
+            total = totals.setdefault(name, {
+                'runs': 0, 'queries': 0, 'max_queries': 0, 'ms': 0.0,
+                'max_ms': 0.0, 'n_plus_one': 0})
+            total['runs'] += 1
+            total['queries'] += count
+            total['max_queries'] = max(total['max_queries'], count)
+            total['ms'] += duration * 1000
+            total['max_ms'] = max(total['max_ms'], duration * 1000)
+            total['n_plus_one'] += n_plus_one
+        for total in totals.values():
+            total['mean_queries'] = total.pop('queries') / total['runs']
+            total['mean_ms'] = total.pop('ms') / total['runs']
+        return totals
+
+    def _before_request(self) -> None:
+        g._query_profile = QueryProfile(
+            request.endpoint or request.path).start()
+
+    def _after_request(self, response: Response) -> Response:
+        profile = g.get('_query_profile')
+        if profile is not None and current_app.config['SQL_PROFILER_HEADERS']:
+            response.headers['X-Query-Count'] = str(profile.count)
+            response.headers['X-Query-Time'] = f'{profile.duration * 1000:.2f}'
+        return response
+
+    def _teardown_request(self, exception=None) -> None:
+        profile = g.pop('_query_profile', None)
+        if profile is not None:
+            profile.stop()
+            self._finish(profile)
+
+    def _finish(self, profile: QueryProfile) -> None:
+        config = current_app.config
+        repeated = profile.repeated(config['SQL_PROFILER_N_PLUS_ONE'])
+        logger.debug('%s: %d queries in %.2f ms', profile.name,
+                     profile.count, profile.duration * 1000)
+        for shape, count in repeated:
+            logger.warning('%s: possible N+1, %d queries of the shape %s',
+                           profile.name, count, shape)
+
+        self._profiles.append((profile.name, profile.count, profile.duration,
+                               bool(repeated)))
+        self._finished += 1
+        every = config['SQL_PROFILER_SUMMARY_EVERY']
+        if every and self._finished % every == 0:
+            self._log_summary()
+
+    def _log_summary(self) -> None:
+        summary = sorted(self.summary().items(),
+                         key=lambda item: -item[1]['mean_queries'])
+        lines = [f'{name}: {s["runs"]} runs, {s["mean_queries"]:.1f} queries '
+                 f'(max {s["max_queries"]}), {s["mean_ms"]:.2f} ms '
+                 f'(max {s["max_ms"]:.2f}), {s["n_plus_one"]} with N+1'
+                 for name, s in summary]
+        logger.info('SQL over the last %d requests and tasks:\n%s',
+                    len(self._profiles), '\n'.join(lines))
+
+
+_listening = False
+
+
+def _listen() -> None:
+    global _listening
+    if not _listening:
+        _listening = True
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(Engine, 'handle_error', _handle_error)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany) -> None:
+    if _current.get() is not None:
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany) -> None:
+    profile = _current.get()
+    if profile is None:
+        return
+    starts = conn.info.get('query_start')
+    if not starts:
+        return
+    duration = time.perf_counter() - starts.pop()
+    engine = conn.engine
+    while profile is not None:
+        profile.record(engine, statement, duration)
+        profile = profile._parent
+
+
+def _handle_error(context) -> None:
+    # Failed statements count too, and must not leave their start behind
+    connection = context.connection
+    if connection is not None and context.cursor is not None:
+        _after_cursor_execute(connection, context.cursor, context.statement,
+                              context.parameters, context.execution_context,
+                              False)
@@ -1,11 +1,19 @@
 import datetime
-from typing import Optional
+from typing import Callable, Iterable, Mapping, Optional, Union
 
 import pytz
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.dml import UpdateBase
 from sqlalchemy.types import TypeDecorator, DateTime
 
 from world_manager.extensions import db
 
+DEFAULT_BATCH_SIZE = 500
+
+# SQLite only auto-increments INTEGER primary keys
+BigIntegerId = db.BigInteger().with_variant(db.Integer, 'sqlite')
+
 
 def tz_aware_now():
     """
@@ -24,6 +32,7 @@ class AwareDateTime(TypeDecorator):
     """
 
     impl = DateTime(timezone=True)
+    cache_ok = True
 
     def process_bind_param(self, value, dialect):
         if isinstance(value, datetime.datetime):
@@ -43,40 +52,84 @@ class ResourceMixin:
         AwareDateTime(),
         default=tz_aware_now,
     )
+    # Set once per flush for each row that is actually updated, whether the
+    # update comes from the ORM or from a Core statement
     db_updated_on = db.Column(
         AwareDateTime(),
         default=tz_aware_now,
+        onupdate=tz_aware_now,
     )
 
-    def __setattr__(self, key, value):
-        if hasattr(self, key):
-            if getattr(self, key) != value:
-                super().__setattr__(key, value)
-                super().__setattr__('db_updated_on', tz_aware_now())
-        else:
-            super().__setattr__(key, value)
-
     def save(self):
         """
-        Save a model instance
+        Save a model instance. Inside a `DeferredCommit` the instance is only
+        added to the session, and is committed with the rest of the batch.
 
         :return: model instance
         """
         db.session.add(self)
-        db.session.flush()
-        db.session.commit()
+        deferred = DeferredCommit.active(db.session)
+        if deferred:
+            deferred.pending(1)
+        else:
+            db.session.flush()
+            db.session.commit()
 
         return self
 
     def delete(self):
         """
-        Delete a model instance
+        Delete a model instance. Inside a `DeferredCommit` the delete is
+        committed with the rest of the batch.
 
         :return: the result of the commit
         """
         db.session.delete(self)
+        deferred = DeferredCommit.active(db.session)
+        if deferred:
+            return deferred.pending(1)
         return db.session.commit()
 
+    @classmethod
+    def save_all(cls, rows: Iterable[Union['ResourceMixin', Mapping]],
+                 batch_size: int=DEFAULT_BATCH_SIZE, session=None) -> int:
+        """
+        Save many rows of this model, see `save_all`.
+
+        :return: the number of rows saved
+        """
+        return save_all(cls, rows, batch_size, session)
+
+    @classmethod
+    def update_all(cls, mappings: Iterable[Mapping],
+                   batch_size: int=DEFAULT_BATCH_SIZE, session=None) -> int:
+        """
+        Update many rows of this model, see `update_all`.
+
+        :return: the number of rows updated
+        """
+        return update_all(cls, mappings, batch_size, session)
+
+    @classmethod
+    def delete_all(cls, instances: Iterable['ResourceMixin'],
+                   batch_size: int=DEFAULT_BATCH_SIZE, session=None) -> int:
+        """
+        Delete many model instances in a single transaction.
+
+        :param instances: the model instances
+        :param batch_size: the number of deletes per flush
+        :param session: the session to delete with, `db.session` by default
+        :return: the number of instances deleted
+        """
+        count = 0
+        with DeferredCommit(session, batch_size) as session:
+            deferred = DeferredCommit.active(session)
+            for instance in instances:
+                session.delete(instance)
+                deferred.pending(1)
+                count += 1
+        return count
+
     def __str__(self):
         """
         create a human readable version of the class instance
@@ -95,6 +148,114 @@ class ResourceMixin:
                                           values)
 
 
+def save_all(model, rows: Iterable[Union[object, Mapping]],
+             batch_size: int=DEFAULT_BATCH_SIZE, session=None) -> int:
+    """
+    Save many rows of a model in a single transaction, flushing every
+    `batch_size` rows. Rows may be model instances, which are added to the
+    session and written by its unit of work, or mappings of column values
+    for new rows, which are inserted with bulk insert mappings and are not
+    added to the session. Mappings are the fast path for large loads.
+
+    :param model: the model of the rows
+    :param rows: model instances or mappings of new rows
+    :param batch_size: the number of rows per flush
+    :param session: the session to save with, `db.session` by default
+    :return: the number of rows saved
+    """
+    with DeferredCommit(session, batch_size) as session:
+        deferred = DeferredCommit.active(session)
+        instances = []
+        mappings = []
+        count = 0
+        for row in rows:
+            if isinstance(row, Mapping):
+                mappings.append(row)
+            else:
+                instances.append(row)
+            if len(instances) + len(mappings) >= batch_size:
+                count += _save_batch(session, model, instances, mappings)
+                deferred.pending(len(instances) + len(mappings))
+                instances, mappings = [], []
+        count += _save_batch(session, model, instances, mappings)
+        deferred.pending(len(instances) + len(mappings))
+    return count
+
+
+def update_all(model, mappings: Iterable[Mapping],
+               batch_size: int=DEFAULT_BATCH_SIZE, session=None) -> int:
+    """
+    Update many existing rows of a model in a single transaction with bulk
+    update mappings, flushing every `batch_size` rows. The rows are not
+    loaded or added to the session.
+
+    :param model: the model of the rows
+    :param mappings: the primary key of each row and the values to set
+    :param batch_size: the number of rows per flush
+    :param session: the session to update with, `db.session` by default
+    :return: the number of rows updated
+    """
+    count = 0
+    with DeferredCommit(session, batch_size) as session:
+        deferred = DeferredCommit.active(session)
+        batch = []
+        for mapping in mappings:
+            batch.append(mapping)
+            if len(batch) >= batch_size:
+                session.bulk_update_mappings(model, batch)
+                deferred.pending(len(batch))
+                count += len(batch)
+                batch = []
+        if batch:
+            session.bulk_update_mappings(model, batch)
+            deferred.pending(len(batch))
+            count += len(batch)
+    return count
+
+
+def _save_batch(session, model, instances: list, mappings: list) -> int:
+    if instances:
+        session.add_all(instances)
+    if mappings:
+        session.bulk_insert_mappings(model, mappings)
+    return len(instances) + len(mappings)
+
+
+def on_table_write(tables: Iterable, callback: Callable[[], None]) -> None:
+    """
+    Call `callback` whenever an insert, update or delete on one of `tables`
+    is executed, through the ORM or Core, and again when the transaction it
+    was executed in commits or rolls back, since anything cached while the
+    write was uncommitted saw rows that other connections don't, or that
+    no longer exist.
+
+    Only the writes of this process are seen, caches relying on this need a
+    timeout to pick up those of other processes.
+
+    :param tables: the tables to watch
+    :param callback: called without arguments
+    """
+    tables = frozenset(tables)
+    info_key = ('on_table_write', callback)
+
+    @event.listens_for(Engine, 'after_execute')
+    def after_execute(conn, clauseelement, *args):
+        if (isinstance(clauseelement, UpdateBase)
+                and clauseelement.table in tables):
+            conn.info[info_key] = True
+            callback()
+
+    @event.listens_for(Engine, 'commit')
+    def commit(conn):
+        if conn.info.pop(info_key, False):
+            callback()
+
+    @event.listens_for(Engine, 'rollback')
+    def rollback(conn):
+        if conn.info.pop(info_key, False):
+            callback()
+
+
 def execute_script(path, engine):
     with open(path, 'r') as f:
         for command in split_commands(f):
@@ -132,3 +293,66 @@ class ScopedSession:
 
             self.session.close()
 
+
+class DeferredCommit:
+    """
+    Group the saves and deletes made by `ResourceMixin` into one transaction.
+
+    While active, `ResourceMixin.save` and `ResourceMixin.delete` do not
+    commit; the session is flushed every `batch_size` pending rows and
+    committed once on exit, or rolled back if an exception was raised.
+    Nested blocks on the same session join the outermost one.
+
+        with DeferredCommit(batch_size=1000):
+            for row in rows:
+                Spell(**row).save()
+
+    :param session: the session to defer commits on, `db.session` by default
+    :param batch_size: the number of pending rows per flush
+    """
+
+    info_key = 'deferred_commit'
+
+    def __init__(self, session=None, batch_size: int=DEFAULT_BATCH_SIZE):
+        self.session = session
+        self.batch_size = batch_size
+        self.unflushed = 0
+        self._outermost = False
+
+    @classmethod
+    def active(cls, session) -> Optional['DeferredCommit']:
+        """
+        Return the deferred commit active on a session, if any
+
+        :param session: the session
+        :return: the active DeferredCommit or None
+        """
+        return session.info.get(cls.info_key)
+
+    def pending(self, count: int) -> None:
+        """
+        Record rows waiting to be flushed, flushing when a batch is full
+
+        :param count: the number of rows added, changed or deleted
+        """
+        self.unflushed += count
+        if self.unflushed >= self.batch_size:
+            self.session.flush()
+            self.unflushed = 0
+
+    def __enter__(self):
+        if self.session is None:
+            self.session = db.session
+        if self.active(self.session) is None:
+            self.session.info[self.info_key] = self
+            self._outermost = True
+        return self.session
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if not self._outermost:
+            return
+        del self.session.info[self.info_key]
+        if exc_type is None:
+            self.session.commit()
+        else:
+            self.session.rollback()
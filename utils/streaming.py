@@ -0,0 +1,56 @@
+import json
+from typing import Callable, Iterable, Iterator, Optional
+
+from flask import Response, stream_with_context
+
+CHUNK_SIZE = 200
+
+
+def iter_json(items: Iterable, serialize: Callable[[object], object],
+              head: Optional[dict]=None, key: str='results',
+              chunk_size: int=CHUNK_SIZE) -> Iterator[str]:
+    """
+    Encode a JSON object holding a list of items piece by piece, so only
+    `chunk_size` items are held in memory at once.
+
+    :param items: the items, e.g. a query using `yield_per`
+    :param serialize: turns an item into something `json.dumps` can encode
+    :param head: other keys of the object, written before the list
+    :param key: the key of the list
+    :param chunk_size: the number of items encoded per piece
+    :return: the pieces of the JSON document
+    """
+    encode = json.JSONEncoder(separators=(',', ':')).encode
+    head = {k: v for k, v in (head or {}).items() if k != key}
+    opening = encode(dict(head, **{key: []}))
+    # The object is written up to and including the list's opening bracket
+    yield opening[:-2]
+
+    chunk = []
+    separator = ''
+    for item in items:
+        chunk.append(encode(serialize(item)))
+        if len(chunk) >= chunk_size:
+            yield separator + ','.join(chunk)
+            separator = ','
+            chunk = []
+    if chunk:
+        yield separator + ','.join(chunk)
+    yield ']}'
+
+
+def stream_json(items: Iterable, serialize: Callable[[object], object],
+                head: Optional[dict]=None, key: str='results',
+                chunk_size: int=CHUNK_SIZE) -> Response:
+    """
+    Respond with a JSON object holding a list of items, encoded while it is
+    sent. The request context stays available while streaming, so `items`
+    can be a query on the request's session.
+
+    The arguments are the same as those of `iter_json`.
+
+    :return: the response
+    """
+    return Response(stream_with_context(
+        iter_json(items, serialize, head, key, chunk_size)),
+        mimetype='application/json')
@@ -1,58 +1,37 @@
 from typing import Optional
 
-from celery import Celery, Task
 from flask import Flask
 
+from config import configure_logging, load_config
+
 from world_manager.extensions import (db,
                                       debug_toolbar,
                                       jsglue,
                                       mail,
                                       csrf,
-                                      login_manager)
+                                      login_manager,
+                                      password_hasher,
+                                      sql_profiler)
 
 from world_manager.blueprints.page.views import page
 from world_manager.blueprints.contact.views import contact
 from world_manager.blueprints.user.views import user
 from world_manager.blueprints.char.views import char
+from world_manager.blueprints.api.views import api
 
 from utils.jinja import current_year, ability_modifier, saving_throw_modifier, \
     skill_modifier, ability_score, format_other_bonuses, armor_score, \
     sum_other_bonuses
+from world_manager.model import load_models
+from world_manager.model.account import login_activity
+from world_manager.model.reference import reference_data
+from world_manager.rules.derived import derived_stats
+from world_manager.rules.expression import damage_preview
 
-ACTIVE_EXTENSIONS = [db, debug_toolbar, jsglue, mail, csrf, login_manager]
-ACTIVE_BLUEPRINTS = [page, contact, user, char]
-CELERY_TASK_LIST = ['world_manager.blueprints.contact.tasks']
-
-
-def create_celery_app(app: Optional[Flask]=None) -> Celery:
-    """
-    Create a new Celery app and tie the app's config together with celery's.
-    Wrap all tasks in the context of the application.
-
-    :param app: The flask app
-    :return: celery app
-    """
-
-    app = app or create_app()
-
-    class ContextTask(Task):
-
-        def __call__(self, *args, **kwargs):
-            with app.app_context():
-                return super().__call__(*args, **kwargs)
-
-        def run(self, *args, **kwargs):
-            """The body of the task executed by workers."""
-            raise NotImplementedError('Tasks must define the run method.')
-
-    celery = Celery(app.import_name, broker=app.config['CELERY_BROKER_URL'],
-                    include=CELERY_TASK_LIST)
-
-    celery.conf.update(app.config)
-    # noinspection PyPropertyAccess
-    celery.Task = ContextTask
-
-    return celery
+ACTIVE_EXTENSIONS = [db, sql_profiler, debug_toolbar, jsglue, mail, csrf,
+                     login_manager, password_hasher, login_activity,
+                     reference_data]
+ACTIVE_BLUEPRINTS = [page, contact, user, char, api]
 
 
 def create_app(settings_override: Optional[dict]=None) -> Flask:
@@ -65,15 +44,12 @@ def create_app(settings_override: Optional[dict]=None) -> Flask:
 
     app = Flask(__name__, instance_relative_config=True)
 
-    app.config.from_object('config.settings')
-    app.config.from_pyfile('settings.py', silent=True)
-
-    if settings_override:
-        app.config.update(settings_override)
+    load_config(app, settings_override)
     configure_logging(app)
 
     initialize_extensions(app)
     db.app = app
+    initialize_authentication()
     register_blueprints(app)
     initialize_jinja2(app)
 
@@ -92,6 +68,17 @@ def initialize_extensions(app: Flask) -> None:
         extension.init_app(app)
 
 
+def initialize_authentication() -> None:
+    """
+    Tell Flask-Login how to load the signed in user
+    """
+    from world_manager.model.account import User
+
+    @login_manager.user_loader
+    def load_user(user_id: str) -> Optional[User]:
+        return User.get_cached(int(user_id))
+
+
 def register_blueprints(app: Flask) -> None:
     """
     Register blueprints
@@ -102,17 +89,6 @@ def register_blueprints(app: Flask) -> None:
         app.register_blueprint(blueprint)
 
 
-def configure_logging(app: Flask) -> None:
-    pass
-
-
-# noinspection PyUnresolvedReferences
-def load_models():
-    # Ensure that all database models get loaded properly
-    import world_manager.model.account
-    import world_manager.model.stat
-
-
 def initialize_jinja2(app: Flask) -> None:
     app.jinja_env.globals.update(current_year=current_year,
                                  ability_modifier=ability_modifier,
@@ -121,4 +97,6 @@ def initialize_jinja2(app: Flask) -> None:
                                  ability_score=ability_score,
                                  format_other_bonuses=format_other_bonuses,
                                  armor_score=armor_score,
-                                 sum_other_bonuses=sum_other_bonuses)
+                                 sum_other_bonuses=sum_other_bonuses,
+                                 derived_stats=derived_stats,
+                                 damage_preview=damage_preview)
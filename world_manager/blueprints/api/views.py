@@ -0,0 +1,140 @@
+from flask import abort, jsonify, request
+from flask.blueprints import Blueprint
+
+from utils.pagination import KeysetPage, keyset_paginate
+from utils.streaming import stream_json
+from world_manager.model import stat, world
+from world_manager.model.facets import FACETS, facet_search
+from world_manager.model.search import SEARCH_INDEXES
+
+api = Blueprint('api', __name__, url_prefix='/api')
+
+MAX_PER_PAGE = 100
+EXPORT_BATCH_SIZE = 500
+TRUE_VALUES = ('1', 'true', 'yes')
+EXPORT_MODELS = {
+    'spells': stat.Spell,
+    'features': stat.Feature,
+    'items': stat.Item,
+}
+# The model and sort keys of each list, every one covered by an index
+LISTS = {
+    'items': (stat.Item, (stat.Item.value, stat.Item.id)),
+    'features': (stat.Feature, (stat.Feature.name, stat.Feature.id)),
+    'stat-blocks': (stat.StatBlock, (stat.StatBlock.name, stat.StatBlock.id)),
+    'events': (world.Event, (world.Event.start_date, world.Event.id)),
+}
+
+
+def _page_args():
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1),
+                   MAX_PER_PAGE)
+    return page, per_page
+
+
+def _cursor_args():
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1),
+                   MAX_PER_PAGE)
+    return per_page, request.args.get('after'), request.args.get('before')
+
+
+def _paginate(paginate, *args) -> KeysetPage:
+    try:
+        return paginate(*args, *_cursor_args())
+    except ValueError:
+        # A malformed cursor, one of another list, or both after and before
+        abort(400)
+
+
+@api.route('/<kind>/search')
+def search(kind: str):
+    """
+    Ranked full-text search over spells, features or items.
+
+    Query string arguments: ``q`` the words to search for, ``page`` and
+    ``per_page``.
+    """
+    index = SEARCH_INDEXES.get(kind)
+    if index is None:
+        abort(404)
+
+    page, per_page = _page_args()
+    results = index.search(request.args.get('q', ''), page, per_page)
+
+    return jsonify({
+        'page': results.page,
+        'per_page': results.per_page,
+        'pages': results.pages,
+        'total': results.total,
+        'results': [dict(item.to_json(), rank=rank)
+                    for item, rank in zip(results.items, results.ranks)],
+    })
+
+
+@api.route('/spells')
+def spells():
+    """
+    Browse spells by facets, with the number of matches for each facet value.
+
+    Each facet (``level``, ``school``, ``ritual``, ``creature_class`` and
+    ``damage_type``) may be given several times in the query string, in which
+    case spells with any of the values match. Spells are ordered by level and
+    name, and paged with the ``next`` or ``previous`` cursor of the results
+    given as ``after`` or ``before``.
+    """
+    filters = {}
+    for name in FACETS:
+        if name == 'ritual':
+            values = [v.lower() in TRUE_VALUES
+                      for v in request.args.getlist(name)]
+        else:
+            values = request.args.getlist(name, type=int)
+        if values:
+            filters[name] = values
+
+    results = _paginate(facet_search, filters)
+
+    return jsonify({
+        **results.page.as_dict(),
+        'total': results.total,
+        'facets': {name: {str(value).lower(): count
+                          for value, count in counts.items()}
+                   for name, counts in results.counts.items()},
+        'results': [spell.to_json() for spell in results.items],
+    })
+
+
+@api.route('/<kind>')
+def listing(kind: str):
+    """
+    Page through items by value, features or stat blocks by name, or events
+    chronologically.
+
+    Query string arguments: ``per_page``, and ``after`` or ``before`` set to
+    the ``next`` or ``previous`` cursor of another page of the same list.
+    """
+    model, keys = LISTS.get(kind, (None, None))
+    if model is None:
+        abort(404)
+
+    page = _paginate(keyset_paginate, model.query, keys)
+
+    return jsonify({
+        **page.as_dict(),
+        'results': [item.to_json() for item in page.items],
+    })
+
+
+@api.route('/<kind>/export')
+def export(kind: str):
+    """
+    Every spell, feature or item, streamed as it is read from the database.
+    """
+    model = EXPORT_MODELS.get(kind)
+    if model is None:
+        abort(404)
+
+    query = model.query.order_by(model.id).yield_per(EXPORT_BATCH_SIZE)
+    return stream_json(query, model.to_json,
+                       head={'kind': kind})
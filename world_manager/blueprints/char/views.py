@@ -1,11 +1,130 @@
+import datetime
+import hashlib
+import os
+from typing import Callable
+
+import pytz
+from flask import abort, current_app, jsonify, request, session
 from flask.blueprints import Blueprint
 from flask.templating import render_template
 
+from utils.cache import CacheBackend, create_cache
+from world_manager.extensions import db
+from world_manager.model.account import User
+from world_manager.model.reference import reference_data
+from world_manager.model.stat import Background, CreatureClass, Race, \
+    StatBlock
+from world_manager.rules.derived import REFERENCE_MODELS, get_derived_stats
+
+# The reference tables whose rows appear on a sheet, besides its own rows
+SHEET_REFERENCE_MODELS = REFERENCE_MODELS + (CreatureClass,)
+
 char = Blueprint('char', __name__,
                  template_folder='templates',
                  url_prefix='/char')
 
 
+@char.record_once
+def initialize_sheet_cache(state) -> None:
+    state.app.extensions['sheet_cache'] = create_cache(state.app.config,
+                                                       'SHEET_CACHE_')
+
+
+def sheet_cache() -> CacheBackend:
+    return current_app.extensions['sheet_cache']
+
+
 @char.route('/flinty')
 def flinty():
-    return render_template('char/flinty.html')
+    template = os.path.join(char.root_path, char.template_folder,
+                            'char', 'flinty.html')
+    modified = datetime.datetime.fromtimestamp(os.path.getmtime(template),
+                                               pytz.utc)
+    return _cached_page(f'flinty:{modified.timestamp()}', modified,
+                        lambda: render_template('char/flinty.html'))
+
+
+@char.route('/<int:stat_block_id>')
+def sheet(stat_block_id: int):
+    # A sheet changes with its stat block and with the names of its race,
+    # background and player, so it is keyed on all of their versions
+    versions = (db.session.query(StatBlock.db_updated_on,
+                                 Race.db_updated_on,
+                                 Background.db_updated_on,
+                                 User.db_updated_on)
+                .select_from(StatBlock)
+                .outerjoin(StatBlock.race)
+                .outerjoin(StatBlock.background)
+                .outerjoin(StatBlock.user)
+                .filter(StatBlock.id == stat_block_id)
+                .first())
+    if versions is None:
+        abort(404)
+    key = ':'.join(str(_utc(v).timestamp()) if v else '-' for v in versions)
+    key += ':' + ':'.join(str(v) for v in reference_data.version(
+        *SHEET_REFERENCE_MODELS))
+
+    def render() -> str:
+        stat_blocks = StatBlock.load_sheet(stat_block_id)
+        if not stat_blocks:
+            abort(404)
+        return render_template('char/sheet.html', stat_block=stat_blocks[0])
+
+    return _cached_page(f'sheet:{stat_block_id}:{key}',
+                        max(_utc(v) for v in versions if v), render)
+
+
+@char.route('/<int:stat_block_id>/stats')
+def stats(stat_block_id: int):
+    derived = get_derived_stats(stat_block_id)
+    if derived is None:
+        abort(404)
+    return jsonify(derived.as_dict())
+
+
+def _cached_page(key: str, last_modified: datetime.datetime,
+                 render: Callable[[], str]):
+    """
+    Serve a page from the sheet cache, with a strong ETag derived from the
+    key and a Last-Modified header, and answer conditional requests for an
+    unchanged page with 304 without rendering it.
+
+    :param key: identifies the page and its version
+    :param last_modified: when the page last changed
+    :param render: renders the page when it is not cached
+    """
+    key = f"char:{current_app.config.get('SHEET_CACHE_VERSION', 1)}:{key}"
+    etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    last_modified = _utc(last_modified).replace(microsecond=0)
+
+    if _not_modified(etag, last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        # Flashed messages belong to one visitor, so pages showing them are
+        # neither read from nor written to the cache
+        shared = '_flashes' not in session
+        body = sheet_cache().get(key) if shared else None
+        if body is None:
+            body = render().encode('utf-8')
+            if shared:
+                sheet_cache().set(key, body)
+        response = current_app.response_class(body, mimetype='text/html')
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
+def _not_modified(etag: str, last_modified: datetime.datetime) -> bool:
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since:
+        return last_modified <= _utc(request.if_modified_since)
+    return False
+
+
+def _utc(value: datetime.datetime) -> datetime.datetime:
+    if value.tzinfo is None:
+        return pytz.utc.localize(value)
+    return value.astimezone(pytz.utc)
@@ -1,7 +1,13 @@
-from utils.flask_mailplus import send_template_message
-from world_manager.app import create_celery_app
+from typing import Iterable, Sequence
 
-celery = create_celery_app()
+from celery.utils.log import get_task_logger
+from flask import current_app
+from flask_mail import Message
+
+from utils.flask_mailplus import render_template_message, send_messages
+from world_manager.worker import celery
+
+logger = get_task_logger(__name__)
 
 
 @celery.task()
@@ -12,12 +18,38 @@ def deliver_contact_email(email, message):
     :param email:
     :param message:
     :return:
+    :raises: the error of ``smtplib`` if the server refused the e-mail
+    """
+    failures = send_messages([_contact_message(email, message)])
+    if failures:
+        _, error = failures[0]
+        raise error
+
+
+@celery.task()
+def deliver_contact_emails(contacts: Iterable[Sequence[str]]) -> int:
+    """
+    Send a batch of contact e-mails over one pooled SMTP connection
+
+    :param contacts: ``(email, message)`` pairs
+    :return: the number of e-mails the server accepted
     """
+    messages = [_contact_message(email, message)
+                for email, message in contacts]
+    failures = send_messages(messages)
+    for message, error in failures:
+        logger.error('Contact e-mail from %s was refused: %r',
+                     message.sender, error)
+    return len(messages) - len(failures)
+
+
+def _contact_message(email, message) -> Message:
     context = {'email': email, 'message': message}
 
-    send_template_message(subject='[World Manager] Contact',
-                          sender=email,
-                          recipients=[celery.conf.get('MAIL_USERNAME')],
-                          reply_to=email,
-                          template='contact/mail/index',
-                          context=context)
+    return render_template_message(subject='[World Manager] Contact',
+                                   sender=email,
+                                   recipients=[current_app.config.get(
+                                       'MAIL_USERNAME')],
+                                   reply_to=email,
+                                   template='contact/mail/index',
+                                   context=context)
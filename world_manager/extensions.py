@@ -2,13 +2,17 @@ from flask_debugtoolbar import DebugToolbarExtension
 from flask_login.login_manager import LoginManager
 from flask_mail import Mail
 from flask_jsontools import JsonSerializableBase
-from flask_sqlalchemy import SQLAlchemy, Model
+from flask_sqlalchemy import Model
 from flask_jsglue import JSGlue
 from flask_wtf import CSRFProtect
 
-from sqlalchemy import inspect
+from sqlalchemy import event, inspect
 from sqlalchemy.ext.declarative import declared_attr, DeclarativeMeta
 
+from utils.engine import SQLAlchemy
+from utils.passwords import PasswordHasher
+from utils.profiler import SQLProfiler
+from utils.serializer import ModelSerializer
 from utils.string import to_snake_case
 
 
@@ -35,13 +39,29 @@ class ModelBase(Model, JsonSerializableBase):
             setattr(self, attr_name, attr_value)
 
     def __repr__(self: DeclarativeMeta):
-        column_names = (c.name for c in self.__mapper__.columns)
-        kwargs = ', '.join(f'{n}={getattr(self, n)!r}' for n in column_names)
-        return f'{self.__class__.__name__}({kwargs})'
+        return self.__serializer__.repr(self)
 
     def as_dict(self: DeclarativeMeta):
-        column_names = (c.name for c in self.__mapper__.columns)
-        return {n: getattr(self, n) for n in column_names}
+        return self.__serializer__.as_dict(self)
+
+    def to_json(self: DeclarativeMeta, include=(), exclude=()):
+        """
+        Return the columns of this model, and the given relationships, as
+        JSON friendly values
+        :param include: the names of relationships to add
+        :param exclude: the names of columns and relationships to leave out
+        :return: the serialized model
+        """
+        return self.__serializer__.to_json(self, include, exclude)
+
+    def __json__(self: DeclarativeMeta, excluded_keys=frozenset()):
+        # Like `JsonSerializableBase`, only relationships that are already
+        # loaded are included, along with those in `_json_include`
+        loaded = self.__dict__
+        include = [k for k in self.__serializer__.relationships
+                   if k in loaded or k in self._json_include]
+        return self.__serializer__.to_json(
+            self, include, set(self._json_exclude) | set(excluded_keys))
 
     @property
     def session(self):
@@ -49,9 +69,20 @@ class ModelBase(Model, JsonSerializableBase):
         return instance_state.session or db.session
 
 
+@event.listens_for(ModelBase, 'mapper_configured', propagate=True)
+def compile_serializer(mapper, cls) -> None:
+    """
+    Build the serializer of each model once its mapper is configured, so
+    `as_dict`, `to_json` and `__repr__` do not inspect the mapper per call.
+    """
+    cls.__serializer__ = ModelSerializer(mapper)
+
+
 db = SQLAlchemy(model_class=ModelBase)
 debug_toolbar = DebugToolbarExtension()
 jsglue = JSGlue()
 mail = Mail()
 csrf = CSRFProtect()
 login_manager = LoginManager()
+password_hasher = PasswordHasher()
+sql_profiler = SQLProfiler()
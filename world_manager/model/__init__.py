@@ -0,0 +1,9 @@
+# noinspection PyUnresolvedReferences
+def load_models():
+    # Ensure that all database models get loaded properly
+    import world_manager.model.account
+    import world_manager.model.stat
+    import world_manager.model.world
+    import world_manager.model.search
+    import world_manager.model.facets
+    import world_manager.model.reference
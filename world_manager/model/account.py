@@ -1,13 +1,38 @@
+import atexit
+import datetime
 import enum
-from typing import Optional
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque, namedtuple
+from functools import lru_cache
+from itertools import chain
+from typing import Deque, Dict, Iterable, List, Optional
 
-from flask import current_app
+from flask import Flask, current_app, g, has_app_context
+from flask_login import UserMixin
 from itsdangerous import TimedJSONWebSignatureSerializer
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import case, event, func, literal
+from sqlalchemy.orm import Session, make_transient_to_detached, validates
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.types import TypeDecorator
 
-from utils.sql import AwareDateTime, tz_aware_now, ResourceMixin
+from utils.cache import CacheBackend, create_cache
+from utils.sql import AwareDateTime, BigIntegerId, tz_aware_now, \
+    ResourceMixin
 
-from world_manager.extensions import db
+from world_manager.extensions import db, password_hasher
+
+TOKEN_EXPIRATION = 3600
+# Never put in a cache shared with other processes
+UNCACHED_USER_COLUMNS = ('password',)
+
+LOGIN_FLUSH_INTERVAL = 1.0
+LOGIN_BATCH_SIZE = 500
+LOGIN_MAX_PENDING = 10000
+LOGIN_MAX_BUFFERED = 100000
 
 
 class UserRole(enum.Enum):
@@ -15,9 +40,9 @@ class UserRole(enum.Enum):
     member = 2
 
 
-class User(ResourceMixin, db.Model):
+class User(UserMixin, ResourceMixin, db.Model):
 
-    id = db.Column(db.BigInteger,
+    id = db.Column(BigIntegerId,
                    primary_key=True)
 
     # Authentication
@@ -47,22 +72,74 @@ class User(ResourceMixin, db.Model):
     last_login_time = db.Column(AwareDateTime())
     last_login_ip_address = db.Column(db.String(45))
 
+    # Identities are looked up case-insensitively, one index each
+    __table_args__ = (
+        db.Index('ix_user_username_lower', func.lower(username),
+                 unique=True),
+        db.Index('ix_user_email_address_lower', func.lower(email_address),
+                 unique=True),
+    )
+
     def __init__(self, **kwargs):
-        super.__init__(**kwargs)
+        super().__init__(**kwargs)
         self.password = User.encrypt_password(kwargs.get('password', ''))
 
+    @validates('username')
+    def validate_username(self, key: str, username: str) -> str:
+        # Identities with an @ are e-mail addresses
+        if '@' in username:
+            raise ValueError('A username can not contain @')
+        return username
+
     @staticmethod
-    def find_by_identity(identity: str) -> 'User':
+    def find_by_identity(identity: str) -> Optional['User']:
         """
-        Find a user by their e-mail or username.
+        Find a user by their e-mail or username, ignoring case.
+
+        Only e-mail addresses contain an @, so only one of the two is looked
+        up, with a single probe of its index.
 
         :param identity: Email or username
         :type identity: str
         :return: User instance
         """
+        if not identity:
+            return None
+        column = User.email_address if '@' in identity else User.username
         return User.query.filter(
-            (User.email_address == identity)
-            | (User.username == identity)).first()
+            func.lower(column) == identity.strip().lower()).first()
+
+    @staticmethod
+    def get_cached(user_id: int) -> Optional['User']:
+        """
+        Get a user by id, as signed in users are loaded on every request.
+
+        A user is loaded at most once per request, and is remembered across
+        requests for ``USER_CACHE_TIMEOUT`` seconds, until the user is
+        changed through the ORM or logs in. The cache holds the column values
+        as JSON, without the password hash, which is loaded when needed.
+
+        :param user_id: The user's id
+        :type user_id: int
+        :return: User instance or None
+        """
+        users = g.setdefault('_users', {})
+        if user_id in users:
+            return users[user_id]
+
+        cache = _user_cache()
+        key = str(user_id)
+        cached = cache.get(key)
+        if cached is not None:
+            # Attach a copy of the cached user without querying for it
+            user = db.session.merge(_load_user(cached), load=False)
+        else:
+            user = User.query.get(user_id)
+            if user is not None:
+                cache.set(key, _dump_user(user))
+
+        users[user_id] = user
+        return user
 
     @staticmethod
     def encrypt_password(plaintext_password: str) -> Optional[str]:
@@ -78,49 +155,368 @@ class User(ResourceMixin, db.Model):
         :return: str
         """
         if plaintext_password:
-            return generate_password_hash(plaintext_password)
+            return password_hasher.hash(plaintext_password)
         return None
 
+    def serialize_token(self, expiration: int=TOKEN_EXPIRATION) -> str:
+        """
+        Sign a token identifying the user.
+
+        :param expiration: Seconds until the token expires
+        :type expiration: int
+        :return: Signed token
+        """
+        serializer = _token_serializer(current_app.config['SECRET_KEY'],
+                                       expiration)
+        return serializer.dumps(
+            {'user_email': self.email_address}).decode('utf-8')
+
     @staticmethod
     def deserialize_token(token: str) -> Optional['User']:
         """
         Obtain a user from de-serializing a signed token.
 
+        Verified tokens are remembered for ``TOKEN_CACHE_TIMEOUT`` seconds,
+        unless they expire sooner, so a token presented again in that time
+        is neither verified nor looked up by e-mail again.
+
         :param token: Signed token.
         :type token: str
         :return: User instance or None
         """
-        private_key = TimedJSONWebSignatureSerializer(
-            current_app.config['SECRET_KEY'])
-        try:
-            decoded_payload = private_key.loads(token)
+        cache = _token_cache()
+        key = hashlib.sha1(token.encode('utf-8')).hexdigest()
+        user_id = cache.get(key)
+        if user_id is not None:
+            return User.query.get(int(user_id))
 
-            return User.find_by_identity(decoded_payload.get('user_email'))
+        private_key = _token_serializer(current_app.config['SECRET_KEY'])
+        try:
+            decoded_payload, header = private_key.loads(token,
+                                                        return_header=True)
         except Exception:
             return None
 
+        user = User.find_by_identity(decoded_payload.get('user_email'))
+        if user is not None and \
+                header.get('exp', 0) - time.time() >= (cache.timeout or 0):
+            cache.set(key, str(user.id).encode('utf-8'))
+        return user
+
     def authenticate(self, password: str='') -> bool:
         """
         Ensure a user is authenticated, and optionally check their password.
 
+        A password hashed with an older work factor is hashed again with the
+        current one and saved right away, since logins are written apart
+        from the user, see `register_login`.
+
         :param password: Optionally verify this as their password
         """
         if password:
-            return check_password_hash(self.password, password)
+            if not password_hasher.verify(self.password, password):
+                return False
+            if password_hasher.needs_rehash(self.password):
+                self.password = password_hasher.hash(password)
+                self.save()
 
         return True
 
     def register_login(self, ip_address):
-        self.sign_in_count += 1
+        """
+        Count a login and remember when and where it came from.
+
+        The login is buffered and written in a later batch with other
+        logins, see `LoginActivityBuffer`, so this instance isn't updated.
+
+        :param ip_address: The address the user logged in from
+        """
+        login_activity.record(self.id, ip_address)
+
+        return self
+
+
+Login = namedtuple('Login', 'user_id ip_address time recorded')
+
+
+class LoginActivityBuffer:
+    """
+    Collects logins in memory and writes them to the user table in batches,
+    so logging in doesn't wait for a write on the user's row.
+
+    A background thread flushes the buffer every
+    ``LOGIN_ACTIVITY_FLUSH_INTERVAL`` seconds, and the login request itself
+    does once ``LOGIN_ACTIVITY_MAX_PENDING`` logins are waiting. Each batch
+    of up to ``LOGIN_ACTIVITY_BATCH_SIZE`` logins is written by a single
+    set-based UPDATE of every user in the batch.
+
+    A batch is only dropped from the buffer once it is committed, and is
+    put back to be retried otherwise, so every buffered login is written at
+    least once: a batch whose commit failed after reaching the database can
+    be counted twice. Logins still buffered are flushed when the process
+    exits, but not if it is killed. While the database can't be written to,
+    at most ``LOGIN_ACTIVITY_MAX_BUFFERED`` logins are kept, the oldest
+    being dropped, and counted, past that.
+    """
+
+    def __init__(self):
+        self.flush_interval: Optional[float] = LOGIN_FLUSH_INTERVAL
+        self.batch_size = LOGIN_BATCH_SIZE
+        self.max_pending = LOGIN_MAX_PENDING
+        self.max_buffered = LOGIN_MAX_BUFFERED
+        self.flushed = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+        self.last_flush_time: Optional[float] = None
+        self.last_flush_lag: Optional[float] = None
+        self._pending: Deque[Login] = deque()
+        self._app: Optional[Flask] = None
+        self._thread: Optional[threading.Thread] = None
+        self._reset_locks()
+        atexit.register(self._flush_at_exit)
+        if hasattr(os, 'register_at_fork'):
+            # The thread doesn't survive a fork, nor should the logins the
+            # parent will write
+            os.register_at_fork(after_in_child=self._forget)
+
+    def init_app(self, app: Flask) -> None:
+        config = app.config
+        self.flush_interval = config.get('LOGIN_ACTIVITY_FLUSH_INTERVAL',
+                                         LOGIN_FLUSH_INTERVAL)
+        self.batch_size = config.get('LOGIN_ACTIVITY_BATCH_SIZE',
+                                     LOGIN_BATCH_SIZE)
+        self.max_pending = config.get('LOGIN_ACTIVITY_MAX_PENDING',
+                                      LOGIN_MAX_PENDING)
+        self.max_buffered = config.get('LOGIN_ACTIVITY_MAX_BUFFERED',
+                                       LOGIN_MAX_BUFFERED)
+        app.extensions['login_activity'] = self
+
+    def record(self, user_id: int, ip_address: Optional[str]) -> None:
+        """
+        Buffer a login happening now.
+
+        :param user_id: The id of the user
+        :param ip_address: The address the user logged in from
+        """
+        login = Login(user_id, ip_address, tz_aware_now(), time.monotonic())
+        app = current_app._get_current_object()
+        with self._lock:
+            # Remembered to flush at exit
+            self._app = app
+            self._pending.append(login)
+            self._drop_overflow()
+            full = len(self._pending) >= self.max_pending
+        if full:
+            try:
+                self.flush()
+            except Exception:
+                # The logins stay buffered, the login itself must not fail
+                app.logger.exception('Could not write login activity')
+        elif self.flush_interval:
+            self._start(app)
+
+    def flush(self) -> int:
+        """
+        Write every buffered login, a batch at a time.
+
+        :return: The number of logins written
+        """
+        flushed = 0
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    count = min(self.batch_size, len(self._pending))
+                    batch = [self._pending.popleft() for _ in range(count)]
+                if not batch:
+                    return flushed
+                try:
+                    _write_logins(batch)
+                except Exception:
+                    with self._lock:
+                        self._pending.extendleft(reversed(batch))
+                        self._drop_overflow()
+                        self.failed_flushes += 1
+                    raise
+                flushed += len(batch)
+                with self._lock:
+                    self.flushed += len(batch)
+                    self.last_flush_time = time.time()
+                    self.last_flush_lag = time.monotonic() - batch[0].recorded
+
+    def stats(self) -> Dict[str, Optional[float]]:
+        """
+        How far behind the writes are.
+
+        :return: ``pending`` logins and the age of the oldest one in
+                 ``oldest_pending_seconds``, the number of logins ``flushed``
+                 and ``dropped`` and of ``failed_flushes``, when the last
+                 batch was written as a timestamp and how long its oldest
+                 login waited
+        """
+        with self._lock:
+            oldest = self._pending[0].recorded if self._pending else None
+            return {
+                'pending': len(self._pending),
+                'oldest_pending_seconds': (time.monotonic() - oldest
+                                           if oldest is not None else None),
+                'flushed': self.flushed,
+                'dropped': self.dropped,
+                'failed_flushes': self.failed_flushes,
+                'last_flush_time': self.last_flush_time,
+                'last_flush_lag_seconds': self.last_flush_lag,
+            }
+
+    def _drop_overflow(self) -> None:
+        # Called holding the lock
+        while len(self._pending) > self.max_buffered:
+            self._pending.popleft()
+            self.dropped += 1
+
+    def _start(self, app: Flask) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, args=(app,),
+                                            name='login-activity',
+                                            daemon=True)
+            self._thread.start()
+
+    def _run(self, app: Flask) -> None:
+        while self.flush_interval:
+            time.sleep(self.flush_interval)
+            with app.app_context():
+                try:
+                    self.flush()
+                except Exception:
+                    app.logger.exception('Could not write login activity')
+
+    def _flush_at_exit(self) -> None:
+        if self._pending and self._app is not None:
+            with self._app.app_context():
+                self.flush()
+
+    def _reset_locks(self) -> None:
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+
+    def _forget(self) -> None:
+        self._reset_locks()
+        self._pending.clear()
+        self._thread = None
+
+
+login_activity = LoginActivityBuffer()
+
+
+def _write_logins(batch: List[Login]) -> None:
+    # The login count and the last two logins of each user in the batch
+    users: 'OrderedDict[int, list]' = OrderedDict()
+    for login in batch:
+        user = users.setdefault(login.user_id, [0, None, None])
+        user[0] += 1
+        user[1], user[2] = user[2], login
+
+    # One UPDATE for the whole batch, each column a CASE on the user id
+    user_table = User.__table__
+    columns = user_table.c
+    counts, times, ip_addresses = {}, {}, {}
+    previous_times, previous_ip_addresses = {}, {}
+    for user_id, (count, previous, latest) in users.items():
+        counts[user_id] = literal(count, db.Integer())
+        times[user_id] = literal(latest.time, AwareDateTime())
+        ip_addresses[user_id] = literal(latest.ip_address, db.String())
+        if previous is not None:
+            previous_times[user_id] = literal(previous.time, AwareDateTime())
+            previous_ip_addresses[user_id] = literal(previous.ip_address,
+                                                     db.String())
+
+    def by_user(values: dict, else_=None):
+        if not values:
+            return else_
+        return case(values, value=columns.id, else_=else_)
+
+    # SET sees the row as it was, so one login moves the current one to last
+    statement = user_table.update().where(
+        columns.id.in_(list(users))).values(
+        login_count=columns.login_count + by_user(counts),
+        last_login_time=by_user(previous_times,
+                                columns.current_login_time),
+        last_login_ip_address=by_user(previous_ip_addresses,
+                                      columns.current_login_ip_address),
+        current_login_time=by_user(times),
+        current_login_ip_address=by_user(ip_addresses))
+
+    with db.engine.begin() as connection:
+        connection.execute(statement)
+    _forget_users(users)
+
+
+@lru_cache(maxsize=16)
+def _token_serializer(secret_key: str, expiration: int=TOKEN_EXPIRATION
+                      ) -> TimedJSONWebSignatureSerializer:
+    return TimedJSONWebSignatureSerializer(secret_key, expiration)
+
+
+def _token_cache() -> CacheBackend:
+    extensions = current_app.extensions
+    if 'token_cache' not in extensions:
+        extensions['token_cache'] = create_cache(current_app.config,
+                                                 'TOKEN_CACHE_')
+    return extensions['token_cache']
+
+
+def _user_cache() -> CacheBackend:
+    extensions = current_app.extensions
+    if 'user_cache' not in extensions:
+        extensions['user_cache'] = create_cache(current_app.config,
+                                                'USER_CACHE_')
+    return extensions['user_cache']
+
+
+def _dump_user(user: User) -> bytes:
+    return json.dumps(user.to_json(exclude=UNCACHED_USER_COLUMNS)).encode(
+        'utf-8')
+
 
-        self.last_login_ip_address = self.current_login_ip_address
-        self.last_login_time = self.current_login_time
+def _load_user(cached: bytes) -> User:
+    user = User.__mapper__.class_manager.new_instance()
+    columns = User.__table__.c
+    for key, value in json.loads(cached).items():
+        if value is not None:
+            column_type = columns[key].type
+            while isinstance(column_type, TypeDecorator):
+                column_type = column_type.impl
+            python_type = column_type.python_type
+            if python_type is datetime.datetime:
+                value = datetime.datetime.fromisoformat(value)
+            elif issubclass(python_type, enum.Enum):
+                value = python_type[value]
+        set_committed_value(user, key, value)
+    # The columns left out are loaded when first used
+    make_transient_to_detached(user)
+    return user
 
-        self.current_login_ip_address = ip_address
-        self.current_login_time = tz_aware_now()
 
-        return self.save()
+def _forget_users(user_ids: Iterable[int]) -> None:
+    if has_app_context():
+        cache = _user_cache()
+        for user_id in user_ids:
+            cache.delete(str(user_id))
 
 
+@event.listens_for(Session, 'after_flush')
+def _forget_flushed_users(session: Session, flush_context) -> None:
+    # Forgotten again once the transaction ends, in case the user was cached
+    # meanwhile with values that are now committed or rolled back
+    user_ids = {instance.id for instance in chain(session.dirty,
+                                                  session.deleted)
+                if isinstance(instance, User)}
+    if user_ids:
+        session.info.setdefault('flushed_user_ids', set()).update(user_ids)
+        _forget_users(user_ids)
 
 
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _forget_committed_users(session: Session) -> None:
+    _forget_users(session.info.pop('flushed_user_ids', ()))
@@ -0,0 +1,183 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from utils.pagination import KeysetPage, keyset_paginate
+from utils.sql import on_table_write
+from world_manager.extensions import db
+from world_manager.model import stat
+
+CACHE_SIZE = 512
+CACHE_TIMEOUT = 60
+SPELL_ORDER = (stat.Spell.level, stat.Spell.name, stat.Spell.id)
+
+
+class Facet:
+    """
+    A property spells can be filtered and counted by.
+
+    :param name: the name of the facet in filters and results
+    :param column: the column holding the value of the facet. For facets
+           stored in an association table this is the association table's
+           column, which is joined to the spell through `spell_id`
+    """
+
+    def __init__(self, name: str, column):
+        self.name = name
+        self.column = column
+        self.table = column.table
+        self.is_mapped = self.table is not stat.Spell.__table__
+
+    def condition(self, values: Tuple):
+        if not self.is_mapped:
+            return self.column.in_(values)
+        # A semi-join keeps one row per spell however many values match
+        return stat.Spell.id.in_(
+            select([self.table.c.spell_id]).where(self.column.in_(values)))
+
+    def count_query(self, conditions: List):
+        query = db.session.query(self.column, func.count())
+        if self.is_mapped:
+            query = query.join(stat.Spell,
+                               stat.Spell.id == self.table.c.spell_id)
+        return query.filter(*conditions).group_by(self.column)
+
+
+FACETS = OrderedDict((f.name, f) for f in (
+    Facet('level', stat.Spell.level),
+    Facet('school', stat.Spell.school_id),
+    Facet('ritual', stat.Spell.ritual),
+    Facet('creature_class',
+          stat.creature_class_spell_map.c.creature_class_id),
+    Facet('damage_type', stat.damage_type_spell_map.c.damage_type_id),
+))
+
+
+class FacetResult:
+
+    def __init__(self, page: KeysetPage, total: int,
+                 counts: Dict[str, Dict]):
+        self.page = page
+        self.items: List[stat.Spell] = page.items
+        self.total = total
+        self.counts = counts
+
+
+class FacetCountCache:
+    """
+    A bounded cache of facet counts keyed by filters.
+
+    The whole cache is dropped whenever this process writes to a spell, or
+    to a table the facets count, whether through the ORM or through Core
+    statements. Counts are also dropped after `timeout` seconds, so the
+    writes of other processes are seen.
+    """
+
+    def __init__(self, size: int=CACHE_SIZE, timeout: float=CACHE_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._counts: 'OrderedDict[tuple, Tuple[Dict[str, Dict], float]]' = \
+            OrderedDict()
+        self._generation = 0
+        self._lock = Lock()
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: tuple) -> Optional[Dict[str, Dict]]:
+        with self._lock:
+            entry = self._counts.get(key)
+            if entry is not None and time.monotonic() - entry[1] >= \
+                    self.timeout:
+                del self._counts[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._counts.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: tuple, counts: Dict[str, Dict],
+            generation: int) -> None:
+        with self._lock:
+            # Counts computed before an invalidation may already be stale
+            if generation != self._generation:
+                return
+            self._counts[key] = (counts, time.monotonic())
+            while len(self._counts) > self.size:
+                self._counts.popitem(last=False)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._counts.clear()
+
+
+facet_counts = FacetCountCache()
+
+on_table_write([stat.Spell.__table__] + [f.table for f in FACETS.values()],
+               facet_counts.invalidate)
+
+
+def normalize_filters(filters: Mapping[str, Iterable]) -> tuple:
+    """
+    Turn a mapping of facet name to accepted values into a hashable,
+    order-independent key. Facets without values are dropped.
+
+    :param filters: facet name to accepted values
+    :return: the normalized filters
+    """
+    normalized = []
+    for name, values in filters.items():
+        if name not in FACETS:
+            raise ValueError(f'Unknown facet: {name}')
+        values = tuple(sorted(set(values)))
+        if values:
+            normalized.append((name, values))
+    return tuple(sorted(normalized))
+
+
+def facet_search(filters: Mapping[str, Iterable], per_page: int=20,
+                 after: Optional[str]=None,
+                 before: Optional[str]=None) -> FacetResult:
+    """
+    Find the spells matching every facet filter and count the matches for
+    each value of each facet.
+
+    A spell matches a facet when it has any of the facet's accepted values.
+    The counts of a facet are computed with every filter except the facet's
+    own, so they show how many spells selecting that value would add. This
+    takes one query for the page, one for the total and one per facet, and
+    the facet counts are cached.
+
+    :param filters: facet name to accepted values
+    :param per_page: the number of spells per page
+    :param after: the cursor of the page before the wanted one
+    :param before: the cursor of the page after the wanted one
+    :return: the page of spells, the total and the counts
+    """
+    key = normalize_filters(filters)
+    conditions = {name: FACETS[name].condition(values)
+                  for name, values in key}
+
+    query = stat.Spell.query.filter(*conditions.values())
+    page = keyset_paginate(query, SPELL_ORDER, per_page, after, before)
+    total = query.count()
+
+    counts = facet_counts.get(key)
+    if counts is None:
+        generation = facet_counts.generation
+        counts = {}
+        for name, facet in FACETS.items():
+            others = [c for n, c in conditions.items() if n != name]
+            counts[name] = dict(facet.count_query(others).all())
+        facet_counts.set(key, counts, generation)
+
+    return FacetResult(page, total, counts)
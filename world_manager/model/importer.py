@@ -0,0 +1,397 @@
+import csv
+import enum
+import json
+import os
+import re
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from utils.sql import save_all, update_all
+from world_manager.model import stat
+
+DEFAULT_BATCH_SIZE = 500
+LIST_SEPARATORS = re.compile(r'\s*[;,]\s*')
+ITEM_FIELDS = ('name', 'description', 'weight', 'value')
+
+
+class Collection:
+    """
+    A list valued field of a row which is stored as child rows of another
+    table, e.g. the classes that can cast a spell.
+
+    :param table: the table holding the child rows
+    :param parent_column: the column of `table` referencing the parent row
+    :param column: the column of `table` that holds each value
+    :param model: when given, values are names of this model and are
+           resolved to its ids
+    :param key: the column of `model` the values are matched against
+    """
+
+    def __init__(self, table, parent_column: str, column: str, model=None,
+                 key: str='name'):
+        self.table = table
+        self.parent_column = parent_column
+        self.column = column
+        self.model = model
+        self.key = key
+
+
+class ReferenceSpec:
+    """
+    Describes how rows of one kind of reference data map onto a model.
+
+    :param model: the model the rows are stored as
+    :param key: the natural key used to find rows that already exist
+    :param references: maps a row field to ``(column, model, key)``, and
+           replaces the field's value with the id of the matching row
+    :param collections: maps a row field to a `Collection`
+    :param item: whether the model extends `Item`, in which case the item
+           fields of each row are stored in the item table
+    """
+
+    def __init__(self, model, key: str='name',
+                 references: Optional[Dict[str, tuple]]=None,
+                 collections: Optional[Dict[str, Collection]]=None,
+                 item: bool=False):
+        self.model = model
+        self.key = key
+        self.references = references or {}
+        self.collections = collections or {}
+        self.item = item
+
+
+# Ordered so that every kind only references kinds that come before it
+REFERENCE_SPECS = OrderedDict([
+    ('schools_of_magic', ReferenceSpec(stat.SchoolOfMagic)),
+    ('damage_types', ReferenceSpec(stat.DamageType)),
+    ('abilities', ReferenceSpec(stat.Ability)),
+    ('skills', ReferenceSpec(stat.Skill, references={
+        'default_ability': ('default_ability_id', stat.Ability,
+                            'abbreviation')})),
+    ('conditions', ReferenceSpec(stat.Condition)),
+    ('languages', ReferenceSpec(stat.Language)),
+    ('speed_types', ReferenceSpec(stat.SpeedType)),
+    ('weapon_properties', ReferenceSpec(stat.WeaponProperty)),
+    ('creature_types', ReferenceSpec(stat.CreatureType)),
+    ('creature_classes', ReferenceSpec(stat.CreatureClass)),
+    ('races', ReferenceSpec(stat.Race, references={
+        'creature_type': ('creature_type_id', stat.CreatureType, 'name')})),
+    ('backgrounds', ReferenceSpec(stat.Background)),
+    ('items', ReferenceSpec(stat.Item)),
+    ('coin_types', ReferenceSpec(stat.CoinType, item=True)),
+    ('armor', ReferenceSpec(stat.Armor, item=True)),
+    ('shields', ReferenceSpec(stat.Shield, item=True)),
+    ('weapons', ReferenceSpec(stat.Weapon, item=True, collections={
+        'properties': Collection(stat.weapon_weapon_property_map,
+                                 'weapon_id', 'weapon_property_id',
+                                 stat.WeaponProperty)})),
+    ('attacks', ReferenceSpec(stat.Attack, references={
+        'ability': ('ability_id', stat.Ability, 'abbreviation')})),
+    ('features', ReferenceSpec(stat.Feature)),
+    ('spells', ReferenceSpec(stat.Spell, key='unique_name', references={
+        'school': ('school_id', stat.SchoolOfMagic, 'name')}, collections={
+        'classes': Collection(stat.creature_class_spell_map, 'spell_id',
+                              'creature_class_id', stat.CreatureClass),
+        'damage_types': Collection(stat.damage_type_spell_map, 'spell_id',
+                                   'damage_type_id', stat.DamageType),
+        'components': Collection(stat.SpellComponent.__table__, 'spell_id',
+                                 'type')})),
+])
+
+
+class ImportResult:
+
+    def __init__(self, kind: str, rows: int, seconds: float):
+        self.kind = kind
+        self.rows = rows
+        self.seconds = seconds
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else float('inf')
+
+    def __str__(self):
+        return (f'{self.kind}: {self.rows} rows in {self.seconds:.3f}s '
+                f'({self.rows_per_second:,.0f} rows/s)')
+
+
+class BulkImporter:
+    """
+    Loads reference data into the `stat` tables with batched multi-row
+    statements.
+
+    Rows are matched against existing rows by their natural key, so new rows
+    are inserted and existing rows are updated, which makes an import safe to
+    run again. Existing rows whose values are unchanged are not written, so
+    running an import again leaves them, and their `db_updated_on`, alone.
+    Foreign keys are resolved from in-memory maps of natural key to id that
+    are loaded once per table. Rows are written with
+    `utils.sql.save_all` and `utils.sql.update_all`, which commit
+    unless the import runs inside a `DeferredCommit`, so run it inside one to
+    import in a single transaction.
+
+    :param session: the session to import with
+    :param batch_size: the number of rows sent per statement
+    """
+
+    def __init__(self, session, batch_size: int=DEFAULT_BATCH_SIZE):
+        self.session = session
+        self.batch_size = batch_size
+        self._key_maps: Dict[Tuple[type, str], Dict[object, int]] = {}
+
+    def load(self, kind: str, rows: Iterable[dict]) -> ImportResult:
+        """
+        Import rows of one kind of reference data.
+
+        :param kind: one of the keys of `REFERENCE_SPECS`
+        :param rows: the rows, as dicts of field name to value
+        :return: the number of rows and time it took
+        :raises ValueError: if a row has no key, e.g. no name, or cannot be
+                stored
+        """
+        try:
+            spec = REFERENCE_SPECS[kind]
+        except KeyError:
+            raise ValueError(f'Unknown kind of reference data: {kind}')
+
+        start = time.perf_counter()
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                count += self._load_batch(kind, spec, batch, count + 1)
+                batch = []
+        if batch:
+            count += self._load_batch(kind, spec, batch, count + 1)
+
+        return ImportResult(kind, count, time.perf_counter() - start)
+
+    def load_file(self, path: str) -> ImportResult:
+        """
+        Import a JSON, JSON lines or CSV file. The kind of reference data is
+        taken from the file name, e.g. ``spells.csv``.
+
+        :param path: the file path
+        :return: the number of rows and time it took
+        """
+        return self.load(file_kind(path), read_rows(path))
+
+    def _load_batch(self, kind: str, spec: ReferenceSpec, rows: List[dict],
+                    first_row: int) -> int:
+        table = spec.model.__table__
+        # Spells are keyed by their unique name, which defaults to the name
+        key_field = 'name' if spec.item or spec.key == 'unique_name' \
+            else spec.key
+        records = OrderedDict()
+        collections = {}
+        item_records = OrderedDict()
+        for number, row in enumerate(rows, first_row):
+            row = dict(row)
+            if spec.key == 'unique_name':
+                row.setdefault('unique_name', row.get('name'))
+            for field, (column, model, key) in spec.references.items():
+                if field in row:
+                    row[column] = self._resolve(model, key, row.pop(field))
+            values = {field: _split(row.pop(field))
+                      for field in spec.collections if field in row}
+            item_row = {f: row.pop(f) for f in ITEM_FIELDS
+                        if spec.item and f in row}
+            record = _coerce(table, row)
+            item_record = _coerce(stat.Item.__table__, item_row)
+            key = item_record.get('name') if spec.item \
+                else record.get(spec.key)
+            if key is None or key == '':
+                raise ValueError(f'Row {number} of {kind} has no {key_field}')
+            if spec.item:
+                item_records[key] = item_record
+            records[key] = record
+            collections[key] = values
+
+        if spec.item:
+            # Rows of item subtypes share their id with an item, so the item
+            # rows are written first and the subtype rows are keyed by id
+            self._upsert(stat.Item, 'name', list(item_records.values()))
+            item_ids = self._key_map(stat.Item, 'name')
+            for key, record in records.items():
+                record['id'] = item_ids[key]
+            self._upsert(spec.model, 'id', list(records.values()))
+            ids = item_ids
+        else:
+            self._upsert(spec.model, spec.key, list(records.values()))
+            ids = self._key_map(spec.model, spec.key)
+
+        for field, collection in spec.collections.items():
+            self._replace_collection(collection, {
+                ids[key]: values[field]
+                for key, values in collections.items() if field in values})
+
+        return len(rows)
+
+    def _upsert(self, model, key: str, records: List[dict]) -> None:
+        if not records:
+            return
+        ids = self._key_map(model, key)
+        new = [r for r in records if r[key] not in ids]
+        existing = [dict(r, id=ids[r[key]]) for r in records
+                    if r[key] in ids]
+
+        if new:
+            save_all(model, new, self.batch_size, self.session)
+            self._refresh_key_map(model, key, [r[key] for r in new])
+
+        existing = self._changed(model, existing)
+        if existing:
+            update_all(model, existing, self.batch_size, self.session)
+
+    def _changed(self, model, records: List[dict]) -> List[dict]:
+        """ Return the records that differ from the rows stored by id. """
+        if not records:
+            return []
+        table = model.__table__
+        fields = list(OrderedDict.fromkeys(f for r in records for f in r))
+        stored = {}
+        for start in range(0, len(records), self.batch_size):
+            ids = [r['id'] for r in records[start:start + self.batch_size]]
+            result = self.session.execute(
+                select([table.c[f] for f in fields])
+                .where(table.c.id.in_(ids)))
+            for row in result:
+                values = dict(zip(fields, row))
+                stored[values['id']] = values
+        return [r for r in records
+                if any(not _same(stored[r['id']][f], value)
+                       for f, value in r.items())]
+
+    def _replace_collection(self, collection: Collection,
+                            values: Dict[int, List]) -> None:
+        if not values:
+            return
+        table = collection.table
+        parent_column = table.c[collection.parent_column]
+        self.session.execute(table.delete().where(
+            parent_column.in_(list(values))))
+
+        records = []
+        for parent_id, parent_values in values.items():
+            for value in OrderedDict.fromkeys(parent_values):
+                if collection.model is not None:
+                    value = self._resolve(collection.model, collection.key,
+                                          value)
+                records.append({collection.parent_column: parent_id,
+                                collection.column: value})
+        if records:
+            self.session.execute(table.insert(), records)
+
+    def _resolve(self, model, key: str, value) -> Optional[int]:
+        if value is None or value == '':
+            return None
+        try:
+            return self._key_map(model, key)[value]
+        except KeyError:
+            raise ValueError(f'No {model.__name__} with {key} {value!r}')
+
+    def _key_map(self, model, key: str) -> Dict[object, int]:
+        key_map = self._key_maps.get((model, key))
+        if key_map is None:
+            table = model.__table__
+            result = self.session.execute(select([table.c[key], table.c.id]))
+            key_map = self._key_maps[(model, key)] = dict(result.fetchall())
+        return key_map
+
+    def _refresh_key_map(self, model, key: str, keys: List) -> None:
+        table = model.__table__
+        result = self.session.execute(
+            select([table.c[key], table.c.id]).where(table.c[key].in_(keys)))
+        self._key_map(model, key).update(result.fetchall())
+
+
+def file_kind(path: str) -> str:
+    """
+    Return the kind of reference data a file holds, based on its name.
+
+    :param path: the file path
+    :return: the kind
+    """
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def read_rows(path: str) -> Iterator[dict]:
+    """
+    Stream rows from a CSV, JSON lines or JSON file. A JSON file must hold a
+    list of objects.
+
+    :param path: the file path
+    :return: an iterator of rows
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline='') as f:
+        if extension == '.csv':
+            yield from csv.DictReader(f)
+        elif extension == '.jsonl':
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        elif extension == '.json':
+            yield from json.load(f)
+        else:
+            raise ValueError(f'Cannot import {path}, expected a .csv, '
+                             f'.jsonl or .json file')
+
+
+def sort_files(paths: Iterable[str]) -> List[str]:
+    """
+    Order files so that reference data is imported before the rows that
+    reference it.
+
+    :param paths: file paths
+    :return: the sorted file paths
+    """
+    order = {kind: i for i, kind in enumerate(REFERENCE_SPECS)}
+    return sorted(paths, key=lambda p: order.get(file_kind(p), len(order)))
+
+
+def _split(value) -> List:
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [v for v in LIST_SEPARATORS.split(value.strip()) if v]
+    return list(value)
+
+
+def _same(stored, value) -> bool:
+    # Enum columns load members but rows may name them, e.g. 'HeavyArmor'
+    if isinstance(stored, enum.Enum) and isinstance(value, str):
+        return stored.name == value
+    return stored == value
+
+
+def _coerce(table, row: dict) -> dict:
+    """
+    Convert the string values read from CSV files to the python type of the
+    column they will be stored in.
+    """
+    record = {}
+    for field, value in row.items():
+        if field not in table.c:
+            raise ValueError(f'{table.name} has no column {field}')
+        if isinstance(value, str):
+            python_type = _python_type(table.c[field])
+            if value == '' and python_type is not str:
+                value = None
+            elif python_type is bool:
+                value = value.strip().lower() in ('1', 'true', 'yes', 'y')
+            elif python_type in (int, float):
+                value = python_type(value)
+        record[field] = value
+    return record
+
+
+def _python_type(column) -> Optional[type]:
+    try:
+        return column.type.python_type
+    except NotImplementedError:
+        return None
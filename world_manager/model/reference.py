@@ -0,0 +1,187 @@
+import time
+from collections import namedtuple
+from itertools import count
+from threading import Lock
+from typing import Dict, Iterator, Optional, Tuple
+
+from flask import Flask
+from sqlalchemy import select
+
+from utils.sql import on_table_write
+from world_manager.extensions import db
+from world_manager.model import stat
+
+# Columns every resource has that lookups have no use for
+SKIPPED_COLUMNS = ('db_created_on', 'db_updated_on')
+TIMEOUT = 300
+
+_versions = count(1)
+
+
+class ReferenceTable:
+    """
+    An immutable snapshot of one reference table, indexed by id, name and
+    abbreviation.
+
+    Rows are namedtuples, so they can be shared between threads and requests
+    and never lazy load anything.
+
+    :param model: the model the rows were read from
+    :param columns: the columns that were read
+    :param rows: the rows, in the order of `columns`
+    """
+
+    def __init__(self, model, columns, rows):
+        self.model = model
+        self.loaded_at = time.monotonic()
+        # Unique to each read of a table
+        self.version = next(_versions)
+        self.record = namedtuple(model.__name__ + 'Record',
+                                 [c.name for c in columns])
+        records = sorted((self.record(*row) for row in rows),
+                         key=lambda r: (getattr(r, 'name', None) or '', r.id))
+        self._records = tuple(records)
+        self._by_id = {r.id: r for r in records}
+        self._by_name = {r.name: r for r in records
+                         if getattr(r, 'name', None) is not None}
+        self._by_abbreviation = {
+            r.abbreviation: r for r in records
+            if getattr(r, 'abbreviation', None) is not None}
+
+    def __iter__(self) -> Iterator[tuple]:
+        return iter(self._records)
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get(self, id: int) -> Optional[tuple]:
+        return self._by_id.get(id)
+
+    def by_name(self, name: str) -> Optional[tuple]:
+        return self._by_name.get(name)
+
+    def by_abbreviation(self, abbreviation: str) -> Optional[tuple]:
+        return self._by_abbreviation.get(abbreviation)
+
+
+class ReferenceData:
+    """
+    A process-local cache of the small tables the rules look things up in,
+    such as abilities and skills.
+
+    Each table is read with a single query the first time it is used and is
+    dropped whenever this process writes to it, through the ORM or Core, so
+    the next lookup reads it again. Writes of other processes, e.g. other
+    web workers, are only seen once the table is older than
+    ``REFERENCE_DATA_TIMEOUT`` seconds.
+
+    :param models: the models to cache
+    :param timeout: the most seconds a table is kept, None to keep it until
+           it is written to
+    """
+
+    def __init__(self, models=(), timeout: Optional[float]=TIMEOUT):
+        self.models = tuple(models)
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self._tables: Dict[type, ReferenceTable] = {}
+        self._generation = 0
+        self._lock = Lock()
+        for model in self.models:
+            tables = [model.__table__]
+            if model is stat.CoinType:
+                tables.append(stat.Item.__table__)
+            on_table_write(tables, self._invalidator(model))
+
+    def init_app(self, app: Flask) -> None:
+        self.timeout = app.config.get('REFERENCE_DATA_TIMEOUT', TIMEOUT)
+        app.extensions['reference_data'] = self
+
+    def table(self, model) -> ReferenceTable:
+        """
+        Return the cached rows of a reference table, reading them if needed.
+
+        :param model: one of the cached models
+        :return: the table
+        """
+        table = self._tables.get(model)
+        if table is not None and (
+                self.timeout is None
+                or time.monotonic() - table.loaded_at < self.timeout):
+            self.hits += 1
+            return table
+
+        if model not in self.models:
+            raise ValueError(f'{model.__name__} is not reference data')
+        self.misses += 1
+        generation = self._generation
+        table = self._load(model)
+        with self._lock:
+            # A table read while it was being written to may already be stale
+            if generation == self._generation:
+                self._tables[model] = table
+        return table
+
+    def version(self, *models) -> Tuple[int, ...]:
+        """
+        Identify what is cached of some tables, e.g. to key values computed
+        from them. It changes whenever one of the tables is read again.
+
+        :param models: the cached models
+        :return: the versions of their tables
+        """
+        return tuple(self.table(model).version for model in models)
+
+    def get(self, model, id: int) -> Optional[tuple]:
+        return self.table(model).get(id)
+
+    def by_name(self, model, name: str) -> Optional[tuple]:
+        return self.table(model).by_name(name)
+
+    def by_abbreviation(self, model, abbreviation: str) -> Optional[tuple]:
+        return self.table(model).by_abbreviation(abbreviation)
+
+    def invalidate(self, model=None) -> None:
+        """
+        Drop one cached table, or every table when no model is given.
+
+        :param model: the model whose table to drop
+        """
+        with self._lock:
+            self._generation += 1
+            if model is None:
+                self._tables.clear()
+            else:
+                self._tables.pop(model, None)
+
+    def _invalidator(self, model):
+        return lambda: self.invalidate(model)
+
+    @staticmethod
+    def _load(model) -> ReferenceTable:
+        table = model.__table__
+        columns = [c for c in table.c if c.name not in SKIPPED_COLUMNS]
+        query = select(columns)
+        if model is stat.CoinType:
+            # Coins are items, and their name lives on the item
+            item = stat.Item.__table__
+            columns += [item.c.name, item.c.value]
+            query = select(columns).select_from(
+                table.join(item, item.c.id == table.c.id))
+        return ReferenceTable(model, columns,
+                              db.session.execute(query).fetchall())
+
+
+reference_data = ReferenceData((
+    stat.Ability,
+    stat.Skill,
+    stat.CreatureClass,
+    stat.DamageType,
+    stat.SchoolOfMagic,
+    stat.CoinType,
+    stat.Condition,
+    stat.Language,
+    stat.SpeedType,
+    stat.WeaponProperty,
+))
@@ -0,0 +1,222 @@
+import re
+from typing import List, Sequence, Tuple
+
+from sqlalchemy import DDL, event, func, literal_column, or_, text
+from sqlalchemy.dialects import postgresql
+
+from world_manager.extensions import db
+from world_manager.model import stat
+
+TERM_PATTERN = re.compile(r'\w+', re.UNICODE)
+POSTGRESQL_WEIGHTS = 'ABCD'
+
+
+class SearchPage:
+
+    def __init__(self, items: list, ranks: List[float], total: int,
+                 page: int, per_page: int):
+        self.items = items
+        self.ranks = ranks
+        self.total = total
+        self.page = page
+        self.per_page = per_page
+
+    @property
+    def pages(self) -> int:
+        return -(-self.total // self.per_page)
+
+
+class SearchIndex:
+    """
+    A ranked full-text index over text columns of a model.
+
+    On SQLite the index is an FTS5 table that uses the model's table as its
+    external content and is kept in sync with triggers. On PostgreSQL it is a
+    GIN index over a weighted tsvector expression, which PostgreSQL keeps in
+    sync itself. Other databases fall back to unranked ``LIKE`` matching.
+
+    The index is created along with the model's table by ``create_all``.
+    Tables that already exist get it from `create`, i.e. ``db index``, and
+    until then searches find nothing on SQLite.
+
+    :param model: the model to index
+    :param columns: the names of the indexed columns, most important first
+    :param weights: the weight of each column when ranking SQLite results
+    :param language: the PostgreSQL text search configuration
+    """
+
+    def __init__(self, model, columns: Sequence[str],
+                 weights: Sequence[float]=None, language: str='english'):
+        self.model = model
+        self.table = model.__table__
+        self.columns = tuple(columns)
+        self.weights = tuple(weights or (1.0,) * len(self.columns))
+        self.language = language
+        self.name = f'{self.table.name}_fts'
+        self._register_ddl()
+
+    def _register_ddl(self) -> None:
+        table = self.table.name
+        columns = ', '.join(self.columns)
+        new = ', '.join(f'new.{c}' for c in self.columns)
+        old = ', '.join(f'old.{c}' for c in self.columns)
+        insert = (f"INSERT INTO {self.name}(rowid, {columns}) "
+                  f"VALUES (new.id, {new});")
+        delete = (f"INSERT INTO {self.name}({self.name}, rowid, {columns}) "
+                  f"VALUES ('delete', old.id, {old});")
+        sqlite = (
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.name} USING fts5("
+            f"{columns}, content='{table}', content_rowid='id')",
+            f"CREATE TRIGGER IF NOT EXISTS {self.name}_ai AFTER INSERT ON "
+            f"{table} BEGIN {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {self.name}_ad AFTER DELETE ON "
+            f"{table} BEGIN {delete} END",
+            f"CREATE TRIGGER IF NOT EXISTS {self.name}_au AFTER UPDATE ON "
+            f"{table} BEGIN {delete} {insert} END",
+        )
+        document = self.document().compile(
+            dialect=postgresql.dialect(),
+            compile_kwargs={'literal_binds': True})
+        on_postgresql = (
+            f'CREATE INDEX IF NOT EXISTS ix_{self.name} ON {table} '
+            f'USING gin (({document}))',
+        )
+        self._ddl = {'sqlite': sqlite, 'postgresql': on_postgresql}
+
+        for dialect, statements in self._ddl.items():
+            for statement in statements:
+                event.listen(self.table, 'after_create',
+                             DDL(statement).execute_if(dialect=dialect))
+        event.listen(self.table, 'before_drop',
+                     DDL(f'DROP TABLE IF EXISTS {self.name}')
+                     .execute_if(dialect='sqlite'))
+
+    def create(self, connection) -> None:
+        """
+        Create the index of a table that already exists, unless it exists
+        too, and index every row.
+
+        :param connection: the connection to create it with
+        """
+        for statement in self._ddl.get(connection.dialect.name, ()):
+            connection.execute(DDL(statement))
+        self.rebuild(connection)
+
+    def document(self):
+        """
+        The weighted tsvector expression indexed on PostgreSQL. Queries must
+        use the same expression for the index to be used.
+        """
+        language = literal_column(f"'{self.language}'")
+        vectors = [
+            func.setweight(
+                func.to_tsvector(language,
+                                 func.coalesce(self.table.c[c],
+                                               literal_column("''"))),
+                literal_column(f"'{POSTGRESQL_WEIGHTS[min(i, 3)]}'"))
+            for i, c in enumerate(self.columns)]
+        document = vectors[0]
+        for vector in vectors[1:]:
+            document = document.op('||')(vector)
+        return document
+
+    def rebuild(self, connection=None) -> None:
+        """
+        Re-index every row, e.g. after the index was added to an existing
+        SQLite database. Indexes on PostgreSQL are always complete.
+
+        :param connection: a connection or session, `db.session` by default
+        """
+        connection = connection or db.session
+        # Sessions are bound to the app's engine
+        dialect = getattr(connection, 'dialect', db.engine.dialect)
+        if dialect.name == 'sqlite':
+            connection.execute(text(
+                f"INSERT INTO {self.name}({self.name}) VALUES ('rebuild')"))
+
+    def search(self, query: str, page: int=1,
+               per_page: int=20) -> SearchPage:
+        """
+        Return one page of the rows matching every word of a query, best
+        matches first.
+
+        :param query: the words to search for
+        :param page: the page number, starting at 1
+        :param per_page: the number of rows per page
+        :return: the page of results
+        """
+        terms = TERM_PATTERN.findall(query or '')
+        if not terms:
+            return SearchPage([], [], 0, page, per_page)
+
+        offset = (max(page, 1) - 1) * per_page
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite':
+            ranked, total = self._search_sqlite(terms, per_page, offset)
+        elif dialect == 'postgresql':
+            ranked, total = self._search_postgresql(terms, per_page, offset)
+        else:
+            ranked, total = self._search_like(terms, per_page, offset)
+
+        ids = [row_id for row_id, _ in ranked]
+        rows = {row.id: row
+                for row in self.model.query.filter(self.model.id.in_(ids))}
+        items = [rows[row_id] for row_id in ids if row_id in rows]
+        ranks = [rank for row_id, rank in ranked if row_id in rows]
+        return SearchPage(items, ranks, total, page, per_page)
+
+    def _search_sqlite(self, terms: List[str], limit: int,
+                       offset: int) -> Tuple[List[tuple], int]:
+        match = ' '.join('"{}"*'.format(t.replace('"', '')) for t in terms)
+        weights = ', '.join(str(float(w)) for w in self.weights)
+        ranked = db.session.execute(text(
+            f'SELECT rowid, bm25({self.name}, {weights}) AS rank '
+            f'FROM {self.name} WHERE {self.name} MATCH :match '
+            f'ORDER BY rank LIMIT :limit OFFSET :offset'),
+            {'match': match, 'limit': limit, 'offset': offset}).fetchall()
+        total = db.session.execute(text(
+            f'SELECT count(*) FROM {self.name} WHERE {self.name} MATCH :match'),
+            {'match': match}).scalar()
+        return [(row_id, -rank) for row_id, rank in ranked], total
+
+    def _search_postgresql(self, terms: List[str], limit: int,
+                           offset: int) -> Tuple[List[tuple], int]:
+        language = literal_column(f"'{self.language}'")
+        ts_query = func.to_tsquery(language,
+                                   ' & '.join(f'{t}:*' for t in terms))
+        document = self.document()
+        matches = document.op('@@')(ts_query)
+        rank = func.ts_rank(document, ts_query).label('rank')
+        ranked = (db.session.query(self.table.c.id, rank)
+                  .filter(matches)
+                  .order_by(rank.desc(), self.table.c.id)
+                  .limit(limit)
+                  .offset(offset)
+                  .all())
+        total = (db.session.query(func.count(self.table.c.id))
+                 .filter(matches)
+                 .scalar())
+        return [(row_id, float(r)) for row_id, r in ranked], total
+
+    def _search_like(self, terms: List[str], limit: int,
+                     offset: int) -> Tuple[List[tuple], int]:
+        conditions = [or_(*(self.table.c[c].ilike(f'%{t}%')
+                            for c in self.columns))
+                      for t in terms]
+        query = db.session.query(self.table.c.id).filter(*conditions)
+        ranked = (query.order_by(self.table.c.id)
+                  .limit(limit)
+                  .offset(offset)
+                  .all())
+        return [(row_id, 0.0) for row_id, in ranked], query.count()
+
+
+SEARCH_INDEXES = {
+    'spells': SearchIndex(stat.Spell,
+                          ('name', 'description', 'higher_levels'),
+                          weights=(10.0, 1.0, 0.5)),
+    'features': SearchIndex(stat.Feature, ('name', 'description'),
+                            weights=(10.0, 1.0)),
+    'items': SearchIndex(stat.Item, ('name', 'description'),
+                         weights=(10.0, 1.0)),
+}
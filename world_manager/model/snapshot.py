@@ -0,0 +1,193 @@
+from collections import namedtuple
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from sqlalchemy import func, select
+
+from utils.sql import DEFAULT_BATCH_SIZE
+from world_manager.extensions import db
+from world_manager.model import stat
+from world_manager.model.reference import reference_data
+from world_manager.rules.derived import ability_modifier, \
+    proficiency_bonus_for_level
+
+SNAPSHOT_FIELDS = (
+    'id', 'name', 'version', 'race_id', 'background_id', 'experience_points',
+    'level', 'proficiency_bonus', 'hit_point_max', 'current_hit_points',
+    'temporary_hit_points', 'classes', 'ability_ids', 'ability_scores',
+    'save_proficiencies', 'speeds', 'skill_proficiencies',
+)
+
+
+class StatBlockSnapshot(namedtuple('StatBlockSnapshot', SNAPSHOT_FIELDS)):
+    """
+    An immutable copy of the numbers on a stat block, without any ORM state.
+
+    A snapshot is a tuple, so it takes a fraction of the memory of a
+    `StatBlock` and its related rows and can be hashed, pickled and shared
+    between threads. Related rows are stored as tuples of ids and values:
+
+    - ``classes``: ``(creature_class_id, level)`` pairs
+    - ``ability_ids``, ``ability_scores``, ``save_proficiencies``: one entry
+      per ability score, ordered by ability id
+    - ``speeds``: ``(speed_type_id, value)`` pairs
+    - ``skill_proficiencies``: ``(skill_id, multiplier)`` pairs
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_stat_block(cls,
+                        stat_block: stat.StatBlock) -> 'StatBlockSnapshot':
+        """
+        Snapshot a loaded stat block, ideally loaded with
+        `StatBlock.load_sheet`.
+
+        :param stat_block: the stat block
+        :return: the snapshot
+        """
+        scores = sorted(
+            (s.ability_id, s.base_value,
+             s.saving_throw_proficiency.proficiency_multiplier
+             if s.saving_throw_proficiency else 0)
+            for s in stat_block.ability_scores)
+        return _snapshot(
+            (stat_block.id, stat_block.name, stat_block.db_updated_on,
+             stat_block.race_id, stat_block.background_id,
+             stat_block.experience_points, stat_block.proficiency_bonus,
+             stat_block.base_hit_point_max, stat_block.current_hit_points,
+             stat_block.temporary_hit_points),
+            sorted((c.creature_class_id, c.level) for c in stat_block.classes),
+            scores,
+            sorted((s.speed_type_id, s.base_value)
+                   for s in stat_block.speed_scores),
+            sorted((p.skill_id, p.proficiency_multiplier)
+                   for p in stat_block.skill_proficiencies))
+
+    def score(self, abbreviation: str) -> Optional[int]:
+        ability = reference_data.by_abbreviation(stat.Ability, abbreviation)
+        if ability is None or ability.id not in self.ability_ids:
+            return None
+        return self.ability_scores[self.ability_ids.index(ability.id)]
+
+    def modifier(self, abbreviation: str) -> int:
+        score = self.score(abbreviation)
+        return ability_modifier(score) if score is not None else 0
+
+    def speed(self, name: str) -> Optional[int]:
+        speed_type = reference_data.by_name(stat.SpeedType, name)
+        if speed_type is None:
+            return None
+        return dict(self.speeds).get(speed_type.id)
+
+
+def load_snapshots(ids: Optional[Iterable[int]]=None,
+                   batch_size: int=DEFAULT_BATCH_SIZE
+                   ) -> List[StatBlockSnapshot]:
+    """
+    Build snapshots straight from SQL rows, without creating any ORM
+    instances.
+
+    Each batch of stat blocks takes five queries, one for the stat blocks and
+    one per kind of related row. Without ids, every stat block is loaded a
+    batch at a time, each batch's ids taking one more query.
+
+    :param ids: the stat block ids, or None for every stat block
+    :param batch_size: the number of stat blocks loaded per batch
+    :return: the snapshots, in the order their ids were given, or ordered by
+             id when no ids were given
+    """
+    if ids is None:
+        return [snapshot for batch in _batches_of_ids(batch_size)
+                for snapshot in _load_batch(batch)]
+
+    ids = list(ids)
+    snapshots = {}
+    for start in range(0, len(ids), batch_size):
+        for snapshot in _load_batch(ids[start:start + batch_size]):
+            snapshots[snapshot.id] = snapshot
+    return [snapshots[i] for i in ids if i in snapshots]
+
+
+def _batches_of_ids(batch_size: int) -> Iterator[List[int]]:
+    # Keyset on id, so each batch is a range scan of the primary key
+    column = stat.StatBlock.__table__.c.id
+    last_id = None
+    while True:
+        query = select(column).order_by(column).limit(batch_size)
+        if last_id is not None:
+            query = query.where(column > last_id)
+        batch = db.session.execute(query).scalars().all()
+        if not batch:
+            return
+        yield batch
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1]
+
+
+def _load_batch(ids: List[int]) -> List[StatBlockSnapshot]:
+    stat_block = stat.StatBlock.__table__
+    stat_block_class = stat.StatBlockClass.__table__
+    ability_score = stat.AbilityScore.__table__
+    save = stat.SavingThrowProficiency.__table__
+    speed_score = stat.SpeedScore.__table__
+    skill_proficiency = stat.SkillProficiency.__table__
+
+    def rows(columns, select_from=None):
+        query = select(columns)
+        if select_from is not None:
+            query = query.select_from(select_from)
+        query = query.where(columns[0].in_(ids))
+        return db.session.execute(query.order_by(*columns[:2]))
+
+    classes = _group(rows([stat_block_class.c.stat_block_id,
+                           stat_block_class.c.creature_class_id,
+                           stat_block_class.c.level]))
+    scores = _group(rows(
+        [ability_score.c.stat_block_id, ability_score.c.ability_id,
+         ability_score.c.base_value,
+         func.coalesce(save.c.proficiency_multiplier, 0)],
+        ability_score.outerjoin(
+            save, save.c.ability_score_id == ability_score.c.id)))
+    speeds = _group(rows([speed_score.c.stat_block_id,
+                          speed_score.c.speed_type_id,
+                          speed_score.c.base_value]))
+    skills = _group(rows([skill_proficiency.c.stat_block_id,
+                          skill_proficiency.c.skill_id,
+                          skill_proficiency.c.proficiency_multiplier]))
+
+    stat_blocks = rows([
+        stat_block.c.id, stat_block.c.name, stat_block.c.db_updated_on,
+        stat_block.c.race_id, stat_block.c.background_id,
+        stat_block.c.experience_points, stat_block.c.proficiency_bonus,
+        stat_block.c.base_hit_point_max, stat_block.c.current_hit_points,
+        stat_block.c.temporary_hit_points])
+    empty = ()
+    return [_snapshot(row, classes.get(row[0], empty),
+                      scores.get(row[0], empty), speeds.get(row[0], empty),
+                      skills.get(row[0], empty))
+            for row in stat_blocks]
+
+
+def _group(rows) -> Dict[int, List[tuple]]:
+    groups = {}
+    for stat_block_id, *values in rows:
+        groups.setdefault(stat_block_id, []).append(tuple(values))
+    return groups
+
+
+def _snapshot(row: tuple, classes, scores, speeds,
+              skills) -> StatBlockSnapshot:
+    (stat_block_id, name, version, race_id, background_id, experience_points,
+     proficiency_bonus, hit_point_max, current_hit_points,
+     temporary_hit_points) = row
+    classes = tuple(classes)
+    level = sum(level for _, level in classes)
+    ability_ids, ability_scores, save_proficiencies = (
+        zip(*scores) if scores else ((), (), ()))
+    return StatBlockSnapshot(
+        stat_block_id, name, version, race_id, background_id,
+        experience_points, level,
+        proficiency_bonus or proficiency_bonus_for_level(level),
+        hit_point_max, current_hit_points, temporary_hit_points, classes,
+        tuple(ability_ids), tuple(ability_scores), tuple(save_proficiencies),
+        tuple(speeds), tuple(skills))
@@ -1,6 +1,11 @@
 import enum
+from itertools import chain
+from typing import Iterable, List, Union
 
-from utils.sql import ResourceMixin
+from sqlalchemy import event
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from utils.sql import ResourceMixin, tz_aware_now
 from world_manager.extensions import db
 from world_manager.model import account
 
@@ -20,14 +25,18 @@ creature_class_spell_map = db.Table(
     db.Column('spell_id', db.Integer, db.ForeignKey('spell.id')),
     db.Column('creature_class_id', db.Integer,
               db.ForeignKey('creature_class.id')),
-    db.PrimaryKeyConstraint('spell_id', 'creature_class_id')
+    db.PrimaryKeyConstraint('spell_id', 'creature_class_id'),
+    db.Index('ix_creature_class_spell_map_creature_class_id_spell_id',
+             'creature_class_id', 'spell_id')
 )
 
 damage_type_spell_map = db.Table(
     'damage_type_spell_map',
     db.Column('damage_type_id', db.Integer, db.ForeignKey('damage_type.id')),
     db.Column('spell_id', db.Integer, db.ForeignKey('spell.id')),
-    db.PrimaryKeyConstraint('damage_type_id', 'spell_id')
+    db.PrimaryKeyConstraint('damage_type_id', 'spell_id'),
+    db.Index('ix_damage_type_spell_map_spell_id_damage_type_id',
+             'spell_id', 'damage_type_id')
 )
 
 
@@ -133,6 +142,7 @@ class Weapon(ResourceMixin, db.Model):
     category = db.Column(db.Enum(WeaponCategory, native_enum=False),
                          nullable=False)
     classification = db.Column(db.Enum(WeaponClass, native_enum=False))
+    damage_dice = db.Column(db.String(32))
     properties = db.relationship('WeaponProperty',
                                  secondary=weapon_weapon_property_map)
 
@@ -169,9 +179,18 @@ class Attack(ResourceMixin, db.Model):
     short_range = db.Column(db.Integer)
     long_range = db.Column(db.Integer)
     uses_proficiency = db.Column(db.Boolean(), default=True)
+    damage_dice = db.Column(db.String(32))
 
 
 class Spell(ResourceMixin, db.Model):
+    # Support the common filter combinations of the spell browser, ordered
+    # by level and name
+    __table_args__ = (
+        db.Index('ix_spell_level_name', 'level', 'name'),
+        db.Index('ix_spell_school_id_level_name', 'school_id', 'level',
+                 'name'),
+        db.Index('ix_spell_ritual_level_name', 'ritual', 'level', 'name'),
+    )
 
     id = db.Column(db.Integer,
                    primary_key=True)
@@ -295,6 +314,8 @@ class AbilityScore(ResourceMixin, db.Model):
                               nullable=False)
     stat_block = db.relationship('StatBlock', back_populates='ability_scores')
     base_value = db.Column(db.Integer, default=10)
+    saving_throw_proficiency = db.relationship(
+        'SavingThrowProficiency', uselist=False, back_populates='ability_score')
 
 
 class SavingThrowProficiency(ResourceMixin, db.Model):
@@ -302,7 +323,8 @@ class SavingThrowProficiency(ResourceMixin, db.Model):
     ability_score_id = db.Column(db.Integer,
                                  db.ForeignKey('ability_score.id'),
                                  unique=True)
-    ability_score = db.relationship('AbilityScore')
+    ability_score = db.relationship('AbilityScore',
+                                    back_populates='saving_throw_proficiency')
     proficiency_multiplier = db.Column(db.Integer, default=0,
                                        nullable=False)
 
@@ -322,6 +344,8 @@ class SkillProficiency(ResourceMixin, db.Model):
     skill_id = db.Column(db.Integer, db.ForeignKey('skill.id'))
     skill = db.relationship('Skill')
     stat_block_id = db.Column(db.Integer, db.ForeignKey('stat_block.id'))
+    stat_block = db.relationship('StatBlock',
+                                 back_populates='skill_proficiencies')
     proficiency_multiplier = db.Column(db.Integer, default=0, nullable=False)
 
 
@@ -353,7 +377,7 @@ class StatBlock(ResourceMixin, db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'),
                         nullable=True)
     user = db.relationship(account.User)
-    classes = db.relationship('StatBlockClass')
+    classes = db.relationship('StatBlockClass', back_populates='stat_block')
     background_id = db.Column(db.Integer, db.ForeignKey('background.id'),
                               nullable=True, index=True)
     background = db.relationship('Background')
@@ -373,12 +397,100 @@ class StatBlock(ResourceMixin, db.Model):
     temporary_hit_points = db.Column(db.Integer)
 
     speed_scores = db.relationship('SpeedScore', back_populates='stat_block')
+    skill_proficiencies = db.relationship('SkillProficiency',
+                                          back_populates='stat_block')
 
     personality_traits = db.Column(db.String)
     ideals = db.Column(db.String)
     bonds = db.Column(db.String)
     flaws = db.Column(db.String)
 
+    @classmethod
+    def sheet_options(cls) -> tuple:
+        """
+        Loader options that eagerly load everything a character sheet shows.
+
+        Many-to-one relationships are joined into the main query, and each
+        collection is fetched with one additional ``SELECT ... IN`` query, so
+        the number of queries does not depend on the number of stat blocks.
+
+        :return: a tuple of loader options
+        """
+        return (
+            joinedload(cls.race),
+            joinedload(cls.background),
+            joinedload(cls.user),
+            selectinload(cls.classes)
+            .joinedload(StatBlockClass.creature_class),
+            selectinload(cls.ability_scores)
+            .joinedload(AbilityScore.ability),
+            selectinload(cls.ability_scores)
+            .joinedload(AbilityScore.saving_throw_proficiency),
+            selectinload(cls.speed_scores)
+            .joinedload(SpeedScore.speed_type),
+            selectinload(cls.skill_proficiencies)
+            .joinedload(SkillProficiency.skill),
+        )
+
+    @classmethod
+    def load_sheet(cls, ids: Union[int, Iterable[int]]) -> List['StatBlock']:
+        """
+        Load one or many stat blocks with all of their sheet relationships.
+
+        :param ids: a stat block id or an iterable of them
+        :return: the stat blocks, in the order their ids were given
+        """
+        if isinstance(ids, int):
+            ids = [ids]
+        ids = list(ids)
+        if not ids:
+            return []
+
+        stat_blocks = (cls.query
+                       .options(*cls.sheet_options())
+                       .filter(cls.id.in_(ids))
+                       .all())
+        by_id = {stat_block.id: stat_block for stat_block in stat_blocks}
+        return [by_id[i] for i in ids if i in by_id]
+
+
+@event.listens_for(Session, 'after_flush')
+def touch_stat_blocks(session: Session, flush_context) -> None:
+    """
+    Bump `StatBlock.db_updated_on` whenever a row that appears on its sheet
+    changes, so the stat block's timestamp can be used as its version.
+    """
+    stat_block_ids = set()
+    ability_score_ids = set()
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, (StatBlockClass, AbilityScore, SpeedScore,
+                                 SkillProficiency)):
+            stat_block_ids.add(instance.stat_block_id)
+        elif isinstance(instance, SavingThrowProficiency):
+            ability_score_ids.add(instance.ability_score_id)
+    stat_block_ids.discard(None)
+    ability_score_ids.discard(None)
+
+    table = StatBlock.__table__
+    condition = None
+    if stat_block_ids:
+        condition = table.c.id.in_(stat_block_ids)
+    if ability_score_ids:
+        by_ability_score = table.c.id.in_(
+            db.select([AbilityScore.stat_block_id])
+            .where(AbilityScore.id.in_(ability_score_ids)))
+        condition = (by_ability_score if condition is None
+                     else condition | by_ability_score)
+    if condition is not None:
+        session.execute(table.update()
+                        .where(condition)
+                        .values(db_updated_on=tz_aware_now()))
+        # Stat blocks already loaded would keep their old version
+        for instance in list(session.identity_map.values()):
+            if isinstance(instance, StatBlock) and (
+                    ability_score_ids or instance.id in stat_block_ids):
+                session.expire(instance, ['db_updated_on'])
+
 
 stat_block_condition_map = db.Table(
     'stat_block_condition_map',
@@ -1,10 +1,69 @@
-from utils.sql import ResourceMixin, AwareDateTime
+import datetime
+import math
+from typing import Dict, Iterator, List, Optional
+
+import pytz
+from sqlalchemy import and_, event, literal, or_, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Query
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.sql.dml import Update
+from sqlalchemy.sql.elements import BindParameter
+
+from utils.pagination import KeysetPage, keyset_paginate
+from utils.sql import BigIntegerId, ResourceMixin, AwareDateTime
 from world_manager.extensions import db
 
+# Guards recursive queries against cycles in the event hierarchy
+MAX_TREE_DEPTH = 1000
+
+# Events are indexed by the power of two number of hours their duration
+# fits in, which bounds how long before a window an overlapping event can
+# start. 2 ** 27 hours is more than the whole datetime range.
+SPAN_UNIT = datetime.timedelta(hours=1)
+MAX_SPAN_CLASS = 27
+EARLIEST = datetime.datetime.min.replace(tzinfo=pytz.utc)
+
+
+def span_class(start_date: Optional[datetime.datetime],
+               end_date: Optional[datetime.datetime]) -> int:
+    """
+    Return the smallest k such that an event lasts at most 2 ** k hours.
+    Events without an end are treated as instants.
+
+    :param start_date: when the event starts
+    :param end_date: when the event ends
+    :return: the span class
+    """
+    if start_date is None or end_date is None:
+        return 0
+    hours = (_utc(end_date) - _utc(start_date)) / SPAN_UNIT
+    if hours <= 1:
+        return 0
+    return min(math.ceil(math.log2(hours)), MAX_SPAN_CLASS)
+
+
+def _utc(value: datetime.datetime) -> datetime.datetime:
+    # SQLite returns naive datetimes, which are stored in UTC
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(pytz.utc).replace(tzinfo=None)
+
+
+def _default_span_class(context) -> int:
+    parameters = context.get_current_parameters()
+    return span_class(parameters.get('start_date'),
+                      parameters.get('end_date'))
+
 
 class Event(ResourceMixin, db.Model):
+    __table_args__ = (
+        db.Index('ix_event_start_date_id', 'start_date', 'id'),
+        db.Index('ix_event_span_class_start_date', 'span_class',
+                 'start_date'),
+    )
 
-    id = db.Column(db.BigInteger,
+    id = db.Column(BigIntegerId,
                    primary_key=True)
 
     name = db.Column(db.String(255),
@@ -14,19 +73,316 @@ class Event(ResourceMixin, db.Model):
 
     description = db.Column(db.String(4096))
 
-    parent_event_id = db.Column(db.BigInteger,
+    parent_event_id = db.Column(BigIntegerId,
                                 db.ForeignKey('event.id'),
                                 index=True)
 
     children = db.relationship('Event',
                                backref=db.backref('parent', remote_side=[id]))
 
-    start_date = db.Column(AwareDateTime(),
-                           index=True)
+    start_date = db.Column(AwareDateTime())
 
     end_date = db.Column(AwareDateTime(),
                          index=True)
 
+    span_class = db.Column(db.SmallInteger,
+                           nullable=False,
+                           default=_default_span_class)
+
+    @classmethod
+    def _descendant_ids(cls, root_id: int, max_depth: Optional[int]):
+        """
+        A recursive CTE of the ids and depths of an event and its
+        descendants, the event itself having depth 0.
+        """
+        table = cls.__table__
+        tree = (select([table.c.id, literal(0).label('depth')])
+                .where(table.c.id == root_id)
+                .cte('event_tree', recursive=True))
+        child = table.alias('child')
+        return tree.union_all(
+            select([child.c.id, tree.c.depth + 1])
+            .where(child.c.parent_event_id == tree.c.id)
+            .where(tree.c.depth < _depth_limit(max_depth)))
+
+    def descendants(self, max_depth: Optional[int]=None) -> List['Event']:
+        """
+        Return every event below this one in a single query, ordered by
+        depth.
+
+        :param max_depth: only return events at most this far below this one
+        :return: the descendant events
+        """
+        tree = self._descendant_ids(self.id, max_depth)
+        return (type(self).query
+                .join(tree, Event.id == tree.c.id)
+                .filter(tree.c.depth > 0)
+                .order_by(tree.c.depth, Event.id)
+                .all())
+
+    def ancestors(self) -> List['Event']:
+        """
+        Return the events above this one in a single query, root first.
+
+        :return: the ancestor events
+        """
+        if self.parent_event_id is None:
+            return []
+
+        table = Event.__table__
+        path = (select([table.c.id, table.c.parent_event_id,
+                        literal(1).label('height')])
+                .where(table.c.id == self.parent_event_id)
+                .cte('event_path', recursive=True))
+        parent = table.alias('parent')
+        path = path.union_all(
+            select([parent.c.id, parent.c.parent_event_id, path.c.height + 1])
+            .where(parent.c.id == path.c.parent_event_id)
+            .where(path.c.height < MAX_TREE_DEPTH))
+        return (type(self).query
+                .join(path, Event.id == path.c.id)
+                .order_by(path.c.height.desc())
+                .all())
+
+    def breadcrumbs(self) -> List['Event']:
+        """
+        Return the path from the root event down to and including this one.
+
+        :return: the events on the path
+        """
+        return self.ancestors() + [self]
+
+    @classmethod
+    def load_subtree(cls, root_id: int,
+                     max_depth: Optional[int]=None) -> Optional['Event']:
+        """
+        Load an event and its descendants in a single query, with the
+        `children` of every loaded event populated, so walking the tree
+        does not issue any more queries. Events at `max_depth` keep lazy
+        loading their children.
+
+        :param root_id: the id of the root event
+        :param max_depth: only load events at most this far below the root
+        :return: the root event, or None if it does not exist
+        """
+        tree = cls._descendant_ids(root_id, max_depth)
+        rows = (cls.query
+                .add_columns(tree.c.depth)
+                .join(tree, Event.id == tree.c.id)
+                .order_by(tree.c.depth, Event.id)
+                .all())
+        if not rows:
+            return None
+
+        depth_limit = _depth_limit(max_depth)
+        children: Dict[int, List[Event]] = {}
+        for event, depth in rows:
+            if depth < depth_limit:
+                children[event.id] = []
+        for event, depth in rows:
+            if depth > 0:
+                children[event.parent_event_id].append(event)
+        for event, depth in rows:
+            if event.id in children:
+                set_committed_value(event, 'children', children[event.id])
+        return rows[0][0]
+
+    @classmethod
+    def chronological(cls, query: Optional[Query]=None) -> Query:
+        """
+        Order events by when they start, using the id to break ties.
+
+        :param query: the query to order, all events by default
+        :return: the ordered query
+        """
+        query = cls.query if query is None else query
+        return query.order_by(cls.start_date, cls.id)
+
+    @classmethod
+    def _starting_between(cls, lower: datetime.datetime,
+                          upper: datetime.datetime):
+        """
+        Match events that start at or before `upper` and that could still be
+        going on at `lower`, given the longest duration of their span class.
+        Each span class is a bounded range of the span class index.
+        """
+        return or_(*(
+            and_(cls.span_class == k,
+                 cls.start_date >= _earlier(lower, SPAN_UNIT * 2 ** k),
+                 cls.start_date <= upper)
+            for k in range(MAX_SPAN_CLASS + 1)))
+
+    @classmethod
+    def overlapping(cls, start: datetime.datetime,
+                    end: datetime.datetime) -> Query:
+        """
+        Return the events that happen at some point in ``[start, end)``, in
+        chronological order. Events without an end are instants.
+
+        :param start: the start of the window
+        :param end: the end of the window
+        :return: the query of events
+        """
+        return cls.chronological().filter(
+            cls._starting_between(start, end),
+            cls.start_date < end,
+            or_(cls.end_date > start,
+                and_(cls.end_date.is_(None), cls.start_date >= start)))
+
+    @classmethod
+    def within(cls, start: datetime.datetime,
+               end: datetime.datetime) -> Query:
+        """
+        Return the events that happen entirely within ``[start, end]``, in
+        chronological order.
+
+        :param start: the start of the window
+        :param end: the end of the window
+        :return: the query of events
+        """
+        return cls.chronological().filter(
+            cls.start_date >= start,
+            cls.start_date <= end,
+            or_(cls.end_date <= end, cls.end_date.is_(None)))
+
+    @classmethod
+    def containing(cls, start: datetime.datetime,
+                   end: Optional[datetime.datetime]=None) -> Query:
+        """
+        Return the events that are going on during all of ``[start, end]``,
+        or at the instant `start`, in chronological order.
+
+        :param start: the start of the window
+        :param end: the end of the window
+        :return: the query of events
+        """
+        end = start if end is None else end
+        return cls.chronological().filter(
+            cls._starting_between(end, start),
+            or_(cls.end_date >= end,
+                and_(cls.end_date.is_(None), cls.start_date == end)))
+
+    @classmethod
+    def paginate(cls, query: Query, per_page: int=50,
+                 after: Optional[str]=None,
+                 before: Optional[str]=None) -> KeysetPage:
+        """
+        Return a page of a query of events in chronological order, seeking
+        past the events of the previous pages instead of using an offset.
+
+        :param query: the query of events
+        :param per_page: the number of events per page
+        :param after: the cursor of the page before the wanted one
+        :param before: the cursor of the page after the wanted one
+        :return: the page
+        """
+        return keyset_paginate(query, (cls.start_date, cls.id), per_page,
+                               after, before)
+
+    @staticmethod
+    def stream(query: Query, batch_size: int=1000) -> Iterator['Event']:
+        """
+        Lazily iterate over a large query, fetching `batch_size` rows at a
+        time instead of loading every event first.
+
+        :param query: the query of events
+        :param batch_size: the number of rows fetched at a time
+        :return: an iterator of events
+        """
+        return iter(query.yield_per(batch_size))
+
+
+@event.listens_for(Event, 'before_insert')
+@event.listens_for(Event, 'before_update')
+def _update_span_class(mapper, connection, target: Event) -> None:
+    target.span_class = span_class(target.start_date, target.end_date)
+
+
+@event.listens_for(Engine, 'before_execute', retval=True)
+def _update_span_class_of_statement(conn, clauseelement, multiparams,
+                                    params, execution_options):
+    """
+    Keep `Event.span_class` right when dates are updated by a Core or bulk
+    ``UPDATE``, including executemany and bulk update mappings, which the
+    ORM events above don't see.
+
+    The span class is worked out for each row whose new start and end date
+    are both known, as plain values or parameters. Any other update of a
+    date is refused rather than leaving events missing from the timeline
+    queries.
+    """
+    if not (isinstance(clauseelement, Update)
+            and clauseelement.table.name == Event.__tablename__):
+        return clauseelement, multiparams, params
+    values = {getattr(k, 'key', k): v
+              for k, v in (clauseelement._values or {}).items()}
+    rows = _rows(multiparams, params)
+    if 'span_class' in values or any('span_class' in r for r in rows):
+        return clauseelement, multiparams, params
+
+    dates = ('start_date', 'end_date')
+    spans = []
+    for row in rows or [{}]:
+        if not any(d in values or d in row for d in dates):
+            return clauseelement, multiparams, params
+        start, end = (_new_value(name, values, row) for name in dates)
+        if start is _UNKNOWN or end is _UNKNOWN:
+            raise ValueError('An UPDATE of the dates of events must set '
+                             'both start_date and end_date to values, or go '
+                             'through the ORM, so their span class can be '
+                             'kept up to date')
+        spans.append(span_class(start, end))
+
+    if not rows:
+        return (clauseelement.values(span_class=spans[0]), multiparams,
+                params)
+    return (clauseelement,
+            [dict(row, span_class=span) for row, span in zip(rows, spans)],
+            {})
+
+
+_UNKNOWN = object()
+
+
+def _new_value(name: str, values: dict, row: dict):
+    value = values.get(name, _UNKNOWN)
+    if isinstance(value, BindParameter):
+        if value.key in row:
+            return row[value.key]
+        return value.value if value.callable is None else _UNKNOWN
+    if value is _UNKNOWN:
+        return row.get(name, _UNKNOWN)
+    # A SQL expression, e.g. a column plus an interval
+    return _UNKNOWN
+
+
+def _rows(multiparams, params) -> List[dict]:
+    rows = []
+    for parameters in multiparams or ():
+        for entry in (parameters if isinstance(parameters, (list, tuple))
+                      else [parameters]):
+            if isinstance(entry, dict):
+                rows.append(entry)
+    if params:
+        rows = [dict(row, **params) for row in rows] or [dict(params)]
+    return rows
+
+
+def _aware(value: datetime.datetime) -> datetime.datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=pytz.utc)
+    return value
+
 
+def _earlier(value: datetime.datetime,
+             delta: datetime.timedelta) -> datetime.datetime:
+    value = _aware(value)
+    if value - EARLIEST <= delta:
+        return EARLIEST
+    return value - delta
 
 
+def _depth_limit(max_depth: Optional[int]) -> int:
+    if max_depth is None:
+        return MAX_TREE_DEPTH
+    return min(max_depth, MAX_TREE_DEPTH)
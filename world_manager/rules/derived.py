@@ -0,0 +1,215 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, Optional
+
+from world_manager.extensions import db
+from world_manager.model import stat
+from world_manager.model.reference import reference_data
+
+CACHE_SIZE = 1024
+BASE_ARMOR_CLASS = 10
+ARMOR_CLASS_ABILITY = 'DEX'
+# The reference tables whose rows are part of derived stats
+REFERENCE_MODELS = (stat.Ability, stat.Skill, stat.SpeedType)
+
+_cache: 'OrderedDict[tuple, DerivedStats]' = OrderedDict()
+_cache_lock = Lock()
+
+
+def ability_modifier(score: int) -> int:
+    """
+    Return the modifier for an ability score
+
+    :param score: the ability score
+    :return: the modifier
+    """
+    return (score - 10) // 2
+
+
+def proficiency_bonus_for_level(level: int) -> int:
+    """
+    Return the proficiency bonus of a creature with a total level
+
+    :param level: the sum of all class levels
+    :return: the proficiency bonus
+    """
+    return 2 + (max(level, 1) - 1) // 4
+
+
+class AbilityStats:
+    __slots__ = ('name', 'abbreviation', 'score', 'modifier',
+                 'save_proficiency', 'save')
+
+    def __init__(self, name: str, abbreviation: str, score: int,
+                 save_proficiency: int, proficiency_bonus: int):
+        self.name = name
+        self.abbreviation = abbreviation
+        self.score = score
+        self.modifier = ability_modifier(score)
+        self.save_proficiency = save_proficiency
+        self.save = self.modifier + save_proficiency * proficiency_bonus
+
+    def as_dict(self) -> dict:
+        return {n: getattr(self, n) for n in self.__slots__}
+
+
+class SkillStats:
+    __slots__ = ('name', 'ability', 'proficiency', 'modifier')
+
+    def __init__(self, name: str, ability: AbilityStats, proficiency: int,
+                 proficiency_bonus: int):
+        self.name = name
+        self.ability = ability.abbreviation
+        self.proficiency = proficiency
+        self.modifier = ability.modifier + proficiency * proficiency_bonus
+
+    def as_dict(self) -> dict:
+        return {n: getattr(self, n) for n in self.__slots__}
+
+
+class DerivedStats:
+    """
+    Every number on a character sheet that is computed from a stat block.
+
+    Instances are built once per stat block version by `derived_stats` and
+    are treated as read only, so templates and the JSON API can share them.
+    """
+
+    def __init__(self, stat_block: stat.StatBlock):
+        self.stat_block_id = stat_block.id
+        self.version = stat_block.db_updated_on
+        self.level = sum(c.level for c in stat_block.classes)
+        self.proficiency_bonus = (
+            stat_block.proficiency_bonus
+            or proficiency_bonus_for_level(self.level))
+
+        self.abilities: Dict[str, AbilityStats] = {}
+        self._abilities_by_id: Dict[int, AbilityStats] = {}
+        for score in stat_block.ability_scores:
+            proficiency = score.saving_throw_proficiency
+            ability = AbilityStats(
+                score.ability.name,
+                score.ability.abbreviation,
+                score.base_value,
+                proficiency.proficiency_multiplier if proficiency else 0,
+                self.proficiency_bonus)
+            self.abilities[ability.abbreviation] = ability
+            self._abilities_by_id[score.ability_id] = ability
+
+        proficiencies = {p.skill_id: p.proficiency_multiplier
+                         for p in stat_block.skill_proficiencies}
+        self.skills: Dict[str, SkillStats] = {}
+        for skill in reference_data.table(stat.Skill):
+            ability = self._abilities_by_id.get(skill.default_ability_id)
+            if ability is None:
+                continue
+            self.skills[skill.name] = SkillStats(
+                skill.name, ability, proficiencies.get(skill.id, 0),
+                self.proficiency_bonus)
+
+        self.speeds = {s.speed_type.name: s.base_value
+                       for s in stat_block.speed_scores}
+        self.armor_class = BASE_ARMOR_CLASS + self.ability_modifier(
+            ARMOR_CLASS_ABILITY)
+
+    def ability_modifier(self, abbreviation: str) -> int:
+        ability = self.abilities.get(abbreviation)
+        return ability.modifier if ability else 0
+
+    def ability_modifier_by_id(self, ability_id: int) -> int:
+        ability = self._abilities_by_id.get(ability_id)
+        return ability.modifier if ability else 0
+
+    def passive_score(self, skill_name: str) -> int:
+        skill = self.skills.get(skill_name)
+        return 10 + (skill.modifier if skill else 0)
+
+    def attack_bonus(self, attack: stat.Attack) -> int:
+        """
+        Return the bonus to hit for an attack made by this stat block.
+
+        :param attack: the attack
+        :return: the attack bonus
+        """
+        # Attacks don't belong to stat blocks, so the bonus can't be worked
+        # out up front, and isn't remembered since instances are shared
+        bonus = self.ability_modifier_by_id(attack.ability_id)
+        if attack.uses_proficiency:
+            bonus += self.proficiency_bonus
+        return bonus
+
+    def as_dict(self) -> dict:
+        return {
+            'stat_block_id': self.stat_block_id,
+            'version': self.version.isoformat() if self.version else None,
+            'level': self.level,
+            'proficiency_bonus': self.proficiency_bonus,
+            'armor_class': self.armor_class,
+            'abilities': {k: v.as_dict() for k, v in self.abilities.items()},
+            'skills': {k: v.as_dict() for k, v in self.skills.items()},
+            'speeds': dict(self.speeds),
+        }
+
+
+def derived_stats(stat_block: stat.StatBlock) -> DerivedStats:
+    """
+    Return the derived stats of a stat block, computing them at most once per
+    version of the stat block and of the reference data they use.
+
+    The stat block should be loaded with `StatBlock.load_sheet` so computing
+    the stats does not lazy load each relationship.
+
+    :param stat_block: the stat block
+    :return: the derived stats
+    """
+    key = _key(stat_block.id, stat_block.db_updated_on)
+    stats = _cache_get(key)
+    if stats is not None:
+        return stats
+
+    stats = DerivedStats(stat_block)
+
+    with _cache_lock:
+        _cache[key] = stats
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return stats
+
+
+def get_derived_stats(stat_block_id: int) -> Optional[DerivedStats]:
+    """
+    Return the derived stats for a stat block id, only loading the stat block
+    when the cached stats are out of date.
+
+    :param stat_block_id: the stat block id
+    :return: the derived stats or None if there is no such stat block
+    """
+    version = db.session.query(stat.StatBlock.db_updated_on).filter_by(
+        id=stat_block_id).first()
+    if version is None:
+        return None
+
+    stats = _cache_get(_key(stat_block_id, version[0]))
+    if stats is not None:
+        return stats
+
+    stat_blocks = stat.StatBlock.load_sheet(stat_block_id)
+    return derived_stats(stat_blocks[0]) if stat_blocks else None
+
+
+def _key(stat_block_id: int, version) -> tuple:
+    return (stat_block_id, version,
+            reference_data.version(*REFERENCE_MODELS))
+
+
+def _cache_get(key: tuple) -> Optional[DerivedStats]:
+    with _cache_lock:
+        stats = _cache.get(key)
+        if stats is not None:
+            _cache.move_to_end(key)
+        return stats
+
+
+def clear_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,134 @@
+from typing import List, Optional, Union
+
+import numpy as np
+
+from world_manager.model.stat import DieType
+
+Die = Union[DieType, int]
+
+
+def sides(die: Die) -> int:
+    """
+    Return the number of sides of a die
+
+    :param die: a `DieType` or a number of sides
+    :return: the number of sides
+    """
+    count = die.value if isinstance(die, DieType) else int(die)
+    if count < 1:
+        raise ValueError(f'A die needs at least one side, not {count}')
+    return count
+
+
+def _dtype(largest: int) -> type:
+    # The smallest integers that hold every face, int16 for the usual dice
+    for dtype in (np.int16, np.int32):
+        if largest <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+class DiceRoller:
+    """
+    Rolls batches of dice at once.
+
+    Every roll method returns an array with one total per roll, so rolling a
+    million damage rolls is a handful of array operations instead of a
+    million calls to `random`. Rollers created with the same seed produce the
+    same rolls.
+
+    :param seed: the seed of the random stream, or a `SeedSequence`
+    """
+
+    def __init__(self,
+                 seed: Optional[Union[int, np.random.SeedSequence]]=None):
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(seed)
+        self.seed_sequence = seed
+        self.generator = np.random.default_rng(seed)
+
+    def spawn(self, count: int) -> List['DiceRoller']:
+        """
+        Create rollers with independent streams, e.g. one per worker process.
+        The streams only depend on this roller's seed.
+
+        :param count: the number of rollers
+        :return: the rollers
+        """
+        return [DiceRoller(s) for s in self.seed_sequence.spawn(count)]
+
+    def dice(self, die: Die, count: int=1, size: int=1,
+             reroll_below: int=0) -> np.ndarray:
+        """
+        Roll `count` dice `size` times without adding them up.
+
+        :param die: the die to roll
+        :param count: the number of dice per roll
+        :param size: the number of rolls
+        :param reroll_below: dice showing this or less are rolled again once,
+               and the new result is kept
+        :return: an array of shape ``(size, count)``
+        """
+        high = sides(die) + 1
+        dtype = _dtype(high - 1)
+        rolls = self.generator.integers(1, high, size=(size, count),
+                                        dtype=dtype)
+        if reroll_below > 0:
+            low = rolls <= reroll_below
+            rolls[low] = self.generator.integers(1, high, size=low.sum(),
+                                                 dtype=dtype)
+        return rolls
+
+    def roll(self, die: Die, count: int=1, size: int=1, modifier: int=0,
+             keep_highest: Optional[int]=None,
+             keep_lowest: Optional[int]=None,
+             reroll_below: int=0) -> np.ndarray:
+        """
+        Roll `count` dice, optionally keep only the highest or lowest few, and
+        add a modifier, `size` times.
+
+        For example, ``roll(DieType.d6, 4, size, keep_highest=3)`` rolls
+        ability scores and ``roll(DieType.d6, 2, size, modifier=3)`` rolls
+        the damage of a greatsword.
+
+        :param die: the die to roll
+        :param count: the number of dice per roll
+        :param size: the number of rolls
+        :param modifier: added to every total
+        :param keep_highest: the number of highest dice to add up
+        :param keep_lowest: the number of lowest dice to add up
+        :param reroll_below: dice showing this or less are rolled again once
+        :return: an array with the `size` totals
+        """
+        if keep_highest is not None and keep_lowest is not None:
+            raise ValueError('Cannot keep both the highest and lowest dice')
+        for kept in (keep_highest, keep_lowest):
+            if kept is not None and not 1 <= kept <= count:
+                raise ValueError(f'Cannot keep {kept} of {count} dice')
+        rolls = self.dice(die, count, size, reroll_below)
+        if keep_highest == 1 or keep_lowest == 1:
+            # Advantage and disadvantage do not need a sort
+            kept = rolls.max(axis=1) if keep_highest else rolls.min(axis=1)
+            return kept.astype(np.int64) + modifier
+        if keep_highest is not None and keep_highest < count:
+            rolls = np.sort(rolls, axis=1)[:, count - keep_highest:]
+        elif keep_lowest is not None and keep_lowest < count:
+            rolls = np.sort(rolls, axis=1)[:, :keep_lowest]
+        return rolls.sum(axis=1, dtype=np.int64) + modifier
+
+    def d20(self, size: int=1, modifier: int=0, advantage: bool=False,
+            disadvantage: bool=False) -> np.ndarray:
+        """
+        Roll d20 tests. Advantage and disadvantage cancel each other out.
+
+        :param size: the number of rolls
+        :param modifier: added to every roll
+        :param advantage: roll twice and keep the higher roll
+        :param disadvantage: roll twice and keep the lower roll
+        :return: an array with the `size` results
+        """
+        if advantage == disadvantage:
+            return self.roll(DieType.d20, 1, size, modifier)
+        if advantage:
+            return self.roll(DieType.d20, 2, size, modifier, keep_highest=1)
+        return self.roll(DieType.d20, 2, size, modifier, keep_lowest=1)
@@ -0,0 +1,282 @@
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from world_manager.model import stat
+from world_manager.rules.derived import (BASE_ARMOR_CLASS, DerivedStats,
+                                         derived_stats)
+from world_manager.rules.dice import DiceRoller
+from world_manager.rules.expression import DiceExpression, parse
+
+BATCH_SIZE = 2500
+MAX_ROUNDS = 100
+CRITICAL_HIT = 20
+CRITICAL_MISS = 1
+SHIELD_BONUS = 2
+FINESSE = 'finesse'
+# The most dexterity modifier that counts towards each category of armor
+MAX_DEXTERITY_BONUS = {
+    stat.ArmorCategories.Unarmored: None,
+    stat.ArmorCategories.LightArmor: None,
+    stat.ArmorCategories.MediumArmor: 2,
+}
+# Armor whose armor class ignores dexterity, whether it is high or low
+IGNORES_DEXTERITY = {stat.ArmorCategories.HeavyArmor}
+
+
+class Combatant:
+    """
+    The numbers a simulated fight needs about one creature.
+
+    Combatants hold no ORM state, so they are cheap to send to worker
+    processes.
+
+    :param name: the name to report the combatant by
+    :param hit_points: the hit points at the start of the fight
+    :param armor_class: the armor class
+    :param attack_bonus: the bonus to hit of the combatant's attack
+    :param damage: the damage expression of the attack, including modifiers
+    :param initiative: the initiative modifier
+    """
+    __slots__ = ('name', 'hit_points', 'armor_class', 'attack_bonus',
+                 'damage', 'initiative')
+
+    def __init__(self, name: str, hit_points: int, armor_class: int,
+                 attack_bonus: int, damage: str, initiative: int=0):
+        self.name = name
+        self.hit_points = hit_points
+        self.armor_class = armor_class
+        self.attack_bonus = attack_bonus
+        self.damage = str(parse(damage))
+        self.initiative = initiative
+
+    def __getstate__(self):
+        return tuple(getattr(self, n) for n in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    @classmethod
+    def from_stat_block(cls, stat_block: stat.StatBlock, attack: stat.Attack,
+                        weapon: Optional[stat.Weapon]=None,
+                        armor: Optional[stat.Armor]=None,
+                        shield: bool=False) -> 'Combatant':
+        """
+        Snapshot a stat block fighting with one attack.
+
+        :param stat_block: the stat block, ideally loaded with
+               `StatBlock.load_sheet`
+        :param attack: the attack it makes every turn
+        :param weapon: the weapon the attack is made with. Its damage dice
+               are used when the attack has none, and finesse weapons use
+               the better of strength and dexterity
+        :param armor: the armor worn
+        :param shield: whether a shield is carried
+        :return: the combatant
+        """
+        stats = derived_stats(stat_block)
+
+        modifier = _attack_modifier(stats, attack, weapon)
+        attack_bonus = modifier
+        if attack.uses_proficiency:
+            attack_bonus += stats.proficiency_bonus
+
+        dice = attack.damage_dice or (weapon.damage_dice if weapon else None)
+        if not dice:
+            raise ValueError(f'{attack.name} has no damage dice')
+        damage = f'{dice}{modifier:+d}' if modifier else dice
+
+        return cls(stat_block.name,
+                   stat_block.current_hit_points
+                   or stat_block.base_hit_point_max or 1,
+                   _armor_class(stats, armor, shield),
+                   attack_bonus,
+                   damage,
+                   stats.ability_modifier('DEX'))
+
+
+def _attack_modifier(stats: DerivedStats, attack: stat.Attack,
+                     weapon: Optional[stat.Weapon]) -> int:
+    modifier = stats.ability_modifier_by_id(attack.ability_id)
+    if weapon is not None and any(p.name.lower() == FINESSE
+                                  for p in weapon.properties):
+        modifier = max(modifier, stats.ability_modifier('STR'),
+                       stats.ability_modifier('DEX'))
+    return modifier
+
+
+def _armor_class(stats: DerivedStats, armor: Optional[stat.Armor],
+                 shield: bool) -> int:
+    dexterity = stats.ability_modifier('DEX')
+    if armor is None:
+        armor_class = BASE_ARMOR_CLASS + dexterity
+    elif armor.category in IGNORES_DEXTERITY:
+        armor_class = armor.base_armor_class
+    else:
+        limit = MAX_DEXTERITY_BONUS.get(armor.category)
+        if limit is not None:
+            dexterity = min(dexterity, limit)
+        armor_class = armor.base_armor_class + dexterity
+    return armor_class + (SHIELD_BONUS if shield else 0)
+
+
+class _Side:
+    """ The combatants of one side as arrays, one column per combatant. """
+
+    def __init__(self, combatants: Sequence[Combatant]):
+        self.hit_points = np.array([c.hit_points for c in combatants])
+        self.armor_class = np.array([c.armor_class for c in combatants])
+        self.attack_bonus = np.array([c.attack_bonus for c in combatants])
+        self.initiative = np.array([c.initiative for c in combatants])
+        self.damage = [parse(c.damage) for c in combatants]
+        self.critical_damage = [DiceExpression(d.terms) for d in self.damage]
+
+    def __len__(self):
+        return len(self.hit_points)
+
+
+class EncounterStats:
+    """
+    Aggregate outcome of many simulated fights.
+
+    :param wins: whether the party won each fight
+    :param rounds: the number of rounds each fight lasted
+    :param hit_points_lost: the hit points the party lost in each fight
+    :param deaths: the number of party members that dropped in each fight
+    """
+
+    def __init__(self, wins: np.ndarray, rounds: np.ndarray,
+                 hit_points_lost: np.ndarray, deaths: np.ndarray):
+        self.encounters = len(wins)
+        self.win_rate = float(wins.mean()) if len(wins) else 0.0
+        self.mean_rounds = float(rounds.mean()) if len(rounds) else 0.0
+        self.rounds_percentiles = {
+            p: int(np.percentile(rounds, p)) if len(rounds) else 0
+            for p in (50, 90, 99)}
+        won = rounds[wins]
+        self.mean_rounds_to_win = float(won.mean()) if len(won) else None
+        self.mean_hit_points_lost = (float(hit_points_lost.mean())
+                                     if len(hit_points_lost) else 0.0)
+        self.mean_deaths = float(deaths.mean()) if len(deaths) else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            'encounters': self.encounters,
+            'win_rate': self.win_rate,
+            'mean_rounds': self.mean_rounds,
+            'rounds_percentiles': dict(self.rounds_percentiles),
+            'mean_rounds_to_win': self.mean_rounds_to_win,
+            'mean_hit_points_lost': self.mean_hit_points_lost,
+            'mean_deaths': self.mean_deaths,
+        }
+
+
+def simulate(party: Sequence[Combatant], monsters: Sequence[Combatant],
+             encounters: int=10000, seed: Optional[int]=None,
+             workers: Optional[int]=None,
+             batch_size: int=BATCH_SIZE) -> EncounterStats:
+    """
+    Fight a party against monsters many times and summarize the outcomes.
+
+    Every combatant attacks the first standing enemy once per round, and the
+    side with the higher initiative roll acts first. Encounters are simulated
+    in batches, each batch vectorized over its encounters and run on a
+    process pool. Every batch has its own random stream spawned from `seed`,
+    so the results only depend on the seed and batch size, not on the number
+    of workers.
+
+    :param party: the party
+    :param monsters: the monsters
+    :param encounters: the number of fights
+    :param seed: the seed, or None for different results every time
+    :param workers: the number of processes, 1 to simulate in this process
+    :param batch_size: the number of fights per batch
+    :return: the aggregate statistics
+    """
+    if not party or not monsters:
+        raise ValueError('Both sides need at least one combatant')
+    party, monsters = list(party), list(monsters)
+    sizes = [min(batch_size, encounters - start)
+             for start in range(0, encounters, batch_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(party, monsters, size, s) for size, s in zip(sizes, seeds)]
+
+    if workers == 1 or len(jobs) <= 1:
+        results = [_simulate_batch(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(_simulate_batch, *zip(*jobs)))
+
+    if not results:
+        empty = np.zeros(0, dtype=int)
+        return EncounterStats(empty.astype(bool), empty, empty, empty)
+    return EncounterStats(*(np.concatenate(r) for r in zip(*results)))
+
+
+def _simulate_batch(party: List[Combatant], monsters: List[Combatant],
+                    size: int, seed: np.random.SeedSequence
+                    ) -> Tuple[np.ndarray, ...]:
+    roller = DiceRoller(seed)
+    heroes, enemies = _Side(party), _Side(monsters)
+    party_hit_points = np.tile(heroes.hit_points, (size, 1))
+    monster_hit_points = np.tile(enemies.hit_points, (size, 1))
+
+    party_first = (roller.d20(size) + heroes.initiative.max()
+                   >= roller.d20(size) + enemies.initiative.max())
+    rounds = np.zeros(size, dtype=np.int64)
+    ongoing = np.ones(size, dtype=bool)
+
+    for _ in range(MAX_ROUNDS):
+        # Only the fights that are still going on are simulated, so the few
+        # long fights do not cost as much as the whole batch
+        active = np.flatnonzero(ongoing)
+        if not len(active):
+            break
+        rounds[active] += 1
+        first = party_first[active]
+        heroes_left = party_hit_points[active]
+        enemies_left = monster_hit_points[active]
+        _take_turns(roller, heroes, heroes_left, enemies, enemies_left, first)
+        _take_turns(roller, enemies, enemies_left, heroes, heroes_left,
+                    np.ones(len(active), dtype=bool))
+        _take_turns(roller, heroes, heroes_left, enemies, enemies_left,
+                    ~first)
+        party_hit_points[active] = heroes_left
+        monster_hit_points[active] = enemies_left
+        ongoing[active] = ((heroes_left > 0).any(axis=1)
+                           & (enemies_left > 0).any(axis=1))
+
+    wins = (monster_hit_points <= 0).all(axis=1)
+    remaining = np.clip(party_hit_points, 0, None).sum(axis=1)
+    hit_points_lost = heroes.hit_points.sum() - remaining
+    deaths = (party_hit_points <= 0).sum(axis=1)
+    return wins, rounds, hit_points_lost, deaths
+
+
+def _take_turns(roller: DiceRoller, attackers: _Side,
+                attacker_hit_points: np.ndarray, defenders: _Side,
+                defender_hit_points: np.ndarray, acting: np.ndarray) -> None:
+    size = len(acting)
+    encounters = np.arange(size)
+    for i in range(len(attackers)):
+        attacking = acting & (attacker_hit_points[:, i] > 0)
+        standing = defender_hit_points > 0
+        attacking &= standing.any(axis=1)
+        if not attacking.any():
+            continue
+
+        target = standing.argmax(axis=1)
+        roll = roller.d20(size)
+        critical = roll >= CRITICAL_HIT
+        hits = (critical
+                | ((roll > CRITICAL_MISS)
+                   & (roll + attackers.attack_bonus[i]
+                      >= defenders.armor_class[target])))
+        hits &= attacking
+
+        damage = attackers.damage[i].sample(size, roller)
+        damage += critical * attackers.critical_damage[i].sample(size, roller)
+        defender_hit_points[encounters, target] -= (
+            np.clip(damage, 0, None) * hits)
@@ -0,0 +1,357 @@
+import re
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from world_manager.rules.dice import DiceRoller
+
+CACHE_SIZE = 1024
+# The most combinations of dice a keep-highest or keep-lowest term may have
+# before its distribution is considered too expensive to enumerate
+MAX_ENUMERATED_OUTCOMES = 2 ** 20
+# The most dice a term may roll
+MAX_DICE = 1000
+# The most totals a term's distribution may have before it is considered too
+# expensive to compute
+MAX_TOTALS = 2 ** 18
+# Above this many multiplications arrays are convolved with FFTs
+DIRECT_CONVOLUTION_LIMIT = 2 ** 16
+
+TERM_PATTERN = re.compile(r'''
+    \s*(?P<sign>[+-])?\s*
+    (?:
+        (?P<count>\d*)d(?P<sides>\d+|%)
+        (?:(?P<keep>kh|kl|k)(?P<kept>\d+))?
+        (?:r(?P<reroll>\d+))?
+      | (?P<constant>\d+)
+    )\s*''', re.VERBOSE | re.IGNORECASE)
+
+
+class Distribution:
+    """
+    The exact probability of every total of a dice expression.
+
+    :param minimum: the lowest total
+    :param probabilities: the probability of each total from `minimum` up
+    """
+
+    def __init__(self, minimum: int, probabilities: np.ndarray):
+        self.minimum = minimum
+        self.probabilities = probabilities
+        self.probabilities.flags.writeable = False
+        self._cumulative = np.cumsum(probabilities)
+
+    @property
+    def maximum(self) -> int:
+        return self.minimum + len(self.probabilities) - 1
+
+    @property
+    def totals(self) -> np.ndarray:
+        return np.arange(self.minimum, self.maximum + 1)
+
+    @property
+    def mean(self) -> float:
+        return float(np.dot(self.totals, self.probabilities))
+
+    def probability(self, total: int) -> float:
+        index = total - self.minimum
+        if 0 <= index < len(self.probabilities):
+            return float(self.probabilities[index])
+        return 0.0
+
+    def at_least(self, total: int) -> float:
+        """
+        Return the probability of rolling `total` or more, e.g. the chance of
+        hitting a target.
+        """
+        index = total - self.minimum
+        if index <= 0:
+            return 1.0
+        if index >= len(self.probabilities):
+            return 0.0
+        return float(1.0 - self._cumulative[index - 1])
+
+    def percentile(self, percent: float) -> int:
+        """
+        Return the lowest total that at least `percent` percent of rolls do
+        not exceed.
+        """
+        index = np.searchsorted(self._cumulative, percent / 100 - 1e-12)
+        return self.minimum + int(min(index, len(self.probabilities) - 1))
+
+    def shifted(self, amount: int) -> 'Distribution':
+        return Distribution(self.minimum + amount, self.probabilities)
+
+    def negated(self) -> 'Distribution':
+        return Distribution(-self.maximum, self.probabilities[::-1].copy())
+
+    def __add__(self, other: 'Distribution') -> 'Distribution':
+        return Distribution(self.minimum + other.minimum,
+                            _convolve(self.probabilities,
+                                      other.probabilities))
+
+
+class DiceTerm:
+    """
+    A roll of identical dice in an expression, e.g. ``4d6kh3``.
+
+    :param count: the number of dice
+    :param sides: the number of sides of each die
+    :param keep_highest: the number of highest dice that count
+    :param keep_lowest: the number of lowest dice that count
+    :param reroll_below: dice showing this or less are rolled again once
+    """
+
+    def __init__(self, count: int, sides: int,
+                 keep_highest: Optional[int]=None,
+                 keep_lowest: Optional[int]=None, reroll_below: int=0):
+        self.count = count
+        self.sides = sides
+        self.keep_highest = keep_highest
+        self.keep_lowest = keep_lowest
+        self.reroll_below = reroll_below
+
+    @property
+    def keeps(self) -> bool:
+        kept = self.keep_highest or self.keep_lowest
+        return kept is not None and kept < self.count
+
+    def sample(self, roller: DiceRoller, size: int) -> np.ndarray:
+        return roller.roll(self.sides, self.count, size,
+                           keep_highest=self.keep_highest,
+                           keep_lowest=self.keep_lowest,
+                           reroll_below=self.reroll_below)
+
+    def face_probabilities(self) -> np.ndarray:
+        """ The probability of each face of one die, after rerolls. """
+        uniform = np.full(self.sides, 1 / self.sides)
+        rerolled = min(self.reroll_below, self.sides)
+        if not rerolled:
+            return uniform
+        probabilities = uniform * (rerolled / self.sides)
+        probabilities[rerolled:] += 1 / self.sides
+        return probabilities
+
+    def distribution(self) -> Distribution:
+        faces = self.face_probabilities()
+        if not self.keeps:
+            if self.count * (self.sides - 1) + 1 > MAX_TOTALS:
+                raise ValueError(f'{self} has too many totals to compute its '
+                                 f'distribution')
+            # The sum of n dice by squaring, in log(n) convolutions
+            probabilities = np.ones(1)
+            count = self.count
+            while count:
+                if count & 1:
+                    probabilities = _convolve(probabilities, faces)
+                count >>= 1
+                if count:
+                    faces = _convolve(faces, faces)
+            return Distribution(self.count, probabilities)
+        return self._enumerated_distribution(faces)
+
+    def _enumerated_distribution(self, faces: np.ndarray) -> Distribution:
+        if self.sides ** self.count > MAX_ENUMERATED_OUTCOMES:
+            raise ValueError(f'{self} has too many outcomes to compute its '
+                             f'distribution exactly')
+        rolls = np.indices((self.sides,) * self.count).reshape(
+            self.count, -1).T
+        weights = np.prod(faces[rolls], axis=1)
+        rolls = np.sort(rolls + 1, axis=1)
+        if self.keep_highest is not None:
+            kept = rolls[:, self.count - self.keep_highest:]
+        else:
+            kept = rolls[:, :self.keep_lowest]
+        totals = kept.sum(axis=1)
+        minimum = kept.shape[1]
+        probabilities = np.bincount(totals - minimum, weights=weights)
+        return Distribution(minimum, probabilities)
+
+    def __str__(self):
+        text = f'{self.count}d{self.sides}'
+        if self.keep_highest is not None:
+            text += f'kh{self.keep_highest}'
+        elif self.keep_lowest is not None:
+            text += f'kl{self.keep_lowest}'
+        if self.reroll_below:
+            text += f'r{self.reroll_below}'
+        return text
+
+
+class DiceExpression:
+    """
+    A parsed dice expression: a sum of dice terms and a constant.
+
+    Expressions are immutable and are shared through the `parse` cache, so
+    the exact distribution is computed at most once per expression.
+
+    :param terms: ``(sign, term)`` pairs, where sign is 1 or -1
+    :param constant: the sum of the constant terms
+    """
+
+    def __init__(self, terms: Sequence[Tuple[int, DiceTerm]],
+                 constant: int=0):
+        self.terms = tuple(terms)
+        self.constant = constant
+        self._distribution = None
+
+    def sample(self, size: int=1,
+               roller: Optional[DiceRoller]=None) -> np.ndarray:
+        """
+        Roll the expression `size` times.
+
+        :param size: the number of rolls
+        :param roller: the roller to use, a new unseeded one by default
+        :return: an array with the `size` totals
+        """
+        roller = roller or DiceRoller()
+        totals = np.full(size, self.constant, dtype=np.int64)
+        for sign, term in self.terms:
+            totals += sign * term.sample(roller, size)
+        return totals
+
+    def distribution(self) -> Distribution:
+        """
+        Return the exact distribution of the totals, computed by convolving
+        the distributions of the terms.
+        """
+        if self._distribution is None:
+            distribution = Distribution(self.constant, np.ones(1))
+            for sign, term in self.terms:
+                term_distribution = term.distribution()
+                if sign < 0:
+                    term_distribution = term_distribution.negated()
+                distribution = distribution + term_distribution
+            self._distribution = distribution
+        return self._distribution
+
+    @property
+    def mean(self) -> float:
+        return self.distribution().mean
+
+    @property
+    def minimum(self) -> int:
+        return self.distribution().minimum
+
+    @property
+    def maximum(self) -> int:
+        return self.distribution().maximum
+
+    def percentile(self, percent: float) -> int:
+        return self.distribution().percentile(percent)
+
+    def __str__(self):
+        text = ''
+        for sign, term in self.terms:
+            text += ('-' if sign < 0 else '+' if text else '') + str(term)
+        if self.constant or not text:
+            text += f'{self.constant:+d}' if text else str(self.constant)
+        return text
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse(text: str) -> DiceExpression:
+    """
+    Parse a dice expression such as ``2d6+1d8+3`` or ``4d6kh3``.
+
+    Besides ``NdM`` terms and constants, a term may keep its highest
+    (``kh``, or just ``k``) or lowest (``kl``) dice and reroll low dice once
+    (``r2``). ``d%`` is a d100. A term rolls at most `MAX_DICE` dice.
+
+    :param text: the expression
+    :return: the parsed expression
+    """
+    if not text.strip():
+        raise ValueError('Empty dice expression')
+    terms = []
+    constant = 0
+    position = 0
+    while position < len(text):
+        match = TERM_PATTERN.match(text, position)
+        if match is None or match.end() == position:
+            raise ValueError(f'Invalid dice expression {text!r} at '
+                             f'position {position}')
+        if position and match.group('sign') is None:
+            raise ValueError(f'Expected + or - in {text!r} at '
+                             f'position {position}')
+        position = match.end()
+
+        sign = -1 if match.group('sign') == '-' else 1
+        if match.group('constant') is not None:
+            constant += sign * int(match.group('constant'))
+            continue
+
+        count = int(match.group('count') or 1)
+        sides = match.group('sides')
+        sides = 100 if sides == '%' else int(sides)
+        if count < 1 or sides < 1:
+            raise ValueError(f'Invalid dice in {text!r}')
+        if count > MAX_DICE:
+            raise ValueError(f'At most {MAX_DICE} dice can be rolled at '
+                             f'once in {text!r}')
+        kept = match.group('kept')
+        keep = (match.group('keep') or '').lower()
+        if keep and int(kept) < 1:
+            raise ValueError(f'At least one die must be kept in {text!r}')
+        if keep and int(kept) > count:
+            raise ValueError(f'Cannot keep {kept} of {count} dice in '
+                             f'{text!r}')
+        terms.append((sign, DiceTerm(
+            count, sides,
+            keep_highest=int(kept) if keep in ('k', 'kh') else None,
+            keep_lowest=int(kept) if keep == 'kl' else None,
+            reroll_below=int(match.group('reroll') or 0))))
+
+    return DiceExpression(terms, constant)
+
+
+def _convolve(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    if len(a) * len(b) <= DIRECT_CONVOLUTION_LIMIT:
+        return np.convolve(a, b)
+    size = len(a) + len(b) - 1
+    # FFTs are fastest on powers of two
+    padded = 1 << (size - 1).bit_length()
+    convolved = np.fft.irfft(np.fft.rfft(a, padded) * np.fft.rfft(b, padded),
+                             padded)[:size]
+    # Rounding errors must not make a probability negative
+    return np.clip(convolved, 0, None)
+
+
+class DamagePreview:
+    __slots__ = ('expression', 'mean', 'minimum', 'maximum')
+
+    def __init__(self, expression: str, distribution: Distribution):
+        self.expression = expression
+        self.mean = distribution.mean
+        self.minimum = distribution.minimum
+        self.maximum = distribution.maximum
+
+    def __str__(self):
+        return f'{self.mean:.0f} ({self.expression})'
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def damage_preview(dice: Optional[str],
+                   modifier: int=0) -> Optional[DamagePreview]:
+    """
+    Summarize the damage of an attack for display on a sheet.
+
+    :param dice: the damage dice, e.g. ``1d8``
+    :param modifier: added to the damage, e.g. the ability modifier
+    :return: the preview, or None when there are no damage dice or they
+             can't be parsed
+    """
+    if not dice:
+        return None
+    try:
+        expression = parse(dice)
+        distribution = expression.distribution()
+    except ValueError:
+        # Damage dice come from the database, a bad or huge value mustn't
+        # break the page showing it
+        return None
+    text = str(expression)
+    if modifier:
+        text += f'{modifier:+d}'
+    return DamagePreview(text, distribution.shifted(modifier))
@@ -0,0 +1,112 @@
+import os
+from collections.abc import Mapping
+from typing import Callable, Iterator, Optional
+
+from celery import Celery, Task
+from flask import Flask, current_app, has_app_context
+from jinja2 import ChoiceLoader, FileSystemLoader
+
+from config import configure_logging, load_config
+from world_manager.extensions import db, mail, sql_profiler
+from world_manager.model import load_models
+
+# Only what tasks use. Every model is loaded with the app, so relationships
+# to models no task imports can be configured.
+WORKER_EXTENSIONS = [db, sql_profiler, mail]
+# The templates of e-mails, relative to the package
+WORKER_TEMPLATE_FOLDERS = ['templates', 'blueprints/contact/templates']
+CELERY_TASK_LIST = ['world_manager.blueprints.contact.tasks']
+
+
+def create_worker_app(settings_override: Optional[dict]=None) -> Flask:
+    """
+    Create a Flask app for Celery workers, with the settings of the web app
+    but only the extensions and templates tasks use, and no blueprints.
+
+    :param settings_override: any settings to override
+    :return: flask app
+    """
+
+    app = Flask('world_manager', instance_relative_config=True)
+    load_config(app, settings_override)
+    configure_logging(app)
+
+    for extension in WORKER_EXTENSIONS:
+        extension.init_app(app)
+    db.app = app
+
+    # Blueprints aren't registered, so their templates are loaded directly
+    app.jinja_loader = ChoiceLoader([
+        FileSystemLoader(os.path.join(app.root_path, folder))
+        for folder in WORKER_TEMPLATE_FOLDERS])
+
+    load_models()
+
+    return app
+
+
+def create_celery_app(app: Optional[Flask]=None,
+                      app_factory: Callable[[], Flask]=create_worker_app
+                      ) -> Celery:
+    """
+    Create a new Celery app and tie the app's config together with celery's.
+    Wrap all tasks in the context of the application.
+
+    The Flask app is only needed once Celery reads its config or runs a task,
+    so it is found then: inside an app context, e.g. a web request, the
+    current app is used, and anywhere else a worker app, created once.
+    Importing task modules stays cheap.
+
+    :param app: The flask app, None to use the current or a worker app
+    :param app_factory: creates the flask app outside of an app context
+    :return: celery app
+    """
+
+    worker_app = None
+
+    def flask_app() -> Flask:
+        nonlocal worker_app
+        if app is not None:
+            return app
+        if has_app_context():
+            return current_app._get_current_object()
+        if worker_app is None:
+            worker_app = app_factory()
+        return worker_app
+
+    class ContextTask(Task):
+
+        def __call__(self, *args, **kwargs):
+            with flask_app().app_context(), \
+                    sql_profiler.profile(f'task:{self.name}'):
+                return super().__call__(*args, **kwargs)
+
+        def run(self, *args, **kwargs):
+            """The body of the task executed by workers."""
+            raise NotImplementedError('Tasks must define the run method.')
+
+    celery = Celery('world_manager', include=CELERY_TASK_LIST,
+                    task_cls=ContextTask)
+    # Settings starting with CELERY_, e.g. CELERY_BROKER_URL, are read when
+    # Celery first needs them
+    celery.config_from_object(_LazyConfig(flask_app), namespace='CELERY')
+
+    return celery
+
+
+class _LazyConfig(Mapping):
+
+    def __init__(self, flask_app: Callable[[], Flask]):
+        self._flask_app = flask_app
+
+    def __getitem__(self, key: str):
+        return self._flask_app().config[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._flask_app().config)
+
+    def __len__(self) -> int:
+        return len(self._flask_app().config)
+
+
+celery = create_celery_app()